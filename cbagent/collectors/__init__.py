@@ -50,6 +50,7 @@ from cbagent.collectors.system import (
     PS,
     VMSTAT,
     Disk,
+    IOAmplification,
     Memory,
     Net,
     PageCache,
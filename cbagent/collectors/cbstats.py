@@ -1,8 +1,7 @@
-import json
+from itertools import product
 
 from cbagent.collectors.collector import Collector
-from logger import logger
-from perfrunner.helpers.local import extract_cb_any, run_cbstats
+from perfrunner.helpers.memcached import MemcachedStatsClient, typed_stats
 
 
 class CBStatsMemory(Collector):
@@ -14,21 +13,16 @@ class CBStatsMemory(Collector):
 
     def __init__(self, settings, test):
         super().__init__(settings)
-        extract_cb_any(filename='couchbase')
         self.cluster_spec = test.cluster_spec
+        self.stats_client = MemcachedStatsClient.shared(*self.cluster_spec.rest_credentials,
+                                                         settings.memcached_family)
 
     def _get_stats_from_server(self, bucket: str, server: str):
         stats = {}
         try:
-            uname, pwd = self.cluster_spec.rest_credentials
-            stdout, returncode = run_cbstats("memory", server, self.CB_STATS_PORT, uname, pwd,
-                                             bucket)
-            if returncode != 0:
-                logger.warning("CBStatsMemory failed to get memory stats from server: {}"
-                               .format(server))
-                return stats
-
-            data = json.loads(stdout)
+            data = typed_stats(
+                self.stats_client.get_stats(server, self.CB_STATS_PORT, bucket, "memory")
+            )
             for metric, value in data.items():
                 if metric in self.METRICS:
                     if metric in stats:
@@ -45,10 +39,12 @@ class CBStatsMemory(Collector):
         return node_stats
 
     def sample(self):
-        for bucket in self.get_buckets():
+        buckets = list(self.get_buckets())
+        node_stats = self.fan_out(self._get_memory_stats, product(buckets, self.nodes))
+        for bucket in buckets:
             stats = {}
             for node in self.nodes:
-                temp_stats = self._get_memory_stats(bucket, node)
+                temp_stats = node_stats[bucket, node]
                 for st in temp_stats:
                     if st in stats:
                         stats[st] += temp_stats[st]
@@ -89,19 +85,14 @@ class CBStatsAll(Collector):
 
     def __init__(self, settings, test):
         super().__init__(settings)
-        extract_cb_any(filename='couchbase')
         self.cluster_spec = test.cluster_spec
+        self.stats_client = MemcachedStatsClient.shared(*self.cluster_spec.rest_credentials,
+                                                         settings.memcached_family)
 
     def _get_stats_from_server(self, bucket: str, server: str):
         stats = {}
         try:
-            uname, pwd = self.cluster_spec.rest_credentials
-            stdout, returncode = run_cbstats("all", server, self.CB_STATS_PORT, uname, pwd, bucket)
-            if returncode != 0:
-                logger.warning("CBStatsAll failed to get stats from server: {}".format(server))
-                return stats
-
-            data = json.loads(stdout)
+            data = typed_stats(self.stats_client.get_stats(server, self.CB_STATS_PORT, bucket))
 
             for metric, value in data.items():
                 if metric in self.METRICS:
@@ -125,10 +116,12 @@ class CBStatsAll(Collector):
         return node_stats
 
     def sample(self):
-        for bucket in self.get_buckets():
+        buckets = list(self.get_buckets())
+        node_stats = self.fan_out(self._get_cbstats_all_stats, product(buckets, self.nodes))
+        for bucket in buckets:
             stats = {}
             for node in self.nodes:
-                temp_stats = self._get_cbstats_all_stats(bucket, node)
+                temp_stats = node_stats[bucket, node]
                 for st in temp_stats:
                     if st in stats:
                         stats[st] += temp_stats[st]
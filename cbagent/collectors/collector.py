@@ -1,14 +1,18 @@
+import asyncio
 import socket
 import sys
 import time
+from concurrent.futures import ThreadPoolExecutor
 from functools import cached_property
 from threading import Thread
-from typing import Optional, Union
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple, Union
 
 import requests
+from requests.adapters import HTTPAdapter
 
-from cbagent.metadata_client import MetadataClient
-from cbagent.stores import PerfStore
+from cbagent.metadata_client import new_metadata_client
+from cbagent.scheduler import next_tick
+from cbagent.stores import new_store
 from logger import logger
 
 
@@ -16,8 +20,22 @@ class Collector:
 
     COLLECTOR = None
 
+    # Whether the collector can share one process and event loop with others
+    MULTIPLEXED = True
+
+    # Maximum number of concurrent requests issued by a single sample
+    MAX_CONCURRENCY = 16
+
+    REQUEST_TIMEOUT = 30  # Seconds
+
+    # Sampling health of every collector, see report_sampling_time
+    SAMPLING_METRICS = 'cbagent_sampling_time', 'cbagent_sampling_overrun', 'cbagent_missed_ticks'
+
     def __init__(self, settings):
         self.session = requests.Session()
+        adapter = HTTPAdapter(pool_maxsize=self.MAX_CONCURRENCY)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
         self.cloud = settings.cloud
         self.cloud_enabled = self.cloud['enabled']
         if self.cloud_enabled:
@@ -39,8 +57,8 @@ class Collector:
         if self.remote_workers:
             self.remote_worker_home = settings.remote_worker_home
 
-        self.store = PerfStore(settings.cbmonitor_host)
-        self.mc = MetadataClient(settings)
+        self.store = new_store(settings)
+        self.mc = new_metadata_client(settings)
 
         self.metrics = set()
         self.updater = None
@@ -68,7 +86,8 @@ class Collector:
                 # because it will do it for us. When not on cloud, we need it.
                 params.update({
                     'auth': self.auth,
-                    'verify': False
+                    'verify': False,
+                    'timeout': self.REQUEST_TIMEOUT,
                 })
 
             r = self.session.get(**params)
@@ -79,7 +98,7 @@ class Collector:
                 logger.warn("Bad response (GET): {}".format(url))
                 logger.warn("Response text: {}".format(r.text))
                 return self.refresh_nodes_and_retry(path, server, port)
-        except requests.ConnectionError:
+        except (requests.ConnectionError, requests.Timeout):
             logger.warn("Connection error: {}".format(url))
             return self.refresh_nodes_and_retry(path, server, port, json)
 
@@ -95,6 +114,7 @@ class Collector:
                 # When we are on cloud, self.session is a RestHelper so we shouldn't add auth
                 # because it will do it for us. When not on cloud, we need it.
                 params['auth'] = self.auth
+                params['timeout'] = self.REQUEST_TIMEOUT
 
             r = self.session.post(**params)
 
@@ -105,7 +125,7 @@ class Collector:
                 logger.warn("Request payload: {}".format(json_data))
                 logger.warn("Response text: {}".format(r.text))
                 return self.refresh_nodes_and_retry(path, server, port)
-        except requests.ConnectionError:
+        except (requests.ConnectionError, requests.Timeout):
             logger.warn("Connection error: {}".format(url))
             return self.refresh_nodes_and_retry(path, server, port, json_out)
 
@@ -199,6 +219,33 @@ class Collector:
             self.updater.start()
             self.updater.join()
 
+    @cached_property
+    def executor(self) -> ThreadPoolExecutor:
+        # Threads are started lazily, after the collector process is forked
+        return ThreadPoolExecutor(max_workers=self.MAX_CONCURRENCY)
+
+    def fan_out(self, func: Callable, args: Iterable[Tuple]) -> Dict[Tuple, Any]:
+        """Call func with every tuple of arguments concurrently.
+
+        Return a mapping from arguments to results. Exceptions are propagated
+        to the caller just like in a serial loop.
+        """
+        futures = {_args: self.executor.submit(func, *_args) for _args in args}
+        return {_args: future.result() for _args, future in futures.items()}
+
+    def register_sampling_metrics(self):
+        """Add the metrics reported by report_sampling_time to the metadata."""
+        self._update_metric_metadata(self.SAMPLING_METRICS)
+
+    def report_sampling_time(self, sampling_time: float, missed_ticks: int = 0):
+        """Store the duration of a sample, its overrun and the skipped ticks."""
+        stats = dict(zip(self.SAMPLING_METRICS, (
+            sampling_time,
+            max(sampling_time - self.interval, 0),
+            missed_ticks,
+        )))
+        self.store.append(stats, cluster=self.cluster, collector=self.COLLECTOR)
+
     def sample(self):
         raise NotImplementedError
 
@@ -209,20 +256,58 @@ class Collector:
         # https://docs.couchbase.com/sdk-api/couchbase-python-client/couchbase_api/parallelism.html
         pass
 
+    def sample_at(self, tick: float, missed_ticks: int):
+        """Take a sample stamped with its scheduled time rather than the time of arrival."""
+        self.store.timestamp = int(tick * 10 ** 9)
+        try:
+            t0 = time.time()
+            self.sample()
+            self.report_sampling_time(time.time() - t0, missed_ticks)
+        except IndexError:
+            pass
+        except Exception as e:
+            logger.warn("Unexpected exception in {}: {}"
+                        .format(self.__class__.__name__, e))
+        finally:
+            self.store.timestamp = None
+
     def collect(self):
+        """Sample on wall-clock ticks which are multiples of the interval.
+
+        All collectors with the same interval sample in the same phase. If a
+        sample overruns, the ticks which already passed are skipped and
+        reported by the next sample instead of firing back to back.
+        """
         self._init_pool()
-        while True:
-            try:
-                t0 = time.time()
-                self.sample()
-                delta = time.time() - t0
-                if delta >= self.interval:
-                    continue
-                time.sleep(self.interval - delta)
-            except KeyboardInterrupt:
-                sys.exit()
-            except IndexError:
-                pass
-            except Exception as e:
-                logger.warn("Unexpected exception in {}: {}"
-                            .format(self.__class__.__name__, e))
+        tick, missed_ticks = next_tick(self.interval)
+        try:
+            while True:
+                try:
+                    time.sleep(max(tick - time.time(), 0))
+                    self.sample_at(tick, missed_ticks)
+                    tick, missed_ticks = next_tick(self.interval, tick)
+                except KeyboardInterrupt:
+                    sys.exit()
+        finally:
+            self.store.close()
+
+    async def collect_async(self):
+        """Run collect() as a coroutine sharing one process with other collectors.
+
+        Blocking samples run in the default executor of the event loop.
+        """
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self._init_pool)
+        tick, missed_ticks = next_tick(self.interval)
+        try:
+            while True:
+                await asyncio.sleep(max(tick - time.time(), 0))
+                await loop.run_in_executor(None, self.sample_at, tick, missed_ticks)
+                try:
+                    await self.store.flush()
+                except Exception as e:
+                    logger.warn("Failed to push samples of {}: {}"
+                                .format(self.__class__.__name__, e))
+                tick, missed_ticks = next_tick(self.interval, tick)
+        finally:
+            self.store.close()
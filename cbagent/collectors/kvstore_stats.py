@@ -1,8 +1,9 @@
 import json
+from itertools import product
 
 from cbagent.collectors.collector import Collector
 from logger import logger
-from perfrunner.helpers.local import extract_cb_any, run_cbstats
+from perfrunner.helpers.memcached import MemcachedStatsClient, typed_stats
 
 
 class KVStoreStats(Collector):
@@ -160,22 +161,15 @@ class KVStoreStats(Collector):
 
     def __init__(self, settings, test):
         super().__init__(settings)
-        extract_cb_any(filename='couchbase')
         self.collect_per_server_stats = test.collect_per_server_stats
         self.cluster_spec = test.cluster_spec
+        self.stats_client = MemcachedStatsClient.shared(*self.cluster_spec.rest_credentials,
+                                                         settings.memcached_family)
 
     def _get_stats_from_server(self, bucket: str, server: str):
         stats = {}
         try:
-            uname, pwd = self.cluster_spec.rest_credentials
-            stdout, returncode = run_cbstats("kvstore", server, self.CB_STATS_PORT, uname, pwd,
-                                             bucket)
-            if returncode != 0:
-                logger.warning("KVStoreStats failed to get kvstore stats from server: {}"
-                               .format(server))
-                return stats
-
-            data = json.loads(stdout)
+            data = self.stats_client.get_stats(server, self.CB_STATS_PORT, bucket, "kvstore")
             for shard, metrics in data.items():
                 if not shard.endswith(":magma"):
                     continue
@@ -210,22 +204,26 @@ class KVStoreStats(Collector):
         return node_stats
 
     def _get_num_shards(self, bucket: str, server: str):
-        uname, pwd = self.cluster_spec.rest_credentials
-        stdout, returncode = run_cbstats("workload", server, self.CB_STATS_PORT, uname, pwd, bucket)
-        if returncode != 0:
-            logger.warning("KVStoreStats failed to get workload stats from server: {}"
-                           .format(server))
+        try:
+            data = self.stats_client.get_stats(server, self.CB_STATS_PORT, bucket, "workload")
+        except Exception as e:
+            logger.warning("KVStoreStats failed to get workload stats from server {}: {}"
+                           .format(server, e))
             return 1
 
-        data = json.loads(stdout)
-        return data["ep_workload:num_shards"]
+        return typed_stats(data)["ep_workload:num_shards"]
 
     def sample(self):
+        buckets = list(self.get_buckets())
+        shards = self.fan_out(self._get_num_shards,
+                              ((bucket, self.master_node) for bucket in buckets))
+        node_stats = self.fan_out(self._get_kvstore_stats, product(buckets, self.nodes))
+
         if self.collect_per_server_stats:
             for node in self.nodes:
-                for bucket in self.get_buckets():
-                    num_shards = self._get_num_shards(bucket, self.master_node)
-                    stats = self._get_kvstore_stats(bucket, node)
+                for bucket in buckets:
+                    num_shards = shards[bucket, self.master_node]
+                    stats = dict(node_stats[bucket, node])
                     for metric in self.METRICS_AVERAGE_PER_NODE_PER_SHARD:
                         if metric in stats:
                             if stats[metric] / num_shards >= 50 and metric not in self.NO_CAP:
@@ -243,12 +241,12 @@ class KVStoreStats(Collector):
                             collector=self.COLLECTOR,
                         )
 
-        for bucket in self.get_buckets():
+        for bucket in buckets:
             stats = {}
-            num_shards = self._get_num_shards(bucket, self.master_node)
+            num_shards = shards[bucket, self.master_node]
             num_nodes = len(self.nodes)
             for node in self.nodes:
-                temp_stats = self._get_kvstore_stats(bucket, node)
+                temp_stats = node_stats[bucket, node]
                 for st in temp_stats:
                     if st in stats:
                         stats[st] += temp_stats[st]
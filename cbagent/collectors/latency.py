@@ -1,14 +1,24 @@
 import asyncio
-import csv
+from collections import defaultdict
+from itertools import chain
 from pathlib import Path
 from typing import Iterator
 from uuid import uuid4
 
+import numpy as np
 from aiohttp import ClientSession, TCPConnector
 from fabric.api import cd, execute, get, parallel, run
 
 from cbagent.collectors.collector import Collector
 from cbagent.settings import CbAgentSettings
+from spring.histogram import (
+    HISTOGRAM_EXT,
+    Histogram,
+    merged_histograms_path,
+    read_histograms,
+    write_merged_histograms,
+)
+from spring.reservoir import Reservoir
 
 
 class Latency(Collector):
@@ -37,8 +47,11 @@ class KVLatency(Latency):
 
     COLLECTOR = "spring_latency"
 
+    MULTIPLEXED = False  # Nothing to sample, stats are reconstructed
+
     METRICS = ["latency_get", "latency_set", "latency_durable_set",
-               "latency_total_get", "latency_total_set", "latency_total_durable_set"]
+               "latency_total_get", "latency_total_set", "latency_total_durable_set",
+               "latency_lag", "backlog"]
 
     PATTERN = '*kv-worker-*'
 
@@ -92,48 +105,82 @@ class KVLatency(Latency):
         execute(parallel(task), hosts=self.workers)
 
     def read_stats(self, filename: str) -> Iterator:
-        with open(filename) as fh:
-            reader = csv.reader(fh)
-            for line in reader:
-                yield line
-
-    async def post_results(self, filename: str, bucket: str):
+        """Read (operation, timestamp, latency_single, latency_total, target) tuples.
+
+        Latencies are converted to ms, counters are returned as is. The missing
+        total latencies are None.
+        """
+        operations, targets, records = Reservoir.load(filename)
+        counters = [code for code, operation in enumerate(operations)
+                    if operation in Reservoir.COUNTERS]
+        scale = np.where(np.isin(records['operation'], counters), 1, 1000)
+        columns = (
+            records['operation'].tolist(),
+            records['timestamp'].tolist(),
+            (records['latency_single'] * scale).tolist(),
+            (records['latency_total'] * scale).tolist(),
+            records['target'].tolist(),
+        )
+        for operation, timestamp, latency_single, latency_total, target in zip(*columns):
+            if latency_total != latency_total:  # NaN
+                latency_total = None
+            yield operations[operation], timestamp, latency_single, latency_total, \
+                targets[target]
+
+    def read_results(self, filename: str, bucket: str) -> Iterator[tuple[str, dict, int]]:
+        """Convert measurements from a stat file into (db, data, timestamp) points."""
+        dbs = {}
         for line in self.read_stats(filename):
             operation, timestamp, latency_single, latency_total, target = line
 
-            target_group = self.target_groups[bucket].get(target, '')
-            bucket_group = self.bucket_stat_group(bucket, target_group)
+            if (db := dbs.get(target)) is None:
+                target_group = self.target_groups[bucket].get(target, '')
+                bucket_group = self.bucket_stat_group(bucket, target_group)
+                db = dbs[target] = self.store.build_dbname(cluster=self.cluster,
+                                                           bucket=bucket_group,
+                                                           collector=self.COLLECTOR)
 
-            # Latency in ms
-            data = {'latency_' + operation: float(latency_single) * 1000}
-
-            await self.store.append_async(
-                data=data,
-                timestamp=int(timestamp),
-                cluster=self.cluster,
-                bucket=bucket_group,
-                collector=self.COLLECTOR,
-            )
+            if operation in Reservoir.COUNTERS:
+                yield db, {operation: latency_single}, timestamp
+                continue
 
+            # Latency in ms
+            data = {'latency_' + operation: latency_single}
             if latency_total:
-                # Latency in ms
-                data = {'latency_total_' + operation: float(latency_total) * 1000}
+                data['latency_total_' + operation] = latency_total
 
-                await self.store.append_async(
-                    data=data,
-                    timestamp=int(timestamp),
-                    cluster=self.cluster,
-                    bucket=bucket_group,
-                    collector=self.COLLECTOR,
-                )
+            yield db, data, timestamp
+
+    def stat_files(self, bucket: str, histograms: bool = False) -> Iterator[Path]:
+        for fn in Path(self.stat_dir).glob(self.PATTERN + bucket + "*"):
+            if (HISTOGRAM_EXT in fn.name) == histograms:
+                yield fn
 
     async def post_all_results(self):
+        points = chain.from_iterable(
+            self.read_results(fn, bucket)
+            for bucket in self.get_buckets()
+            for fn in self.stat_files(bucket)
+        )
         async with ClientSession(connector=TCPConnector()) as self.store.async_session:
-            await asyncio.gather(*[
-                self.post_results(fn, bucket)
-                for bucket in self.get_buckets()
-                for fn in Path(self.stat_dir).glob(self.PATTERN + bucket + "*")
-            ])
+            await self.store.async_push_many(points)
+
+    def merge_histograms(self):
+        """Merge worker histograms into one file per time series database."""
+        merged = defaultdict(lambda: defaultdict(Histogram))
+        for bucket in self.get_buckets():
+            for fn in self.stat_files(bucket, histograms=True):
+                for metric, target, histogram in read_histograms(fn):
+                    target_group = self.target_groups[bucket].get(target, '')
+                    bucket_group = self.bucket_stat_group(bucket, target_group)
+                    merged[bucket_group][metric].merge(histogram)
+                fn.unlink()
+
+        for bucket_group, histograms in merged.items():
+            db = self.store.build_dbname(cluster=self.cluster,
+                                         bucket=bucket_group,
+                                         collector=self.COLLECTOR)
+            write_merged_histograms(merged_histograms_path(self.cluster, db), histograms)
 
     def move_remote_stat_files(self):
         def task():
@@ -162,6 +209,8 @@ class KVLatency(Latency):
         loop.run_until_complete(self.post_all_results())
         loop.close()
 
+        self.merge_histograms()
+
         self.move_local_stat_files()
 
 
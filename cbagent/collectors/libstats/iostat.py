@@ -1,6 +1,6 @@
 from typing import Dict, Optional, Tuple
 
-from cbagent.collectors.libstats.remotestats import RemoteStats, parallel_task
+from cbagent.collectors.libstats.remotestats import RemoteStats, persistent_task
 
 
 class IOStat(RemoteStats):
@@ -38,11 +38,11 @@ class IOStat(RemoteStats):
             data[header[i]] = value
         return data
 
-    @parallel_task(server_side=True)
+    @persistent_task(server_side=True)
     def get_server_samples(self, partitions: dict) -> dict:
         return self.get_samples(partitions['server'], self.METRICS)
 
-    @parallel_task(server_side=False)
+    @persistent_task(server_side=False)
     def get_client_samples(self, partitions: dict) -> dict:
         return self.get_samples(partitions['client'], self.METRICS)
 
@@ -71,17 +71,22 @@ class DiskStats(IOStat):
         stats = stdout.split()
         sectors_read, sectors_written = int(stats[5]), int(stats[9])
 
+        sector_size = self.get_sector_size(device)
+
+        return sectors_read * sector_size, sectors_written * sector_size
+
+    def get_sector_size(self, device: str) -> int:
+        device_name = device.split('/')[-1]
+
         # https://www.kernel.org/doc/Documentation/block/queue-sysfs.txt
         if 'nvme' in device and 'p1' not in device and 'p2' not in device:
             stdout = self.run('cat /sys/block/{}/queue/hw_sector_size'.format(device_name))
         else:
             parent = self.run('lsblk -no pkname {}'.format(device)).strip()
             stdout = self.run('cat /sys/block/{}/queue/hw_sector_size'.format(parent))
-        sector_size = int(stdout)
+        return int(stdout)
 
-        return sectors_read * sector_size, sectors_written * sector_size
-
-    @parallel_task(server_side=True)
+    @persistent_task(server_side=True)
     def get_server_samples(self, partitions: dict) -> dict:
         return self.get_samples(partitions['server'])
 
@@ -94,3 +99,63 @@ class DiskStats(IOStat):
                 samples[purpose + '_bytes_read'] = bytes_read
                 samples[purpose + '_bytes_written'] = bytes_written
         return samples
+
+
+class IOCounters(DiskStats):
+
+    """Cumulative I/O counters of the data device and of the memcached process.
+
+    Device counters ("disk_") are the physical reads and writes reported by
+    /proc/diskstats, process counters ("memcached_") are the read and write
+    syscalls issued by memcached as reported by /proc/<pid>/io.
+    """
+
+    PROC_IO = (
+        ("reads", "syscr"),
+        ("read_bytes", "rchar"),
+        ("writes", "syscw"),
+        ("write_bytes", "wchar"),
+    )
+
+    def get_device_counters(self, device: str) -> Dict[str, int]:
+        device_name = device.split('/')[-1]
+
+        # https://www.kernel.org/doc/Documentation/ABI/testing/procfs-diskstats
+        stdout = self.run("awk '$3 == \"{}\"' /proc/diskstats".format(device_name))
+        stats = stdout.split()
+        if len(stats) < 10:
+            return {}
+
+        sector_size = self.get_sector_size(device)
+
+        return {
+            'disk_reads': int(stats[3]),
+            'disk_read_bytes': int(stats[5]) * sector_size,
+            'disk_writes': int(stats[7]),
+            'disk_write_bytes': int(stats[9]) * sector_size,
+        }
+
+    def get_process_counters(self, process: str) -> Dict[str, int]:
+        stdout = self.run('cat /proc/$(pidof {})/io'.format(process))
+        if stdout.failed:
+            return {}
+
+        stats = {}
+        for line in stdout.splitlines():
+            key, _, value = line.partition(':')
+            stats[key.strip()] = value.strip()
+
+        counters = {}
+        for metric, key in self.PROC_IO:
+            if key in stats:
+                counters['{}_{}'.format(process, metric)] = int(stats[key])
+        return counters
+
+    @persistent_task(server_side=True)
+    def get_server_samples(self, partitions: dict) -> dict:
+        samples = {}
+        device, lvm_swraid = self.get_device_name(partitions['server']['data'])
+        if device is not None and not lvm_swraid:
+            samples.update(self.get_device_counters(device))
+        samples.update(self.get_process_counters('memcached'))
+        return samples
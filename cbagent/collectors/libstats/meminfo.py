@@ -1,4 +1,4 @@
-from cbagent.collectors.libstats.remotestats import RemoteStats, parallel_task
+from cbagent.collectors.libstats.remotestats import RemoteStats, persistent_task
 
 
 class MemInfo(RemoteStats):
@@ -14,6 +14,6 @@ class MemInfo(RemoteStats):
             stats[metric] = value
         return stats
 
-    @parallel_task(server_side=True)
+    @persistent_task(server_side=True)
     def get_samples(self):
         return self.get_mem_stats()
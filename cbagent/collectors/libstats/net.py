@@ -1,6 +1,6 @@
 from typing import Dict
 
-from cbagent.collectors.libstats.remotestats import RemoteStats, parallel_task
+from cbagent.collectors.libstats.remotestats import RemoteStats, persistent_task
 
 
 class NetStat(RemoteStats):
@@ -41,7 +41,7 @@ class NetStat(RemoteStats):
             stats[metric] = num_connections - 1  # Subtract header
         return stats
 
-    @parallel_task(server_side=True)
+    @persistent_task(server_side=True)
     def get_samples(self) -> Dict[str, int]:
         dev_stats = self.get_dev_stats()
         tcp_stats = self.get_tcp_stats()
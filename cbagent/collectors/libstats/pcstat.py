@@ -2,7 +2,7 @@ from typing import Tuple
 
 import numpy
 
-from cbagent.collectors.libstats.remotestats import RemoteStats, parallel_task
+from cbagent.collectors.libstats.remotestats import RemoteStats, persistent_task
 
 
 class PCStat(RemoteStats):
@@ -24,7 +24,7 @@ class PCStat(RemoteStats):
         total_hits, hit_ratio = stdout.split()
         return float(total_hits), float(hit_ratio)
 
-    @parallel_task(server_side=True)
+    @persistent_task(server_side=True)
     def get_samples(self, partitions: dict) -> dict:
         total_hits, hit_ratio = self.get_cachestat()
         samples = {
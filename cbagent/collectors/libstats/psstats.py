@@ -1,4 +1,4 @@
-from cbagent.collectors.libstats.remotestats import RemoteStats, parallel_task
+from cbagent.collectors.libstats.remotestats import RemoteStats, persistent_task
 
 
 class PSStats(RemoteStats):
@@ -20,11 +20,11 @@ class PSStats(RemoteStats):
 
         self.top_interval = min(max(1, self.interval - 1), self.MAX_TOP_INTERVAL)
 
-    @parallel_task(server_side=True)
+    @persistent_task(server_side=True)
     def get_server_samples(self, process):
         return self.get_samples(process)
 
-    @parallel_task(server_side=False)
+    @persistent_task(server_side=False)
     def get_client_samples(self, process):
         return self.get_samples(process)
 
@@ -1,5 +1,9 @@
 import sys
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 
+import paramiko
 from decorator import decorator
 from fabric.api import env, hide, parallel, run, settings
 from fabric.tasks import execute
@@ -27,6 +31,93 @@ def parallel_task(server_side=True):
     return _parallel_task
 
 
+def persistent_task(server_side=True):
+    """Run the task on all hosts concurrently using persistent remote shells.
+
+    Unlike parallel_task, this doesn't fork a process and open a new SSH
+    connection per host and sample. Every host is sampled in a thread which
+    executes commands in a long-lived shell (see RemoteShell).
+    """
+
+    @decorator
+    def _persistent_task(task, *args, **kargs):
+        self = args[0]
+
+        if server_side:
+            hosts = self.hosts
+        else:
+            hosts = self.workers
+
+        futures = {
+            host: self.executor.submit(self.run_in_shell, host, task, *args, **kargs)
+            for host in hosts
+        }
+        return {host: future.result() for host, future in futures.items()}
+
+    return _persistent_task
+
+
+class CommandResult(str):
+
+    """Command output with the same attributes as the fabric run() result."""
+
+    return_code = 0
+
+    @property
+    def failed(self) -> bool:
+        return self.return_code != 0
+
+    @property
+    def succeeded(self) -> bool:
+        return not self.failed
+
+
+class RemoteShell:
+
+    """A long-lived login shell on a remote host.
+
+    Commands are written to the stdin of a single bash process over one SSH
+    connection. The end of the output of every command is delimited by a
+    unique marker followed by the exit status. Similar to fabric, stderr is
+    combined with stdout and the output is stripped.
+    """
+
+    MARKER = '__cbagent_{}__'.format(uuid.uuid4().hex)
+
+    def __init__(self, host: str, user: str, password: str):
+        self.client = paramiko.SSHClient()
+        self.client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+        self.client.connect(host, username=user, password=password,
+                            timeout=env.timeout)
+        self.client.get_transport().set_keepalive(env.keepalive)
+
+        self.stdin, self.stdout, _ = self.client.exec_command('/bin/bash -l')
+        self.stdout.channel.settimeout(env.timeout)
+        self.stdin.write('exec 2>&1; set -o pipefail\n')
+        self.run('true')  # Skip any output of the login scripts
+
+    def run(self, command: str) -> CommandResult:
+        # Commands must not consume the stdin of the shell
+        self.stdin.write('{{ {}\n}} < /dev/null; printf "\\n{} %d\\n" $?\n'
+                         .format(command, self.MARKER))
+        self.stdin.flush()
+
+        lines = []
+        for line in self.stdout:
+            if line.startswith(self.MARKER):
+                break
+            lines.append(line)
+        else:
+            raise EOFError('Remote shell exited unexpectedly')
+
+        result = CommandResult(''.join(lines).strip())
+        result.return_code = int(line.split()[1])
+        return result
+
+    def close(self):
+        self.client.close()
+
+
 class RemoteStats:
 
     def __init__(self, hosts, workers, user, password, interval=None):
@@ -36,8 +127,37 @@ class RemoteStats:
         self.workers = workers
         self.interval = interval
 
+        self.shells = {}
+        self.local = threading.local()
+        self._executor = None
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        # Threads are started lazily, after the collector process is forked
+        if self._executor is None:
+            num_hosts = len(set(self.hosts) | set(self.workers))
+            self._executor = ThreadPoolExecutor(max_workers=max(num_hosts, 1))
+        return self._executor
+
+    def run_in_shell(self, host: str, task, *args, **kwargs):
+        if host not in self.shells:
+            self.shells[host] = RemoteShell(host, self.user, self.password)
+
+        self.local.shell = self.shells[host]
+        try:
+            return task(*args, **kwargs)
+        except (EOFError, OSError, paramiko.SSHException):
+            # Reconnect during the next sample
+            self.shells.pop(host).close()
+            raise
+        finally:
+            self.local.shell = None
+
     def run(self, *args, **kwargs):
+        shell = getattr(self.local, 'shell', None)
         try:
+            if shell is not None:
+                return shell.run(args[0])
             return run(*args, **kwargs)
         except KeyboardInterrupt:
             sys.exit()
@@ -1,4 +1,4 @@
-from cbagent.collectors.libstats.remotestats import RemoteStats, parallel_task
+from cbagent.collectors.libstats.remotestats import RemoteStats, persistent_task
 
 
 class VMStat(RemoteStats):
@@ -15,6 +15,6 @@ class VMStat(RemoteStats):
                 stats[metric] = int(value)
         return stats
 
-    @parallel_task(server_side=True)
+    @persistent_task(server_side=True)
     def get_samples(self):
         return self.get_vmstat()
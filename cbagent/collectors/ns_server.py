@@ -24,8 +24,10 @@ class NSServer(Collector):
         return stats
 
     def sample(self):
-        for uri, bucket in self._get_stats_uri():
-            stats = self._get_stats(uri)
+        buckets = dict(self._get_stats_uri())
+        all_stats = self.fan_out(self._get_stats, ((uri,) for uri in buckets))
+        for (uri,), stats in all_stats.items():
+            bucket = buckets[uri]
             if not stats:
                 continue
             self.update_metric_metadata(stats.keys(), bucket)
@@ -92,8 +94,8 @@ class XdcrStats(Collector):
         return stats
 
     def sample(self):
-        for bucket, uri in self._get_stats_uri():
-            stats = self._get_stats(bucket, uri)
+        all_stats = self.fan_out(self._get_stats, self._get_stats_uri())
+        for (bucket, _), stats in all_stats.items():
             if not stats:
                 continue
             self.update_metric_metadata(stats.keys(), bucket)
@@ -32,6 +32,8 @@ class ObserveIndexLatency(Latency):
 
     COLLECTOR = "observe"
 
+    MULTIPLEXED = False  # Uses SDK connections and its own sampling threads
+
     METRICS = "latency_observe",
 
     NUM_THREADS = 10
@@ -15,8 +15,9 @@ class SecondaryStats(Collector):
         return stats
 
     def sample(self):
-        for bucket in self.get_buckets():
-            stats = self._get_secondary_stats(bucket)
+        all_stats = self.fan_out(self._get_secondary_stats,
+                                 ((bucket,) for bucket in self.get_buckets()))
+        for (bucket,), stats in all_stats.items():
             if stats:
                 self.update_metric_metadata(stats.keys(), bucket=bucket)
                 self.store.append(
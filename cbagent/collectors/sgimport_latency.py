@@ -6,9 +6,9 @@ import requests
 
 from cbagent.collectors import Collector
 from cbagent.collectors.libstats.pool import Pool
-from cbagent.metadata_client import MetadataClient
+from cbagent.metadata_client import new_metadata_client
 from cbagent.settings import CbAgentSettings
-from cbagent.stores import PerfStore
+from cbagent.stores import new_store
 from logger import logger
 from perfrunner.helpers.misc import uhex
 from perfrunner.settings import ClusterSpec
@@ -18,6 +18,8 @@ from spring.docgen import SGImportLatencyDocument
 class SGImportLatency(Collector):
     COLLECTOR = "sgimport_latency"
 
+    MULTIPLEXED = False  # SDK connections cannot be shared across processes
+
     METRICS = "sgimport_latency"
 
     INITIAL_POLLING_INTERVAL = 0.001  # 1 ms
@@ -29,8 +31,8 @@ class SGImportLatency(Collector):
     def __init__(self, settings: CbAgentSettings, cluster_spec: ClusterSpec):
         super().__init__(settings)
         self.cluster_spec = cluster_spec
-        self.mc = MetadataClient(settings)
-        self.store = PerfStore(settings.cbmonitor_host)
+        self.mc = new_metadata_client(settings)
+        self.store = new_store(settings)
         self.interval = self.MAX_SAMPLING_INTERVAL
         self.cluster = settings.cluster
         self.pools: list[Pool] = []
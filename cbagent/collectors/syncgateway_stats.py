@@ -1,6 +1,6 @@
 from cbagent.collectors import Collector
-from cbagent.metadata_client import MetadataClient
-from cbagent.stores import PerfStore
+from cbagent.metadata_client import new_metadata_client
+from cbagent.stores import new_store
 from perfrunner.helpers.misc import create_build_tuple
 from perfrunner.helpers.rest import RestHelper
 
@@ -261,8 +261,8 @@ class SyncGatewayStats(Collector):
         self.use_capella = test.cluster_spec.capella_infrastructure
         self.num_buckets = test.test_config.cluster.num_buckets
 
-        self.store = PerfStore(settings.cbmonitor_host)
-        self.mc = MetadataClient(settings)
+        self.store = new_store(settings)
+        self.mc = new_metadata_client(settings)
 
         self.metrics = set()
         self.updater = None
@@ -1,5 +1,8 @@
+from itertools import product
+from typing import Optional
+
 from cbagent.collectors.collector import Collector
-from cbagent.collectors.libstats.iostat import DiskStats, IOStat
+from cbagent.collectors.libstats.iostat import DiskStats, IOCounters, IOStat
 from cbagent.collectors.libstats.meminfo import MemInfo
 from cbagent.collectors.libstats.net import NetStat
 from cbagent.collectors.libstats.pcstat import PCStat
@@ -7,6 +10,7 @@ from cbagent.collectors.libstats.psstats import PSStats
 from cbagent.collectors.libstats.sysdig import SysdigStat
 from cbagent.collectors.libstats.typeperfstats import TPStats
 from cbagent.collectors.libstats.vmstat import VMStat
+from perfrunner.helpers.memcached import MemcachedStatsClient, typed_stats
 
 
 class System(Collector):
@@ -105,6 +109,105 @@ class Disk(System):
             self.add_stats(node, stats)
 
 
+class IOAmplification(System):
+
+    """Per-node I/O amplification over every sampling interval.
+
+    Deltas of the device and memcached I/O counters are divided by deltas of
+    the KV operations that reached the storage engine: background fetches
+    for gets and create/update ops in all vBucket states for sets. Device
+    based ("actual") stats are reported as is, memcached syscall based
+    ("virtual") stats get the "virtual_" prefix.
+    """
+
+    COLLECTOR = "io_amplification"
+
+    CB_STATS_PORT = 11209
+
+    SET_OPS = (
+        "vb_active_ops_create",
+        "vb_replica_ops_create",
+        "vb_pending_ops_create",
+        "vb_active_ops_update",
+        "vb_replica_ops_update",
+        "vb_pending_ops_update",
+    )
+
+    def __init__(self, settings, doc_size: int):
+        super().__init__(settings)
+
+        self.partitions = settings.partitions
+        self.doc_size = doc_size
+
+        self.sampler = IOCounters(hosts=self.nodes,
+                                  workers=self.workers,
+                                  user=self.ssh_username,
+                                  password=self.ssh_password)
+        self.stats_client = MemcachedStatsClient.shared(*self.auth, settings.memcached_family)
+
+        self.last_counters = {}
+
+    def _get_ops(self, bucket: str, node: str) -> Optional[dict]:
+        try:
+            stats = typed_stats(self.stats_client.get_stats(node, self.CB_STATS_PORT, bucket))
+        except Exception:
+            return None
+        return {
+            'gets': stats.get('ep_bg_fetched', 0),
+            'sets': sum(stats.get(metric, 0) for metric in self.SET_OPS),
+        }
+
+    def get_ops(self) -> dict:
+        """Return the op counters per node, or None for nodes with missing stats."""
+        ops = {node: {'gets': 0, 'sets': 0} for node in self.nodes}
+        for (_, node), bucket_ops in self.fan_out(
+            self._get_ops, product(self.get_buckets(), self.nodes)
+        ).items():
+            if bucket_ops is None or ops[node] is None:
+                ops[node] = None
+                continue
+            for op, value in bucket_ops.items():
+                ops[node][op] += value
+        return ops
+
+    def amplification(self, delta: dict, source: str, prefix: str = '') -> dict:
+        if '{}_writes'.format(source) not in delta:
+            return {}
+
+        reads, read_bytes = delta[source + '_reads'], delta[source + '_read_bytes']
+        writes, write_bytes = delta[source + '_writes'], delta[source + '_write_bytes']
+
+        stats = {}
+        if sets := delta['sets']:
+            stats['write_amp'] = write_bytes / (sets * self.doc_size)
+            stats['write_io_per_set'] = writes / sets
+            stats['read_bytes_per_set'] = read_bytes / sets
+            stats['read_io_per_set'] = reads / sets
+        if gets := delta['gets']:
+            stats['read_amp'] = reads / gets
+            stats['read_bytes_per_get'] = read_bytes / gets
+        if ops := sets + gets:
+            stats['bytes_per_op'] = (read_bytes + write_bytes) / ops
+        return {prefix + metric: value for metric, value in stats.items()}
+
+    def sample(self):
+        samples = self.sampler.get_server_samples(self.partitions)
+        ops = self.get_ops()
+        for node, counters in samples.items():
+            if (node_ops := ops.get(node)) is None:  # Keep the last counters for the next tick
+                continue
+            counters.update(node_ops)
+            last_counters = self.last_counters.get(node)
+            self.last_counters[node] = counters
+            if not last_counters or counters.keys() != last_counters.keys():
+                continue
+
+            delta = {key: counters[key] - last_counters[key] for key in counters}
+            stats = self.amplification(delta, 'disk')
+            stats.update(self.amplification(delta, 'memcached', prefix='virtual_'))
+            self.add_stats(node, stats)
+
+
 class PageCache(System):
 
     COLLECTOR = "pcstat"
@@ -143,6 +246,8 @@ class Net(System):
 
 class TypePerf(PS):
 
+    MULTIPLEXED = False  # Fabric tasks rely on the global env
+
     def __init__(self, settings):
         super().__init__(settings)
 
@@ -156,6 +261,8 @@ class Sysdig(System):
 
     COLLECTOR = "sysdig"
 
+    MULTIPLEXED = False  # Fabric tasks rely on the global env
+
     def __init__(self, settings):
         super().__init__(settings)
 
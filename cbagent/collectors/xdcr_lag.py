@@ -15,6 +15,8 @@ class XdcrLag(Latency):
 
     COLLECTOR = "xdcr_lag"
 
+    MULTIPLEXED = False  # SDK connections cannot be shared across processes
+
     METRICS = "xdcr_lag",
 
     INITIAL_POLLING_INTERVAL = 0.001  # 1 ms
@@ -0,0 +1,85 @@
+import asyncio
+import math
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple
+
+import requests
+from aiohttp import ClientSession, TCPConnector
+from requests.adapters import HTTPAdapter
+
+from logger import logger
+
+
+def next_tick(interval: float, last_tick: Optional[float] = None) -> Tuple[float, int]:
+    """Return the next wall-clock aligned tick and the number of missed ticks.
+
+    Ticks are multiples of the interval since the epoch, so independent
+    collectors with the same interval fire at the same moments. Ticks which
+    already passed since the last one are skipped and counted as missed.
+    """
+    now = time.time()
+    tick = (math.floor(now / interval) + 1) * interval
+    if last_tick is None:
+        return tick, 0
+    tick = max(tick, last_tick + interval)  # In case of an early wake-up
+    missed_ticks = max(round((tick - last_tick) / interval) - 1, 0)
+    return tick, missed_ticks
+
+
+class Scheduler:
+
+    """Run many collectors as coroutines in a single process.
+
+    The collectors share one pool of HTTP connections for the REST API and
+    cbmonitor requests. Samples are buffered by the stores and pushed
+    asynchronously after every tick instead of one blocking POST at a time.
+    """
+
+    def __init__(self, collectors: list):
+        self.collectors = collectors
+
+    def share_sessions(self, num_threads: int):
+        """Share one session between all collectors and executor threads.
+
+        The connection pool of every host holds a connection per thread, so
+        concurrent blocking requests never wait for or discard connections.
+        """
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_maxsize=num_threads)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+
+        for collector in self.collectors:
+            if isinstance(collector.session, requests.Session):  # Not a cloud REST helper
+                collector.session = session
+            collector.mc.session = session
+            collector.store.session = session
+
+    async def run_async(self):
+        # Every collector needs a thread for its blocking samples
+        num_threads = len(self.collectors)
+        executor = ThreadPoolExecutor(max_workers=num_threads)
+        asyncio.get_running_loop().set_default_executor(executor)
+
+        self.share_sessions(num_threads)
+        async with ClientSession(connector=TCPConnector()) as session:
+            for collector in self.collectors:
+                collector.store.async_session = session
+                collector.store.buffer = []
+            await asyncio.gather(*(self.collect(c) for c in self.collectors))
+
+    @staticmethod
+    async def collect(collector):
+        """Run a collector, so that its failure doesn't stop the other collectors."""
+        try:
+            await collector.collect_async()
+        except Exception as e:
+            logger.warning('Collector {} stopped: {}'.format(collector.__class__.__name__, e))
+
+    def run(self):
+        try:
+            asyncio.run(self.run_async())
+        except KeyboardInterrupt:
+            sys.exit()
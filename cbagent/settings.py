@@ -1,3 +1,5 @@
+import socket
+
 from perfrunner.settings import CBMONITOR_HOST
 from perfrunner.tests import PerfTest
 
@@ -20,6 +22,8 @@ class CbAgentSettings:
             hostnames = None
 
         self.cbmonitor_host = CBMONITOR_HOST
+        self.stats_store = test.test_config.stats_settings.store
+        self.stats_store_dir = test.test_config.stats_settings.store_dir
         self.interval = test.test_config.stats_settings.interval
         self.lat_interval = test.test_config.stats_settings.lat_interval
         self.buckets = buckets
@@ -40,6 +44,10 @@ class CbAgentSettings:
         self.ssh_username, self.ssh_password = test.cluster_spec.ssh_credentials
         self.rest_username, self.rest_password = test.cluster_spec.rest_credentials
         self.bucket_username, self.bucket_password = test.cluster_spec.rest_credentials
+        if test.test_config.cluster.ipv6:
+            self.memcached_family = socket.AF_INET6
+        else:
+            self.memcached_family = socket.AF_INET
 
         if test.dynamic_infra:
             self.cloud = {"enabled": True, "dynamic": True, "cloud_rest": test.rest}
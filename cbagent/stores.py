@@ -1,16 +1,32 @@
+import asyncio
 import json
-from typing import Dict, List
+import os
+import struct
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from urllib.parse import quote, unquote
 
+import numpy as np
+from aiohttp import ClientSession, TCPConnector
 from requests import Session
 
 
 class PerfStore:
 
+    # Maximum number of in-flight requests used by bulk ingestion
+    ASYNC_CONCURRENCY = 64
+
     def __init__(self, host: str):
         self.session = Session()
         self.async_session = None
         self.base_url = 'http://{}:8080'.format(host)
         self.dbs = set()
+        # Default timestamp of appended samples, i.e. the scheduled sampling time
+        self.timestamp = None
+        # Samples waiting for a bulk push, if buffering is enabled
+        self.buffer = None
 
     @staticmethod
     def build_dbname(cluster: str,
@@ -24,6 +40,9 @@ class PerfStore:
         return db_name
 
     def push(self, db: str, data: dict, timestamp: str):
+        if self.buffer is not None:
+            self.buffer.append((db, data, timestamp))
+            return
         url = '{}/{}'.format(self.base_url, db)
         if timestamp is not None:
             url = '{}?ts={}'.format(url, timestamp)
@@ -36,6 +55,32 @@ class PerfStore:
         async with self.async_session.post(url=url, json=data) as response:
             return await response.json()
 
+    async def async_push_many(self, points: Iterable[Tuple[str, dict, int]],
+                              concurrency: int = ASYNC_CONCURRENCY):
+        """Push a stream of (db, data, timestamp) points.
+
+        The points are consumed lazily by a fixed number of coroutines, so
+        at most `concurrency` requests are in flight at any time and memory
+        usage does not depend on the number of points. All requests are
+        pipelined over the keep-alive connections of the async session.
+        """
+        points = iter(points)
+
+        async def pusher():
+            for db, data, timestamp in points:
+                await self.async_push(db, data, timestamp)
+
+        await asyncio.gather(*[pusher() for _ in range(concurrency)])
+
+    async def flush(self):
+        """Push all buffered samples over the async session."""
+        if self.buffer:
+            points, self.buffer = self.buffer, []
+            await self.async_push_many(points, min(len(points), self.ASYNC_CONCURRENCY))
+
+    def close(self):
+        self.session.close()
+
     def get_values(self, db: str, metric) -> List[float]:
         url = '{}/{}/{}'.format(self.base_url, db, metric)
         data = self.session.get(url).json()
@@ -50,20 +95,189 @@ class PerfStore:
         response = self.session.get(url)
         return response.status_code == 200
 
-    def find_dbs(self, db: str) -> List[str]:
-        urls = []
-        for name in self.session.get(self.base_url).json():
-            if db in name:
-                url = '{}/{}'.format(self.base_url, name)
-                urls.append(url)
-        return urls
+    def list_dbs(self) -> List[str]:
+        return self.session.get(self.base_url).json()
+
+    def find_dbs(self, *prefixes: str) -> List[str]:
+        """Return the names of the dbs which start with any of the given prefixes."""
+        return sorted(name for name in self.list_dbs() if name.startswith(prefixes))
 
     def append(self, data, cluster=None, server=None, bucket=None, index=None,
                collector=None, timestamp=None):
         db = self.build_dbname(cluster, server, bucket, index, collector)
+        if timestamp is None:
+            timestamp = self.timestamp
         self.push(db, data, timestamp)
 
     async def append_async(self, data, cluster=None, server=None, bucket=None,
                            index=None, collector=None, timestamp=None):
         db = self.build_dbname(cluster, server, bucket, index, collector)
         return await self.async_push(db, data, timestamp)
+
+
+class CachedPerfStore(PerfStore):
+
+    """Read-only view of the stats which fetches every series only once.
+
+    Every (db, metric) series is requested once and kept as a NumPy array, so
+    KPIs which share series don't issue the same HTTP requests and parse the
+    same JSON over and over.
+    """
+
+    def __init__(self, host: str):
+        super().__init__(host)
+        self.series = {}
+
+    def fetch(self, db: str, metric: str) -> Optional[np.ndarray]:
+        url = '{}/{}/{}'.format(self.base_url, db, metric)
+        response = self.session.get(url)
+        if response.status_code != 200:
+            return None
+
+        return np.array([d[1] for d in response.json()], dtype=float)
+
+    def get_array(self, db: str, metric: str) -> np.ndarray:
+        if (db, metric) not in self.series:
+            self.series[db, metric] = self.fetch(db, metric)
+        values = self.series[db, metric]
+        if values is None:
+            return np.empty(0)
+        return values
+
+    def get_values(self, db: str, metric) -> List[float]:
+        return self.get_array(db, metric).tolist()
+
+    def exists(self, db: str, metric: str) -> bool:
+        self.get_array(db, metric)
+        return self.series[db, metric] is not None
+
+
+class LocalStore(PerfStore):
+
+    """Embedded append-only store with the same API as PerfStore.
+
+    Every db is a local directory and every metric of the db is a separate
+    file of fixed-size (timestamp, value) records. Samples are appended with
+    a single unbuffered write, so there are no network round trips during
+    collection and concurrent collector processes never share a file. The
+    series are memory-mapped on read.
+
+    The samples can be uploaded to cbmonitor in bulk at the end of the test.
+    """
+
+    DTYPE = np.dtype([
+        ('timestamp', '<i8'),  # Nanoseconds
+        ('value', '<f8'),
+    ])
+
+    RECORD = struct.Struct('<qd')
+
+    EXT = '.ts'
+
+    SUMMARY_PERCENTILES = 50, 80, 90, 95, 99
+
+    def __init__(self, path: str):
+        super().__init__(host='localhost')
+        self.path = Path(path)
+        self.files = {}
+
+    def series_path(self, db: str, metric: str) -> Path:
+        # Metric names may contain characters which are not valid in file names
+        return self.path / db / (quote(metric, safe='') + self.EXT)
+
+    def series(self, db: str) -> Iterator[Tuple[str, Path]]:
+        for filename in (self.path / db).glob('*' + self.EXT):
+            yield unquote(filename.name[:-len(self.EXT)]), filename
+
+    def write(self, db: str, metric: str, record: bytes):
+        if (fd := self.files.get((db, metric))) is None:
+            filename = self.series_path(db, metric)
+            filename.parent.mkdir(parents=True, exist_ok=True)
+            fd = self.files[db, metric] = os.open(
+                filename, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        os.write(fd, record)
+
+    def push(self, db: str, data: dict, timestamp: str):
+        if timestamp is None:
+            timestamp = time.time_ns()
+        for metric, value in data.items():
+            try:
+                record = self.RECORD.pack(int(timestamp), float(value))
+            except (TypeError, ValueError):  # Skip non-numeric samples
+                continue
+            self.write(db, metric, record)
+
+    async def async_push(self, db: str, data: dict, timestamp: str):
+        self.push(db, data, timestamp)
+
+    def get_records(self, db: str, metric: str) -> np.ndarray:
+        filename = self.series_path(db, metric)
+        if not filename.exists() or not filename.stat().st_size:
+            return np.empty(0, dtype=self.DTYPE)
+        return np.memmap(filename, dtype=self.DTYPE, mode='r')
+
+    def get_array(self, db: str, metric: str) -> np.ndarray:
+        return self.get_records(db, metric)['value']
+
+    def get_values(self, db: str, metric) -> List[float]:
+        return self.get_array(db, metric).tolist()
+
+    def get_summary(self, db: str, metric: str) -> Dict[str, float]:
+        values = self.get_array(db, metric)
+        if not len(values):
+            return {}
+        summary = {
+            'avg': float(np.mean(values)),
+            'min': float(np.min(values)),
+            'max': float(np.max(values)),
+        }
+        for percentile, value in zip(self.SUMMARY_PERCENTILES,
+                                     np.percentile(values, self.SUMMARY_PERCENTILES)):
+            summary['p{}'.format(percentile)] = float(value)
+        return summary
+
+    def exists(self, db: str, metric: str) -> bool:
+        return self.series_path(db, metric).exists()
+
+    def list_dbs(self) -> List[str]:
+        if not self.path.exists():
+            return []
+        return [path.name for path in self.path.iterdir() if path.is_dir()]
+
+    def read_points(self, dbs: Iterable[str]) -> Iterator[Tuple[str, dict, int]]:
+        """Yield all metrics of a db sampled at the same time as a single point."""
+        for db in dbs:
+            points = defaultdict(dict)
+            for metric, _ in self.series(db):
+                records = self.get_records(db, metric)
+                for timestamp, value in zip(records['timestamp'].tolist(),
+                                            records['value'].tolist()):
+                    points[timestamp][metric] = value
+            for timestamp in sorted(points):
+                yield db, points[timestamp], timestamp
+
+    async def async_upload(self, host: str, dbs: Iterable[str], concurrency: int):
+        store = PerfStore(host)
+        async with ClientSession(connector=TCPConnector()) as store.async_session:
+            await store.async_push_many(self.read_points(dbs), concurrency)
+
+    def upload(self, host: str, dbs: Optional[Iterable[str]] = None,
+               concurrency: int = PerfStore.ASYNC_CONCURRENCY):
+        """Push the local samples of the given dbs (all by default) to cbmonitor."""
+        if dbs is None:
+            dbs = self.list_dbs()
+        asyncio.run(self.async_upload(host, dbs, concurrency))
+
+    def close(self):
+        """Close the files opened for appending."""
+        for fd in self.files.values():
+            os.close(fd)
+        self.files.clear()
+        super().close()
+
+
+def new_store(settings) -> PerfStore:
+    """Return the store backend selected in the cbagent settings."""
+    if getattr(settings, 'stats_store', None) == 'local':
+        return LocalStore(settings.stats_store_dir)
+    return PerfStore(settings.cbmonitor_host)
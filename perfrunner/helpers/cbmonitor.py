@@ -3,7 +3,7 @@ from collections import OrderedDict
 from copy import copy
 from multiprocessing import Process
 from pathlib import Path
-from typing import Callable, Union
+from typing import Callable, List, Union
 
 import pkg_resources
 import requests
@@ -25,6 +25,7 @@ from cbagent.collectors import (
     EventingPerNodeStats,
     EventingStats,
     FTSCollector,
+    IOAmplification,
     JTSCollector,
     KVLatency,
     KVStoreStats,
@@ -56,12 +57,12 @@ from cbagent.collectors import (
 )
 from cbagent.collectors.ai_services import WorkflowMetadataStats
 from cbagent.collectors.metrics_rest_api import MetricsRestApiAppTelemetry
-from cbagent.metadata_client import MetadataClient
+from cbagent.metadata_client import LocalMetadataClient, MetadataClient
+from cbagent.scheduler import Scheduler
 from cbagent.settings import CbAgentSettings
-from cbagent.stores import PerfStore
+from cbagent.stores import LocalStore, new_store
 from logger import logger
 from perfrunner.helpers.misc import pretty_dict, uhex
-from perfrunner.settings import CBMONITOR_HOST
 from perfrunner.tests import PerfTest
 
 
@@ -110,6 +111,7 @@ class CbAgent:
         if self.test.test_config.stats_settings.enabled:
             self.stop()
             self.reconstruct()
+            self.upload()
             # self.find_time_series()
             self.add_snapshots()
             self.cleanup_spring_worker_files()
@@ -137,6 +139,7 @@ class CbAgent:
         eventing_stats=False,
         fts_stats=False,
         index_latency=False,
+        io_amplification=False,
         iostat=True,
         jts_stats=False,
         kv_dedup=False,
@@ -228,6 +231,9 @@ class CbAgent:
                         self.add_io_collector(Disk)
                     if iostat:
                         self.add_io_collector(IO)
+                    if io_amplification:
+                        self.add_io_collector(IOAmplification,
+                                              self.test.test_config.access_settings.size)
             else:
                 self.add_collector(TypePerf)
 
@@ -289,7 +295,7 @@ class CbAgent:
             collector = cls(settings, *args)
             self.collectors.append(collector)
 
-    def add_io_collector(self, cls):
+    def add_io_collector(self, cls, *args):
         partitions = {
             'client': {},
             'server': {'data': self.test.cluster_spec.data_path},
@@ -308,7 +314,7 @@ class CbAgent:
             settings.master_node = master_node
             settings.partitions = partitions
 
-            collector = cls(settings)
+            collector = cls(settings, *args)
             self.collectors.append(collector)
 
     def add_durability_collector(self):
@@ -339,10 +345,16 @@ class CbAgent:
     def update_metadata(self):
         for collector in self.collectors:
             collector.update_metadata()
+            collector.register_sampling_metrics()
 
     def start(self):
         logger.info('Starting stats collectors')
-        self.processes = [Process(target=c.collect) for c in self.collectors]
+        # Most collectors share one process, the rest need dedicated processes
+        multiplexed = [c for c in self.collectors if c.MULTIPLEXED]
+        self.processes = [Process(target=c.collect) for c in self.collectors
+                          if not c.MULTIPLEXED]
+        if multiplexed:
+            self.processes.append(Process(target=Scheduler(multiplexed).run))
         for p in self.processes:
             p.start()
 
@@ -356,6 +368,33 @@ class CbAgent:
         for collector in self.collectors:
             if hasattr(collector, 'reconstruct'):
                 collector.reconstruct()
+                collector.store.close()
+
+    @property
+    def offline(self) -> bool:
+        return self.settings.stats_store == 'local' and \
+            not self.test.test_config.stats_settings.upload
+
+    def db_prefixes(self, cluster_id: str) -> List[str]:
+        """Return the name prefixes of the dbs which the collectors created for the cluster.
+
+        The components of the db names are not separated, so the names are
+        matched by the exact collector and cluster prefix. Cluster ids end with
+        a random suffix, hence one id is never a prefix of another one.
+        """
+        collectors = {collector.COLLECTOR for collector in self.collectors}
+        return sorted(LocalStore.build_dbname(cluster=cluster_id, collector=collector)
+                      for collector in collectors)
+
+    def upload(self):
+        store = new_store(self.settings)
+        if isinstance(store, LocalStore) and not self.offline:
+            logger.info('Uploading measurements to {}'.format(self.settings.cbmonitor_host))
+            for cluster_id in self.test.cbmonitor_clusters:
+                self.settings.cluster = cluster_id
+                LocalMetadataClient(self.settings).replay()
+                dbs = store.find_dbs(*self.db_prefixes(cluster_id))
+                store.upload(self.settings.cbmonitor_host, dbs=dbs)
 
     def trigger_report(self, snapshot: str):
         url = 'http://{}/reports/html/?snapshot={}'.format(
@@ -366,18 +405,19 @@ class CbAgent:
     def add_snapshots(self):
         self.test.cbmonitor_snapshots = []
         for cluster_id in self.test.cbmonitor_clusters:
-            self.settings.cluster = cluster_id
-            md_client = MetadataClient(self.settings)
-            md_client.add_snapshot(cluster_id)
-            self.trigger_report(cluster_id)
+            if not self.offline:
+                self.settings.cluster = cluster_id
+                md_client = MetadataClient(self.settings)
+                md_client.add_snapshot(cluster_id)
+                self.trigger_report(cluster_id)
 
             self.test.cbmonitor_snapshots.append(cluster_id)
 
     def find_time_series(self):
-        store = PerfStore(host=CBMONITOR_HOST)
+        store = new_store(self.settings)
         dbs = []
         for cluster_id in self.test.cbmonitor_clusters:
-            dbs += store.find_dbs(cluster_id)
+            dbs += store.find_dbs(*self.db_prefixes(cluster_id))
         logger.info('Time series: {}'.format(pretty_dict(dbs)))
 
     def cleanup_spring_worker_files(self):
@@ -1,5 +1,8 @@
+import os
 import socket
+import threading
 import time
+from typing import Optional, Union
 
 from mc_bin_client.mc_bin_client import MemcachedClient
 
@@ -9,6 +12,104 @@ SOCKET_RETRY_INTERVAL = 2
 MAX_RETRY = 600
 
 
+def typed_stats(stats: dict) -> dict:
+    """Convert numeric stat values to numbers, the same way as `cbstats -j` does."""
+    converted = {}
+    for key, value in stats.items():
+        for _type in int, float:
+            try:
+                value = _type(value)
+                break
+            except (TypeError, ValueError):
+                pass
+        converted[key] = value
+    return converted
+
+
+class StatsConnection:
+
+    def __init__(self):
+        self.client: Optional[MemcachedClient] = None
+        self.bucket: Optional[str] = None
+        self.lock = threading.Lock()
+
+    def close(self):
+        if self.client is not None:
+            self.client.close()
+        self.client = None
+        self.bucket = None
+
+
+class MemcachedStatsClient:
+
+    """Pool of long-lived memcached connections used for stats.
+
+    Every node gets a single connection, which is authenticated once and
+    reused for all buckets by switching between them with SELECT_BUCKET.
+    Requests to the same node are serialised, requests to different nodes
+    can be issued concurrently. Broken connections are reopened on the next
+    request.
+
+    Use shared() to get the pool of the current process.
+    """
+
+    _pools = {}
+
+    def __init__(self, username: str, password: str, family: int = socket.AF_INET):
+        self.username = username
+        self.password = password
+        self.family = family
+        self.connections = {}
+        self.lock = threading.Lock()
+        self.pid = os.getpid()
+
+    @classmethod
+    def shared(cls, username: str, password: str,
+               family: int = socket.AF_INET) -> 'MemcachedStatsClient':
+        key = username, password, family
+        if key not in cls._pools:
+            cls._pools[key] = cls(username, password, family)
+        return cls._pools[key]
+
+    def connect(self, host: str, port: int) -> MemcachedClient:
+        mc = MemcachedClient(host=host, port=port, family=self.family)
+        mc.enable_xerror()
+        mc.hello("mc")
+        mc.sasl_auth_plain(user=self.username, password=self.password)
+        return mc
+
+    def get_stats(self, host: str, port: int, bucket: str,
+                  stats: Union[str, tuple[str, ...]] = '') -> dict:
+        """Return a group of stats, or the union of several groups."""
+        with self.lock:
+            if self.pid != os.getpid():  # Sockets of the parent process cannot be reused
+                self.connections = {}
+                self.pid = os.getpid()
+            connection = self.connections.setdefault((host, port), StatsConnection())
+
+        groups = (stats, ) if isinstance(stats, str) else stats
+        with connection.lock:
+            try:
+                if connection.client is None:
+                    connection.client = self.connect(host, port)
+                if connection.bucket != bucket:
+                    connection.client.bucket_select(bucket)
+                    connection.bucket = bucket
+                result = {}
+                for group in groups:
+                    result.update(connection.client.stats(group))
+                return result
+            except Exception:
+                connection.close()
+                raise
+
+    def close(self):
+        with self.lock:
+            for connection in self.connections.values():
+                connection.close()
+            self.connections.clear()
+
+
 class MemcachedHelper:
 
     def __init__(self, cluster_spec: ClusterSpec, test_config: TestConfig):
@@ -17,17 +118,13 @@ class MemcachedHelper:
             self.family = socket.AF_INET6
         else:
             self.family = socket.AF_INET
+        self.client = MemcachedStatsClient.shared(self.username, self.password, self.family)
 
     def get_stats(self, host: str, port: int, bucket: str, stats: str = '') -> dict:
         retries = 0
         while True:
             try:
-                mc = MemcachedClient(host=host, port=port, family=self.family)
-                mc.enable_xerror()
-                mc.hello("mc")
-                mc.sasl_auth_plain(user=self.username, password=self.password)
-                mc.bucket_select(bucket)
-                return mc.stats(stats)
+                return self.client.get_stats(host, port, bucket, stats)
             except Exception:
                 if retries < MAX_RETRY:
                     retries += 1
@@ -2,17 +2,18 @@ from __future__ import annotations
 
 import glob
 import os
-import re
 import statistics
-from dataclasses import dataclass
+from collections import defaultdict
+from dataclasses import dataclass, field
 from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Tuple, TypeVar, Union
 
 import numpy as np
 
-from cbagent.stores import PerfStore
+from cbagent.stores import CachedPerfStore, LocalStore
 from logger import logger
 from perfrunner.settings import CBMONITOR_HOST, ClusterSpec, TestConfig
 from perfrunner.workloads.bigfun.query_gen import Query
+from spring.histogram import Histogram, merged_histograms_path, read_merged_histogram
 
 if TYPE_CHECKING:
     from perfrunner.tests import PerfTest
@@ -85,6 +86,69 @@ class CH3Metrics(CH2Metrics):
 CHXMetrics = TypeVar("CHXMetrics", CH2Metrics, CH3Metrics)
 
 
+@dataclass
+class YCSBStats:
+    """Statistics of YCSB client logs gathered in a single pass.
+
+    Latency samples of every operation are merged into one histogram across
+    all client logs, so percentiles are computed over the union of samples
+    rather than averaged across clients.
+    """
+
+    throughput: int = 0
+    histograms: Dict[str, Histogram] = field(default_factory=lambda: defaultdict(Histogram))
+    latency_sums: Dict[str, float] = field(default_factory=lambda: defaultdict(float))
+    max_latencies: Dict[str, float] = field(default_factory=dict)
+    failures: Dict[str, int] = field(default_factory=lambda: {"READ": 0, "UPDATE": 0})
+    gcs: int = 0
+
+    @staticmethod
+    def is_reported(io_type: str) -> bool:
+        return io_type != "CLEANUP" and "FAILED" not in io_type
+
+    def parse(self, filename: str):
+        has_throughput = False
+        with open(filename) as fh:
+            for line in fh:
+                if not line.startswith("["):
+                    continue
+                parts = [part.strip() for part in line.split(",")]
+                if len(parts) < 3:
+                    continue
+                io_type, name, value = parts[0][1:-1], parts[1], parts[-1]
+
+                if name.isdigit():
+                    # Time series of latencies in microseconds, the first
+                    # interval of every series is skipped
+                    if name.endswith("000") and self.is_reported(io_type):
+                        latency = float(value)
+                        self.histograms[io_type].record(latency / 10 ** 6)
+                        self.latency_sums[io_type] += latency
+                elif io_type == "OVERALL" and name == "Throughput(ops/sec)":
+                    if not has_throughput:
+                        self.throughput += int(float(value))
+                        has_throughput = True
+                elif name == "MaxLatency(us)" and self.is_reported(io_type):
+                    self.max_latencies[io_type] = max(float(value) / 1000.0,
+                                                      self.max_latencies.get(io_type, 0))
+                elif name == "Operations" and io_type.endswith("-FAILED"):
+                    io_type = io_type.split("-")[0]
+                    if io_type in self.failures:
+                        self.failures[io_type] += int(value)
+                elif io_type == "TOTAL_GCs" and name == "Count":
+                    self.gcs += int(value)
+
+    def latencies(self, percentile: Number) -> Dict[str, Number]:
+        """Return the percentile and the average latency of every operation in ms."""
+        latencies = {}
+        for io_type, histogram in self.histograms.items():
+            p_lat, = histogram.percentiles([percentile])
+            latencies["{}th Percentile {}".format(percentile, io_type)] = round(p_lat, 3)
+            a_lat = self.latency_sums[io_type] / histogram.total / 1000
+            latencies["Average {}".format(io_type)] = round(a_lat, 3)
+        return latencies
+
+
 class MetricHelper:
 
     def __init__(self, test: PerfTest):
@@ -93,8 +157,11 @@ class MetricHelper:
         self.cluster_spec: ClusterSpec = test.cluster_spec
         if self.test.dynamic_infra:
             self.store = None
+        elif self.test_config.stats_settings.store == 'local':
+            self.store = LocalStore(self.test_config.stats_settings.store_dir)
         else:
-            self.store = PerfStore(CBMONITOR_HOST)
+            self.store = CachedPerfStore(CBMONITOR_HOST)
+        self._ycsb_stats = {}
 
     @property
     def _title(self) -> str:
@@ -837,6 +904,22 @@ class MetricHelper:
 
         return metrics
 
+    def kv_backlog(self, percentile: Number = 99) -> Metric:
+        """Return the backlog of open-loop KV workers in operations."""
+        metric_id = '{}_{:g}th_backlog'.format(self.test_config.name, percentile)
+        metric_id = metric_id.replace('.', '')
+        title = '{:g}th percentile backlog per worker (ops), {}'.format(percentile, self._title)
+        metric_info = self._metric_info(metric_id, title, chirality=-1)
+
+        values = []
+        for bucket in self.test_config.buckets:
+            db = self.store.build_dbname(cluster=self.test.cbmonitor_clusters[0],
+                                         bucket=bucket,
+                                         collector='spring_latency')
+            values += self.store.get_values(db, metric='backlog')
+        backlog = round(np.percentile(values, percentile)) if values else 0
+        return backlog, self._snapshots, metric_info
+
     def _kv_latency(self,
                     operation: str,
                     percentiles: Iterable[Number],
@@ -844,25 +927,37 @@ class MetricHelper:
                     stat_group: str = '',
                     cluster_idx: int = 0) -> list[float]:
         timings = []
+        histogram = Histogram()
         metric = 'latency_{}'.format(operation)
+        cluster = self.test.cbmonitor_clusters[cluster_idx]
         for bucket in self.test_config.buckets:
             bucket_group = '{}{}'.format(bucket, '_' + stat_group if stat_group != '' else '')
 
-            db = self.store.build_dbname(cluster=self.test.cbmonitor_clusters[cluster_idx],
+            db = self.store.build_dbname(cluster=cluster,
                                          collector=collector,
                                          bucket=bucket_group)
 
-            if self.store.exists(db, metric):
+            # Prefer complete histograms over reservoir samples when available
+            path = merged_histograms_path(cluster, db)
+            if (bucket_histogram := read_merged_histogram(path, metric)) is not None:
+                histogram.merge(bucket_histogram)
+            elif self.store.exists(db, metric):
                 timings += self.store.get_values(db, metric=metric)
 
-        if not timings:
+        if histogram.total:
+            for timing in timings:
+                histogram.record(timing / 1000)
+            values = histogram.percentiles(percentiles)
+        elif timings:
+            values = [np.percentile(timings, p) for p in percentiles]
+        else:
             logger.warn('No latency data found for operation = {}, collector = {}, stat_group = {}'
                         .format(operation, collector, stat_group))
             return []
 
         latencies = [
-            round(latency) if (latency := np.percentile(timings, p)) > 100 else round(latency, 2)
-            for p in percentiles
+            round(latency) if latency > 100 else round(latency, 2)
+            for latency in values
         ]
 
         return latencies
@@ -979,6 +1074,32 @@ class MetricHelper:
 
         return avg_rss, self._snapshots, metric_info
 
+    def avg_io_amplification(self, metric: str = 'write_amp') -> Metric:
+        """Average one of the io_amplification stats across KV nodes, NaN without samples."""
+        metric_id = '{}_avg_{}'.format(self.test_config.name, metric)
+        title = 'Avg. {},{}'.format(
+            metric.replace('_', ' '), self._title.split(',')[-1]
+        )
+        metric_info = self._metric_info(metric_id, title, chirality=-1)
+
+        values = []
+        for (cluster_name, _), servers in zip(
+                self.cluster_spec.clusters,
+                self.cluster_spec.servers_by_cluster_and_role('kv'),
+        ):
+            cluster = list(filter(lambda name: name.startswith(cluster_name),
+                                  self.test.cbmonitor_clusters))[0]
+            for server in servers:
+                hostname = server.replace('.', '')
+                db = self.store.build_dbname(cluster=cluster,
+                                             collector='io_amplification',
+                                             server=hostname)
+                values += self.store.get_values(db, metric=metric)
+
+        io_amplification = round(np.average(values), 2) if values else np.nan
+
+        return io_amplification, self._snapshots, metric_info
+
     def memory_overhead(self, key_size: int = 20) -> Metric:
         metric_info = self._metric_info(chirality=-1)
 
@@ -1181,24 +1302,26 @@ class MetricHelper:
             return False
         return True
 
-    def _parse_ycsb_throughput(self, operation: str = "access") -> int:
-        throughput = 0
-        if operation == "load":
-            ycsb_log_files = [filename
-                              for filename in glob.glob("YCSB/ycsb_load_*.log")
-                              if "stderr" not in filename]
-        else:
-            ycsb_log_files = [filename
-                              for filename in glob.glob("YCSB/ycsb_run_*.log")
-                              if "stderr" not in filename]
+    def _ycsb_stats_for(self, operation: str = "access") -> YCSBStats:
+        """Parse all YCSB client logs of the phase once and cache the result.
 
-        for filename in ycsb_log_files:
-            with open(filename) as fh:
-                for line in fh.readlines():
-                    if line.startswith('[OVERALL], Throughput(ops/sec)'):
-                        throughput += int(float(line.split()[-1]))
-                        break
-        return throughput
+        The cache is invalidated when the logs change, e.g., in the next phase.
+        """
+        pattern = "YCSB/ycsb_load_*.log" if operation == "load" else "YCSB/ycsb_run_*.log"
+        ycsb_log_files = sorted(filename
+                                for filename in glob.glob(pattern)
+                                if "stderr" not in filename)
+        state = tuple((filename, os.stat(filename).st_mtime, os.stat(filename).st_size)
+                      for filename in ycsb_log_files)
+        if self._ycsb_stats.get(operation, (None,))[0] != state:
+            stats = YCSBStats()
+            for filename in ycsb_log_files:
+                stats.parse(filename)
+            self._ycsb_stats[operation] = state, stats
+        return self._ycsb_stats[operation][1]
+
+    def _parse_ycsb_throughput(self, operation: str = "access") -> int:
+        return self._ycsb_stats_for(operation).throughput
 
     def _parse_pytpcc_throughput(self) -> int:
         executed = 0
@@ -1214,131 +1337,17 @@ class MetricHelper:
                             executed = line.split()[1]
         return int(executed)
 
-    def _ycsb_perc_calc(self, _temp: List[Number], io_type: str, percentile: Number,
-                        lat_dic: Dict[str, Number], _fc: int) -> Dict[str, Number]:
-        pio_type = '{}th Percentile {}'.format(percentile, io_type)
-        p_lat = round(np.percentile(_temp, percentile) / 1000, 3)
-        if _fc > 1:
-            p_lat = round((((lat_dic[pio_type] * (_fc - 1)) + p_lat) / _fc), 3)
-        lat_dic.update({pio_type: p_lat})
-        return lat_dic
-
-    def _ycsb_avg_calc(self, _temp: List[Number], io_type: str, lat_dic: Dict[str, Number],
-                       _fc: int) -> Dict[str, Number]:
-        aio_type = 'Average {}'.format(io_type)
-        a_lat = round((sum(_temp) / len(_temp)) / 1000, 3)
-        if _fc > 1:
-            a_lat = round((((lat_dic[aio_type] * (_fc - 1)) + a_lat) / _fc), 3)
-        lat_dic.update({aio_type: a_lat})
-        return lat_dic
-
     def _parse_ycsb_latency(self, percentile: str, operation: str = "access") -> int:
-        lat_dic = {}
-        _temp = []
-        _fc = 1
-        if operation == "load":
-            ycsb_log_files = [filename
-                              for filename in glob.glob("YCSB/ycsb_load_*.log")
-                              if "stderr" not in filename]
-        else:
-            ycsb_log_files = [filename
-                              for filename in glob.glob("YCSB/ycsb_run_*.log")
-                              if "stderr" not in filename]
-        for filename in ycsb_log_files:
-            fh2 = open(filename)
-            _l1 = fh2.readlines()
-            _l1_len = len(_l1)
-            fh = open(filename)
-            _c = 0
-            for x in range(_l1_len - 1):
-                line = fh.readline()
-                if re.search('], (.*?)000,', line):
-                    io_type = line.split('[')[1].split(']')[0]
-                    _n = 0
-                    while (line.startswith('[{}]'.format(io_type))):
-                        lat = float(line.split()[-1])
-                        _temp.append(lat)
-                        line = fh.readline()
-                        _n += 1
-                    _temp.sort()
-                    if "FAILED" not in io_type and "CLEANUP" not in io_type:
-                        lat_dic = self._ycsb_perc_calc(_temp=_temp,
-                                                       io_type=io_type,
-                                                       lat_dic=lat_dic,
-                                                       _fc=_fc,
-                                                       percentile=percentile)
-                        lat_dic = self._ycsb_avg_calc(_temp=_temp,
-                                                      io_type=io_type,
-                                                      lat_dic=lat_dic,
-                                                      _fc=_fc)
-                    _temp.clear()
-                    _c += _n
-                _c += 1
-                x += _c
-            _fc += 1
-        return lat_dic
+        return self._ycsb_stats_for(operation).latencies(percentile)
 
     def ycsb_get_max_latency(self):
-        max_lats = {}
-        ycsb_log_files = [filename
-                          for filename in glob.glob("YCSB/ycsb_run_*.log")
-                          if "stderr" not in filename]
-        for filename in ycsb_log_files:
-            fh = open(filename)
-            lines = fh.readlines()
-            num_lines = len(lines)
-
-            fh2 = open(filename)
-            for x in range(0, num_lines):
-                line = fh2.readline()
-                if line.find("], MaxLatency(us),") >= 1:
-                    parts = line.split(",")
-                    type = parts[0].replace("[", "").replace("]", "")
-                    if type == "CLEANUP"\
-                            or "FAILED" in type:
-                        continue
-                    value = parts[2].strip()
-                    max_lats[type] = max(float(value)/1000.0, max_lats.get(type, 0))
-
-        return max_lats
+        return self._ycsb_stats_for().max_latencies
 
     def ycsb_get_failed_ops(self):
-        failures = {"READ": 0, "UPDATE": 0}
-        ycsb_log_files = [filename
-                          for filename in glob.glob("YCSB/ycsb_run_*.log")
-                          if "stderr" not in filename]
-        for filename in ycsb_log_files:
-            fh = open(filename)
-            lines = fh.readlines()
-            num_lines = len(lines)
-
-            fh2 = open(filename)
-            for x in range(0, num_lines):
-                line = fh2.readline()
-                if line.find("-FAILED], Operations,") >= 1:
-                    parts = line.split(",")
-                    type = parts[0].replace("[", "").replace("]", "").split("-")[0]
-                    if type in ["READ", "UPDATE"]:
-                        value = parts[2].strip()
-                        failures[type] = int(value) + failures.get(type, 0)
-        return failures
+        return self._ycsb_stats_for().failures
 
     def ycsb_get_gcs(self):
-        ycsb_log_files = [filename
-                          for filename in glob.glob("YCSB/ycsb_run_*.log")
-                          if "stderr" not in filename]
-        gcs = 0
-        for filename in ycsb_log_files:
-            fh = open(filename)
-            lines = fh.readlines()
-            num_lines = len(lines)
-            fh2 = open(filename)
-            for x in range(0, num_lines):
-                line = fh2.readline()
-                if line.find("[TOTAL_GCs], Count,") >= 0:
-                    gcs += int(line.split(",")[2].strip())
-
-        return gcs
+        return self._ycsb_stats_for().gcs
 
     def ycsb_gcs(self) -> Metric:
         title = '{}, {}'.format("Garbage Collections", self._title)
@@ -1,5 +1,6 @@
 import time
-from typing import Callable, Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterable, Optional, Union
 
 from logger import logger
 from perfrunner.helpers import misc
@@ -9,6 +10,54 @@ from perfrunner.remote import Remote
 from perfrunner.settings import ClusterSpec
 
 
+class AdaptivePoller:
+
+    """Choose polling intervals based on the estimated time to completion.
+
+    The remaining amount of work (e.g., the size of a queue) is tracked between
+    polls and the next poll happens halfway to the estimated completion. This
+    never polls less often than the nominal interval and polls every
+    MIN_INTERVAL seconds close to completion. Without progress, the intervals
+    grow exponentially from MIN_INTERVAL to the nominal interval.
+    """
+
+    MIN_INTERVAL = 0.1
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.backoff = self.MIN_INTERVAL
+        self.last_poll = None
+
+    def next_interval(self, remaining: Optional[float] = None) -> float:
+        now = time.time()
+        last_poll, self.last_poll = self.last_poll, (now, remaining)
+
+        if remaining is not None and last_poll and last_poll[1] is not None \
+                and remaining < last_poll[1]:
+            rate = (last_poll[1] - remaining) / (now - last_poll[0])
+            eta = remaining / rate
+            self.backoff = min(max(eta / 2, self.MIN_INTERVAL), self.interval)
+            return self.backoff
+
+        interval, self.backoff = self.backoff, min(self.backoff * 2, self.interval)
+        return interval
+
+
+class LogThrottle:
+
+    """Limit progress logging to once per interval, however often the state is polled."""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.last_log = 0
+
+    def due(self) -> bool:
+        if (now := time.time()) - self.last_log < self.interval:
+            return False
+        self.last_log = now
+        return True
+
+
 class Monitor:
 
     MAX_RETRY = 150
@@ -34,6 +83,8 @@ class Monitor:
     DEFAULT_REBALANCE_JOB_TIMEOUT = 3600
     TIMEOUT = 3600 * 12
 
+    MAX_PARALLEL_CHECKS = 16
+
     DISK_QUEUES = (
         'ep_queue_size',
         'ep_flusher_todo',
@@ -74,17 +125,48 @@ class Monitor:
         if cluster_spec.capella_infrastructure:
             self.rebalance_timeout = rebalance_timeout or self.DEFAULT_REBALANCE_JOB_TIMEOUT
 
+        # Managed clusters don't expose the long-polling endpoints
+        self.long_polling = not cluster_spec.cloud_infrastructure
+
+    def wait_for(self, remaining: Callable[[], Union[float, bool]],
+                 polling_interval: Optional[float] = None, timeout: float = TIMEOUT) -> bool:
+        """Poll until remaining() returns 0 or False, return False on timeout.
+
+        Numeric results are used to adapt the polling intervals to the progress.
+        """
+        poller = AdaptivePoller(polling_interval or self.POLLING_INTERVAL)
+        deadline = time.time() + timeout
+        while left := remaining():
+            if time.time() > deadline:
+                return False
+            time.sleep(poller.next_interval(None if left is True else left))
+        return True
+
+    def wait_for_pool_change(self, host: str, etag: str, timeout: float) -> str:
+        """Wait until the cluster state changes, but no longer than the timeout."""
+        if self.long_polling:
+            return self.rest.wait_for_pool_change(host, etag, timeout)
+        time.sleep(timeout)
+        return etag
+
+    def run_in_parallel(self, func: Callable, *iterables: Iterable) -> list:
+        """Run checks against multiple hosts or buckets concurrently."""
+        with ThreadPoolExecutor(max_workers=self.MAX_PARALLEL_CHECKS) as executor:
+            return list(executor.map(func, *iterables))
+
     def wait_for_rebalance_to_begin(self, host):
         logger.info('Waiting for rebalance to start')
 
         is_running = False
+        etag = ''
         start_time = time.time()
         while not is_running:
             is_running, progress = self.rest.get_task_status(host, task_type='rebalance')
             logger.info('Rebalance running: {}'.format(is_running))
             if time.time() - start_time > self.TIMEOUT:
                 raise Exception('Monitoring got stuck')
-            time.sleep(self.POLLING_INTERVAL)
+            if not is_running:
+                etag = self.wait_for_pool_change(host, etag, self.POLLING_INTERVAL)
 
         logger.info('Rebalance started. Rebalance progress: {} %'.format(progress))
 
@@ -93,9 +175,11 @@ class Monitor:
         is_running = True
         last_progress = 0
         last_progress_time = time.time()
+        etag = ''
 
         while is_running:
-            time.sleep(self.POLLING_INTERVAL)
+            # The cluster state changes as soon as the rebalance stops
+            etag = self.wait_for_pool_change(host, etag, self.POLLING_INTERVAL)
 
             is_running, progress = self.rest.get_task_status(host, task_type="rebalance")
             if progress == last_progress:
@@ -113,9 +197,10 @@ class Monitor:
     def wait_for_cluster_balanced(self, host: str, timeout_secs: int = 20) -> bool:
         """Wait for the cluster to become balanced."""
         is_balanced = False
+        etag = ''
         deadline = time.time() + timeout_secs
         while time.time() < deadline and not (is_balanced := self.rest.is_balanced(host)):
-            time.sleep(self.POLLING_INTERVAL)
+            etag = self.wait_for_pool_change(host, etag, self.POLLING_INTERVAL)
 
         if is_balanced:
             logger.info("Cluster is balanced")
@@ -138,10 +223,12 @@ class Monitor:
 
     def _wait_for_empty_queues(self, host, bucket, queues, stats_function):
         metrics = list(queues)
+        throttle = LogThrottle(self.POLLING_INTERVAL)
 
-        start_time = time.time()
-        while metrics:
+        def queue_size() -> int:
             bucket_stats = stats_function(host, bucket)
+            verbose = throttle.due()
+            total = 0
             # As we are changing metrics in the loop; take a copy of it to
             # iterate over.
             for metric in list(metrics):
@@ -149,7 +236,9 @@ class Monitor:
                 if stats:
                     last_value = stats[-1]
                     if last_value:
-                        logger.info('{} = {:,}'.format(metric, last_value))
+                        if verbose:
+                            logger.info('{} = {:,}'.format(metric, last_value))
+                        total += last_value
                         continue
                     else:
                         logger.info('{} reached 0'.format(metric))
@@ -157,43 +246,45 @@ class Monitor:
                 else:
                     logger.info('{} reached 0'.format(metric))
                     metrics.remove(metric)
-            if metrics:
-                time.sleep(self.POLLING_INTERVAL)
-            if time.time() - start_time > self.TIMEOUT:
-                raise Exception('Monitoring got stuck')
+            return total
+
+        if not self.wait_for(queue_size):
+            raise Exception('Monitoring got stuck')
 
     def _wait_for_empty_dcp_queues(self, host, bucket, stats_function):
-        start_time = time.time()
-        while True:
+        throttle = LogThrottle(self.POLLING_INTERVAL)
+
+        def items_remaining() -> Union[int, bool]:
             kv_dcp_stats = stats_function(host, bucket)
             try:
                 if stats := int(kv_dcp_stats['data'][0]['values'][-1][1]):
-                    logger.info('{} = {}'.format('ep_dcp_replica_items_remaining', stats))
+                    if throttle.due():
+                        logger.info('{} = {}'.format('ep_dcp_replica_items_remaining', stats))
                 else:
                     logger.info('{} reached 0'.format('ep_dcp_replica_items_remaining'))
-                    break
+                return stats
             except Exception:
-                pass
+                return True
 
-            if time.time() - start_time > self.TIMEOUT:
-                raise Exception('DCP queue Monitoring got stuck')
-            time.sleep(self.POLLING_INTERVAL)
+        if not self.wait_for(items_remaining):
+            raise Exception('DCP queue Monitoring got stuck')
 
     def _wait_for_replica_count_match(self, host, bucket):
-        start_time = time.time()
         bucket_info = self.rest.get_bucket_info(host, bucket)
         replica_number = int(bucket_info['replicaNumber'])
-        while replica_number:
+        throttle = LogThrottle(self.POLLING_INTERVAL)
+
+        def missing_replica_items() -> int:
             bucket_stats = self.rest.get_bucket_stats(host, bucket)
             curr_items = bucket_stats['op']['samples'].get("curr_items")[-1]
             replica_curr_items = bucket_stats['op']['samples'].get("vb_replica_curr_items")[-1]
-            logger.info("curr_items: {}, replica_curr_items: {}".format(curr_items,
-                                                                        replica_curr_items))
-            if (curr_items * replica_number) == replica_curr_items:
-                break
-            time.sleep(self.POLLING_INTERVAL)
-            if time.time() - start_time > self.TIMEOUT:
-                raise Exception('Replica items monitoring got stuck')
+            if throttle.due():
+                logger.info("curr_items: {}, replica_curr_items: {}".format(curr_items,
+                                                                            replica_curr_items))
+            return abs(curr_items * replica_number - replica_curr_items)
+
+        if replica_number and not self.wait_for(missing_replica_items):
+            raise Exception('Replica items monitoring got stuck')
 
     def _wait_for_replication_completion(self, host: str, bucket: str, link1: str, link2: str):
 
@@ -354,14 +445,16 @@ class Monitor:
         # No need to check for every bucket if we have multiple buckets
         if bucket == "bucket-1" and num_replication == 0:
             logger.info("Sleep until xdcr_changes_left_total starts to be updated")
-            while self.rest.get_xdcr_changes_left_total(host, bucket) <= 0:
-                time.sleep(self.POLLING_INTERVAL)
-                if time.time() - start_time > self.TIMEOUT:
-                    raise Exception('xdcr_changes_left was not updated')
+            if not self.wait_for(lambda: self.rest.get_xdcr_changes_left_total(host, bucket) <= 0):
+                raise Exception('xdcr_changes_left was not updated')
+        poller = AdaptivePoller(self.POLLING_INTERVAL)
+        throttle = LogThrottle(self.POLLING_INTERVAL)
         while True:
             xdcr_changes_left_total = self.rest.get_xdcr_changes_left_total(host, bucket)
             if xdcr_changes_left_total:
-                logger.info('xdcr_changes_left_total = {:,}'.format(xdcr_changes_left_total))
+                if throttle.due():
+                    logger.info('xdcr_changes_left_total = {:,}'
+                                .format(xdcr_changes_left_total))
                 if xdcr_changes_left_total == 1:
                     xdcr_docs_written_total = self.rest.get_xdcr_docs_written_total(host, bucket)
                     logger.info('xdcr_docs_written_total = {:,}'.format(xdcr_docs_written_total))
@@ -381,7 +474,7 @@ class Monitor:
             elif xdcr_changes_left_total == 0:
                 logger.info('xdcr_changes_left_total reached 0')
                 break
-            time.sleep(self.POLLING_INTERVAL)
+            time.sleep(poller.next_interval(xdcr_changes_left_total))
             if time.time() - start_time > self.TIMEOUT:
                 raise Exception('Monitoring got stuck')
 
@@ -452,17 +545,15 @@ class Monitor:
         if not max_retry:
             max_retry = self.MAX_RETRY
 
-        retries = 0
-        while retries < max_retry:
+        throttle = LogThrottle(self.POLLING_INTERVAL)
+
+        def missing_items() -> int:
             curr_items = self._get_num_items(host, bucket, bucket_replica, total=True)
-            if curr_items == num_items:
-                break
-            else:
+            if curr_items != num_items and throttle.due():
                 logger.info('{}(curr_items) != {}(num_items)'.format(curr_items, num_items))
+            return abs(num_items - curr_items)
 
-            time.sleep(self.POLLING_INTERVAL)
-            retries += 1
-        else:
+        if not self.wait_for(missing_items, timeout=max_retry * self.POLLING_INTERVAL):
             actual_items = self._get_num_items(host, bucket, bucket_replica, total=True)
             raise Exception('Mismatch in the number of items: {}'
                             .format(actual_items))
@@ -526,14 +617,16 @@ class Monitor:
         logger.info('Monitoring active compression status')
 
         memcached_port = self.rest.get_memcached_port(host)
+        throttle = LogThrottle(self.POLLING_INTERVAL)
 
-        json_docs = -1
-        while json_docs:
+        def uncompressed_items() -> int:
             stats = memcached.get_stats(host, memcached_port, bucket)
             json_docs = int(stats['ep_active_datatype_json'])
-            if json_docs:
+            if json_docs and throttle.due():
                 logger.info('Still uncompressed: {:,} items'.format(json_docs))
-                time.sleep(self.POLLING_INTERVAL)
+            return json_docs
+
+        self.wait_for(uncompressed_items, timeout=float('inf'))
         logger.info('All items are compressed')
 
     def monitor_node_health(
@@ -725,12 +818,9 @@ class Monitor:
                 num_pending.append(val)
             return num_pending
 
-        expected_num_pending = [0] * len(indexes)
-        while True:
-            time.sleep(self.POLLING_INTERVAL_INDEXING)
-            curr_num_pending = get_num_docs_index_pending()
-            if curr_num_pending == expected_num_pending:
-                break
+        time.sleep(self.POLLING_INTERVAL_INDEXING)
+        self.wait_for(lambda: sum(get_num_docs_index_pending()),
+                      polling_interval=self.POLLING_INTERVAL_INDEXING, timeout=float('inf'))
         curr_num_indexed = get_num_docs_indexed()
         logger.info("Number of Items indexed {}".format(curr_num_indexed))
 
@@ -777,12 +867,10 @@ class Monitor:
                 num_pending.append(val)
             return num_pending
 
-        expected_num_pending = [0] * len(indexes)
-        while True:
-            time.sleep(self.POLLING_INTERVAL_INDEXING * 10)
-            curr_num_pending = get_num_docs_index_pending()
-            if curr_num_pending == expected_num_pending:
-                break
+        time.sleep(self.POLLING_INTERVAL_INDEXING * 10)
+        self.wait_for(lambda: sum(get_num_docs_index_pending()),
+                      polling_interval=self.POLLING_INTERVAL_INDEXING * 10,
+                      timeout=float('inf'))
 
         curr_num_indexed = get_num_docs_indexed()
         logger.info("Number of Items indexed {}".format(curr_num_indexed))
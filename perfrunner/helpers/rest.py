@@ -392,6 +392,14 @@ class DefaultRestHelper(RestBase):
     def get_counters(self, host: str) -> dict:
         return self.get(url=self._get_api_url(host=host, path='pools/default')).json()['counters']
 
+    def wait_for_pool_change(self, host: str, etag: str = '', timeout: float = 1) -> str:
+        """Long-poll pools/default until the cluster state changes or the timeout expires.
+
+        Return the etag of the current state, which identifies it in the next call.
+        """
+        path = 'pools/default?waitChange={}&etag={}'.format(int(timeout * 1000), etag)
+        return self.get(url=self._get_api_url(host=host, path=path)).json().get('etag', '')
+
     def is_balanced(self, host: str) -> bool:
         logger.info(f"Checking if cluster is balanced using rebalance counters ({host})")
         counters = self.get_counters(host)
@@ -1865,10 +1873,14 @@ class DefaultRestHelper(RestBase):
         resp = self.get(url=self._get_api_url(host=host, path='logs/rebalanceReport'))
         return resp.json()
 
-    def fts_search_query(self, host: str, indexName: str,  data: dict) -> dict:
+    def fts_search_query(self, host: str, indexName: str,  data: dict,
+                         session: Optional[requests.Session] = None) -> dict:
         url = self._get_api_url(host=host, path=f"api/index/{indexName}/query",
                                 plain_port=FTS_PORT, ssl_port=FTS_PORT_SSL)
-        resp = self.post(url=url, data= json.dumps(data))
+        if session is not None:
+            resp = self.session_post(session, url=url, data=json.dumps(data))
+        else:
+            resp = self.post(url=url, data= json.dumps(data))
         return resp.json()
 
     def is_persistence_active(self, host: str) -> str:
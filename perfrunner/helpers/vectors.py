@@ -0,0 +1,85 @@
+import os
+from typing import Iterable
+
+import numpy as np
+
+SIMILARITIES = ('l2_norm', 'dot_product', 'cosine')
+
+
+def read_vectors(path: str) -> np.ndarray:
+    """Memory-map a vector dataset stored in the fvecs, bvecs, ivecs or npy format.
+
+    Every record of a *vecs file is the little-endian int32 dimension
+    followed by the components. Rows are returned as a read-only view of the
+    file, so vectors are only paged in when accessed.
+
+    See also http://corpus-texmex.irisa.fr/
+    """
+    ext = os.path.splitext(path)[1]
+    if ext == '.npy':
+        return np.load(path, mmap_mode='r')
+
+    dtypes = {'.fvecs': np.dtype('<f4'), '.bvecs': np.dtype('u1'), '.ivecs': np.dtype('<i4')}
+    if ext not in dtypes:
+        raise ValueError('Unsupported vector file format: {}'.format(path))
+    dtype = dtypes[ext]
+
+    dim = int(np.fromfile(path, dtype='<i4', count=1)[0])
+    header = 4 // dtype.itemsize
+    records = np.memmap(path, dtype=dtype, mode='r')
+    return records.reshape(-1, header + dim)[:, header:]
+
+
+def parse_text_vector(line: str, dtype=np.float64) -> np.ndarray:
+    """Parse a line of a JTS test data file: two leading fields followed by components."""
+    return np.array(line.split()[2:], dtype=dtype)
+
+
+def exact_neighbours(base: np.ndarray, queries: np.ndarray, k: int,
+                     similarity: str = 'l2_norm', block_size: int = 16384) -> np.ndarray:
+    """Return the row numbers of the k nearest base vectors for every query.
+
+    Base vectors are processed in blocks, so the dataset may be memory-mapped
+    and much larger than RAM. Every block is scored against all queries with a
+    single matrix product and merged into the running top-k candidates.
+    """
+    if similarity not in SIMILARITIES:
+        raise ValueError('Unknown similarity: {}'.format(similarity))
+
+    queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+    if similarity == 'cosine':
+        queries = queries / np.linalg.norm(queries, axis=1, keepdims=True)
+
+    best_scores = np.full((len(queries), k), np.inf, dtype=np.float32)
+    best_rows = np.zeros((len(queries), k), dtype=np.int64)
+
+    for start in range(0, len(base), block_size):
+        block = np.asarray(base[start:start + block_size], dtype=np.float32)
+        if similarity == 'cosine':
+            block = block / np.linalg.norm(block, axis=1, keepdims=True)
+
+        # Lower is better. The squared norm of the query doesn't affect the order.
+        scores = queries @ block.T
+        if similarity == 'l2_norm':
+            scores *= -2
+            scores += np.einsum('ij,ij->i', block, block)
+        else:
+            np.negative(scores, out=scores)
+
+        top = min(k, len(block))
+        rows = np.argpartition(scores, top - 1, axis=1)[:, :top]
+        scores = np.concatenate([best_scores,
+                                 np.take_along_axis(scores, rows, axis=1)], axis=1)
+        rows = np.concatenate([best_rows, rows + start], axis=1)
+
+        best = np.argpartition(scores, k - 1, axis=1)[:, :k]
+        best_scores = np.take_along_axis(scores, best, axis=1)
+        best_rows = np.take_along_axis(rows, best, axis=1)
+
+    order = np.argsort(best_scores, axis=1, kind='stable')
+    return np.take_along_axis(best_rows, order, axis=1)[:, :min(k, len(base))]
+
+
+def recall_at_k(ids: Iterable[str], truth: Iterable[str], k: int) -> float:
+    """Return the fraction of the top-k ground truth found in the top-k results."""
+    return len(set(list(ids)[:k]) & set(list(truth)[:k])) / float(k)
@@ -1,4 +1,5 @@
 import os
+import shutil
 import signal
 import sys
 import time
@@ -60,6 +61,7 @@ from perfrunner.workloads.tpcds import (
 from perfrunner.workloads.vectordb_bench import run_vectordb_bench_case
 from perfrunner.workloads.xdcr_conflict_sim import run_conflictsim
 from perfrunner.workloads.ycsb import ycsb_data_load, ycsb_workload
+from spring.docgen import DocumentCorpus
 
 try:
     set_start_method("fork")
@@ -510,6 +512,7 @@ class RemoteWorkerManager:
             self.remote.terminate_client_pods(self.worker_path)
         else:
             self.remote.terminate_client_processes()
+            self.remote.remove_worker_dir(self.WORKER_HOME, DocumentCorpus.DIR)
 
     def run_sg_tasks(self,
                      task: Callable,
@@ -659,6 +662,7 @@ class LocalWorkerManager(RemoteWorkerManager):
     def terminate(self):
         logger.info('Terminating Celery workers')
         local.kill_process('celery')
+        shutil.rmtree(DocumentCorpus.DIR, ignore_errors=True)
 
     def run_sg_tasks(self,
                      task: Callable,
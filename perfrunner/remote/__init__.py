@@ -39,6 +39,10 @@ class Remote:
             quiet=True,
         )
 
+    @all_clients
+    def remove_worker_dir(self, worker_home: str, name: str):
+        run('rm -fr {}/perfrunner/{}'.format(worker_home, name))
+
     @all_clients
     def init_repo(self, worker_home: str, cherrypick: Optional[str] = None):
         run('rm -fr {}'.format(worker_home))
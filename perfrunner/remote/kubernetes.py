@@ -896,6 +896,10 @@ class RemoteKubernetes(Remote):
         for worker in self.get_worker_pods():
             self.k8s_client(f"cp {cert} default/{worker}:{worker_home}/")
 
+    def put_worker_file(self, file: str, worker_home: str):
+        for worker in self.get_worker_pods():
+            self.k8s_client(f"cp {file} default/{worker}:{worker_home}/")
+
     def generate_ssl_keystore(self, root_certificate, keystore_file, storepass, worker_home):
         pass
 
@@ -777,6 +777,10 @@ class RemoteLinux(Remote):
     def cloud_put_scanfile(self, file, file_path):
         put(file, file_path + '/perfrunner/' + file)
 
+    @all_clients
+    def put_worker_file(self, file: str, worker_home: str):
+        put(file, worker_home + '/perfrunner/')
+
     @master_client
     def run_cbindexperf(self, path_to_tool: str, node: str,
                         rest_username: str,
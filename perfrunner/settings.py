@@ -1045,6 +1045,10 @@ class StatsSettings:
 
     REPORT_FOR_ALL_CLUSTERS = 0
 
+    STORE = 'cbmonitor'  # Or 'local' for the embedded store
+    STORE_DIR = 'perfstore'
+    UPLOAD = 1  # Upload the local samples to cbmonitor at the end of the test
+
     def __init__(self, options: dict):
         self.enabled = int(options.get('enabled', self.ENABLED))
         self.post_to_sf = int(options.get('post_to_sf', self.POST_TO_SF))
@@ -1060,6 +1064,9 @@ class StatsSettings:
             options.get('traced_processes', '').split()
         self.secondary_statsfile = options.get('secondary_statsfile',
                                                self.SECONDARY_STATSFILE)
+        self.store = options.get('store', self.STORE)
+        self.store_dir = options.get('store_dir', self.STORE_DIR)
+        self.upload = int(options.get('upload', self.UPLOAD))
 
         # Not used by all test classes, but can be used to decide whether to report KPIs for all
         # clusters or just the first (the default)
@@ -1393,6 +1400,7 @@ class PhaseSettings:
     RESET_THROTTLE_LIMIT = 'true'
 
     DOC_GEN = 'basic'
+    DOC_CORPUS_SIZE = 0
     POWER_ALPHA = 0
     ZIPF_ALPHA = 0
     KEY_PREFIX = None
@@ -1429,6 +1437,8 @@ class PhaseSettings:
     ITERATIONS = 1
 
     ASYNC = False
+    ASYNCIO = False
+    ASYNC_CONCURRENCY = 64
 
     KEY_FMTR = 'decimal'
 
@@ -1448,6 +1458,7 @@ class PhaseSettings:
     WORKING_SET_MOVE_DOCS = 0
 
     THROUGHPUT = float('inf')
+    OPEN_LOOP = False
     QUERY_THROUGHPUT = float('inf')
     N1QL_THROUGHPUT = float('inf')
 
@@ -1464,6 +1475,7 @@ class PhaseSettings:
     N1QL_BATCH_SIZE = 100
     N1QL_TIMEOUT = 0
     N1QL_QUERY_WEIGHT = ""
+    N1QL_CONCURRENCY = 1
 
     ARRAY_SIZE = 10
     NUM_CATEGORIES = 10 ** 6
@@ -1583,6 +1595,9 @@ class PhaseSettings:
 
         # KV settings
         self.doc_gen = options.get('doc_gen', self.DOC_GEN)
+        self.doc_corpus_size = int(options.get('doc_corpus_size', self.DOC_CORPUS_SIZE))
+        # Vectors of the vector_embedding docs (fvecs, bvecs, npy or a text query file)
+        self.vector_query_path = options.get('vector_query_path')
         self.power_alpha = float(options.get('power_alpha', self.POWER_ALPHA))
         self.zipf_alpha = float(options.get('zipf_alpha', self.ZIPF_ALPHA))
         self.key_prefix = options.get('key_prefix', self.KEY_PREFIX)
@@ -1612,6 +1627,7 @@ class PhaseSettings:
 
         self.ops = float(options.get('ops', self.OPS))
         self.throughput = float(options.get('throughput', self.THROUGHPUT))
+        self.open_loop = bool(int(options.get('open_loop', self.OPEN_LOOP)))
 
         self.working_set = float(options.get('working_set', self.WORKING_SET))
         self.working_set_access = int(options.get('working_set_access',
@@ -1622,6 +1638,8 @@ class PhaseSettings:
                                                        self.WORKING_SET_MOVE_DOCS))
         self.workers = int(options.get('workers', self.WORKERS))
         self.run_async = bool(int(options.get('async', self.ASYNC)))
+        self.asyncio = bool(int(options.get('asyncio', self.ASYNCIO)))
+        self.async_concurrency = int(options.get('async_concurrency', self.ASYNC_CONCURRENCY))
         self.key_fmtr = options.get('key_fmtr', self.KEY_FMTR)
 
         self.hot_reads = self.HOT_READS
@@ -1684,6 +1702,8 @@ class PhaseSettings:
                                                  self.N1QL_THROUGHPUT))
         self.n1ql_batch_size = int(options.get('n1ql_batch_size',
                                                self.N1QL_BATCH_SIZE))
+        self.n1ql_concurrency = int(options.get('n1ql_concurrency',
+                                                self.N1QL_CONCURRENCY))
         self.array_size = int(options.get('array_size', self.ARRAY_SIZE))
         self.num_categories = int(options.get('num_categories',
                                               self.NUM_CATEGORIES))
@@ -1977,6 +1997,7 @@ class JTSAccessSettings(PhaseSettings):
     FTS_PARTITIONS = "1"
     FTS_MAX_DCP_PARTITIONS = "0"
     FTS_FILE_BASED_REBAL_DISABLED = "true"
+    RECALL_WORKERS = 16
 
     def __init__(self, options: dict):
         super().__init__(options)
@@ -2057,6 +2078,10 @@ class JTSAccessSettings(PhaseSettings):
         self.report_percentiles = options.get('report_percentiles', "80,95").split(',')
         self.ground_truth_file_name = options.get('ground_truth_file_name', None)
         self.ground_truth_s3_path = options.get('ground_truth_s3_path', None)
+        # Compute exact ground truth locally from the base vectors (fvecs/bvecs/npy)
+        self.ground_truth_base_file = options.get('ground_truth_base_file', None)
+        self.ground_truth_key_format = options.get('ground_truth_key_format', '{}')
+        self.recall_workers = int(options.get('recall_workers', self.RECALL_WORKERS))
         self.k_nearest_neighbour = int(options.get("k_nearest_neighbour", 3))
         self.vector_dimension = int(options.get("vector_dimension", 0))
         self.fts_load_workers = int(options.get("fts_load_workers", "100"))
@@ -2323,9 +2348,6 @@ class IndexSettings:
         self.top_k_results = options.get('top_k_results', 10)
         self.statements = self.create_index_statements()
         self.vector_query_path = options.get("vector_query_path", None)
-        if self.vector_query_path:
-            with open(self.vector_query_path,'r') as f:
-                self.vector_query_map = f.readlines()
 
     def create_index_statements(self) -> list[str]:
         #  Here we generate all permutations of all subsets of index fields
@@ -23,6 +23,7 @@ from perfrunner.settings import (
     ClusterSpec,
     PhaseSettings,
     TargetIterator,
+    TargetSettings,
     TestConfig,
 )
 
@@ -346,11 +347,14 @@ class PerfTest:
 
     def wait_for_persistence(self):
         bucket_replica = self.test_config.bucket.replica_number
-        for target in self.target_iterator:
+
+        def wait_for_target(target: TargetSettings):
             self.monitor.monitor_disk_queues(target.node, target.bucket)
             self.monitor.monitor_dcp_queues(target.node, target.bucket, bucket_replica)
             self.monitor.monitor_replica_count(target.node, target.bucket)
 
+        self.monitor.run_in_parallel(wait_for_target, self.target_iterator)
+
     def wait_for_indexing(self, index_nodes: List[str] = [], statements: List[str] = []):
         index_nodes = index_nodes or self.index_nodes
         if statements or self.test_config.index_settings.statements:
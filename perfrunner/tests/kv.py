@@ -35,6 +35,10 @@ class KVTest(PerfTest):
 
         self.report_kpi()
 
+    def report_backlog_kpi(self):
+        if self.test_config.access_settings.open_loop:
+            self.reporter.post(*self.metrics.kv_backlog())
+
 
 class ReadLatencyTest(KVTest):
 
@@ -45,6 +49,7 @@ class ReadLatencyTest(KVTest):
     def _report_kpi(self):
         for metric in self.metrics.kv_latency(operation='get'):
             self.reporter.post(*metric)
+        self.report_backlog_kpi()
 
 
 class MixedLatencyTest(ReadLatencyTest):
@@ -56,6 +61,7 @@ class MixedLatencyTest(ReadLatencyTest):
         for operation in ('get', 'set', 'durable_set'):
             for metric in self.metrics.kv_latency(operation=operation, percentiles=percentiles):
                 self.reporter.post(*metric)
+        self.report_backlog_kpi()
 
     def run(self):
         self.load()
@@ -174,6 +180,7 @@ class ReadLatencyDGMTest(KVTest):
     def _report_kpi(self):
         for metric in self.metrics.kv_latency(operation='get'):
             self.reporter.post(*metric)
+        self.report_backlog_kpi()
 
 
 class MixedLatencyDGMTest(ReadLatencyDGMTest):
@@ -191,6 +198,7 @@ class ReadLatencyDGMCompactionTest(DGMCompactionTest):
     def _report_kpi(self):
         for metric in self.metrics.kv_latency(operation='get'):
             self.reporter.post(*metric)
+        self.report_backlog_kpi()
 
 
 class ReadLatencyDGMCompactedTest(DGMCompactedTest):
@@ -1,5 +1,6 @@
 import copy
 import json
+import math
 import time
 from typing import Callable
 
@@ -328,12 +329,12 @@ class MagmaBenchmarkTest(PerfTest):
 
 class KVTest(PerfTest):
     COLLECTORS = {'disk': True, 'latency': True, 'net': False, 'kvstore': True,
-                  'vmstat': True, 'cbstats_memory': True, 'cbstats_all': True}
+                  'vmstat': True, 'cbstats_memory': True, 'cbstats_all': True,
+                  'io_amplification': True}
     CB_STATS_PORT = 11209
 
     def __init__(self, *args):
         super().__init__(*args)
-        local.extract_cb_any(filename='couchbase')
         self.collect_per_server_stats = self.test_config.magma_settings.collect_per_server_stats
         self.disk_stats = {}
         self.memcached_stats = {}
@@ -341,17 +342,19 @@ class KVTest(PerfTest):
         self.iterator = TargetIterator(self.cluster_spec, self.test_config,
                                        self.test_config.load_settings.key_prefix)
 
+    def report_io_amplification(self):
+        """Post the average amplification measured by the io_amplification collector."""
+        if not self.COLLECTORS.get('io_amplification'):
+            return
+        for metric in ('write_amp', 'read_amp'):
+            value, snapshots, metric_info = self.metrics.avg_io_amplification(metric)
+            if not math.isnan(value):  # E.g., no reads from disk
+                self.reporter.post(value, snapshots, metric_info)
+
     def print_kvstore_stats(self):
         try:
-            uname, pwd = self.cluster_spec.rest_credentials
-            stdout, returncode = local.run_cbstats("kvstore", self.master_node, self.CB_STATS_PORT,
-                                                   uname, pwd, self.test_config.buckets[0])
-            if returncode != 0:
-                logger.warning("KVTest failed to get kvstore stats from server: {}"
-                               .format(self.master_node))
-                return
-
-            data = json.loads(stdout)
+            data = self.memcached.client.get_stats(self.master_node, self.CB_STATS_PORT,
+                                                   self.test_config.buckets[0], "kvstore")
             stats = {}
             for key, value in data.items():
                 if key.startswith(("rw_0:", "rw_1:", "rw_2:", "rw_3:")):
@@ -623,6 +626,7 @@ class ThroughputDGMMagmaTest(StabilityBootstrap):
     def _report_kpi(self):
         for metric in self.metrics.avg_ops():
             self.reporter.post(*metric)
+        self.report_io_amplification()
 
 
 class ThroughputCDCTest(CDCTest, ThroughputDGMMagmaTest):
@@ -791,6 +795,7 @@ class SingleNodeThroughputDGMMagmaTest(ThroughputDGMMagmaTest):
         self.COLLECTORS["latency"] = True
         self.COLLECTORS["vmstat"] = True
 
+        local.extract_cb_any(filename='couchbase')  # cbepctl is only available in the package
         local.cbepctl(
             master_node=self.master_node,
             cluster_spec=self.cluster_spec,
@@ -1533,7 +1538,6 @@ class UniDirXdcrInitHiDDTest(UniDirXdcrInitTest):
 
     def __init__(self, *args):
         super().__init__(*args)
-        local.extract_cb_any(filename='couchbase')
         self.collect_per_server_stats = self.test_config.magma_settings.collect_per_server_stats
 
     def run(self):
@@ -1727,7 +1731,6 @@ class N1QLThroughputHiDDTest(N1QLThroughputTest):
 
     def __init__(self, *args):
         super().__init__(*args)
-        local.extract_cb_any(filename='couchbase')
         self.collect_per_server_stats = self.test_config.magma_settings.collect_per_server_stats
         self.kv_iterator = TargetIterator(self.cluster_spec, self.test_config,
                                           self.test_config.load_settings.key_prefix)
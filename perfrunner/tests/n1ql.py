@@ -1,7 +1,9 @@
 import datetime
+import os
 import threading
 import time
 from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import cached_property
 from typing import Optional
 
 import numpy as np
@@ -1403,7 +1405,6 @@ class N1qlVectorSearchTest(N1QLLatencyRawStatementTest):
         query_node = self.query_nodes[0]
         gsi_settings = self.test_config.gsi_settings
         index_settings = self.test_config.index_settings
-        query_map = index_settings.vector_query_map
         indexes = gsi_settings.indexes
         probes = gsi_settings.vector_scan_probes.split(",")
 
@@ -1503,17 +1504,18 @@ class N1qlVectorSearchTest(N1QLLatencyRawStatementTest):
             recall = []
             accuracy = []
 
-            # Process all queries if query map is available
-            if not query_map:
+            # Process all queries if the query file is available
+            if not index_settings.vector_query_path:
                 break
             is_first_query = True
 
             # Use thread pool for parallel query execution
-            with ThreadPoolExecutor(max_workers=20) as executor:
+            with ThreadPoolExecutor(max_workers=20) as executor, \
+                    open(index_settings.vector_query_path) as query_file:
                 futures = []
 
-                # Submit all queries for parallel processing
-                for vector, truth in zip(query_map, ground_truth):
+                # Submit all queries for parallel processing, reading them line by line
+                for vector, truth in zip(query_file, ground_truth):
                     futures.append(executor.submit(process_query, vector, truth, probe,
                                                     is_first_query))
                     is_first_query = False
@@ -1652,6 +1654,19 @@ class N1qlVectorLatencyThroughputPreparedStatementTest(N1qlVectorSearchTest):
         access_settings = self.set_custom_query_settings(access_settings)
         PerfTest.access(self, settings=access_settings)
 
+    @cached_property
+    def worker_vector_query_path(self) -> Optional[str]:
+        """Copy the vector queries to the workers and return their path there.
+
+        Remote workers run in a fresh clone of the repository, so the local
+        query file doesn't exist there.
+        """
+        path = self.test_config.index_settings.vector_query_path
+        if path and self.worker_manager.is_remote:
+            self.remote.put_worker_file(path, self.worker_manager.WORKER_HOME)
+            path = os.path.basename(path)
+        return path
+
     def set_custom_query_settings(self, access_settings: AccessSettings):
         access_settings.n1ql_queries[0]['statement'] = access_settings.n1ql_queries[0][
             'statement'].replace("NPROBES", self.test_config.gsi_settings.vector_scan_probes)
@@ -1662,7 +1677,7 @@ class N1qlVectorLatencyThroughputPreparedStatementTest(N1qlVectorSearchTest):
         access_settings.n1ql_queries[0]['statement'] = access_settings.n1ql_queries[0][
             'statement'].replace("RERANKING",
                                  str(self.test_config.gsi_settings.vector_reranking).lower())
-        access_settings.vector_query_map = self.test_config.index_settings.vector_query_map
+        access_settings.vector_query_path = self.worker_vector_query_path
         return access_settings
 
     def report_recall_and_accuracy(self, probes, recalls, accuracies):
@@ -1835,7 +1850,7 @@ class N1qlVectorLatencyThroughputPreparedStatementFilterTest(
         access_settings.n1ql_workers = 0
         access_settings.filtering_percentage = \
             int(self.test_config.gsi_settings.vector_filter_percentage)
-        access_settings.vector_query_map = self.test_config.index_settings.vector_query_map
+        access_settings.vector_query_path = self.worker_vector_query_path
         if access_settings.workers > 0:
             PerfTest.access(self, settings=access_settings)
 
@@ -1861,7 +1876,7 @@ class N1qlVectorLatencyThroughputTestWithBgOps(
     def access(self):
         access_settings = self.test_config.access_settings
         access_settings.n1ql_workers = 0
-        access_settings.vector_query_map = self.test_config.index_settings.vector_query_map
+        access_settings.vector_query_path = self.worker_vector_query_path
         PerfTest.access_bg(self, settings=access_settings)
         time.sleep(60) # to start background workload
         super().access()
@@ -1,25 +1,57 @@
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from typing import Iterator, Optional
+
 import numpy as np
+import requests
+from requests.adapters import HTTPAdapter
 
 from logger import logger
 from perfrunner.helpers.rest import RestHelper
+from perfrunner.helpers.vectors import (
+    exact_neighbours,
+    parse_text_vector,
+    read_vectors,
+    recall_at_k,
+)
 
 
 class VectorRecallCalculator:
 
+    """Measure recall@k and top-1 accuracy of FTS vector queries.
+
+    Query vectors are streamed from the test data file in batches. The
+    searches of a batch run concurrently over a pooled HTTP session. While
+    they are in flight, the exact ground truth of the same batch is computed
+    locally from the base vectors if `ground_truth_base_file` is set,
+    otherwise it is read from the ground truth file.
+    """
+
+    BATCH_SIZE = 1000
+
     def __init__(self, settings, rest: RestHelper) -> None:
         self.settings = settings
         self.rest = rest
+        self.k = int(self.settings.k_nearest_neighbour)
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_maxsize=self.settings.recall_workers)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
 
-    def query_and_calculate_recall_and_accuracy(self, query, indexName,
-                                                groundTruth) -> tuple[float, int]:
-        searchResult = self.rest.fts_search_query(self.settings.fts_master_node, indexName, query)
-        k = query["knn"][0]["k"]
+    def search(self, query: dict, indexName: str) -> list[str]:
+        searchResult = self.rest.fts_search_query(self.settings.fts_master_node, indexName, query,
+                                                  session=self.session)
         if searchResult["total_hits"] > 0:
-            id_arr = [hit["id"] for hit in searchResult["hits"]]
-            recall = sum(x in id_arr[:k] for x in groundTruth[:k])/float(k)
-            return recall, int(id_arr[0] == groundTruth[0])
+            return [hit["id"] for hit in searchResult["hits"]]
         logger.error(f"Not found any hits for query:\n{query}")
-        return 0, 0
+        return []
+
+    def calculate_recall_and_accuracy(self, id_arr: list[str],
+                                      groundTruth: list[str]) -> tuple[float, int]:
+        if not id_arr:
+            return 0, 0
+        return recall_at_k(id_arr, groundTruth, self.k), int(id_arr[0] == groundTruth[0])
 
     def create_query(self, vectorlist, fts_raw_query_map, field_name, k=3) -> dict:
         query = {}
@@ -33,28 +65,61 @@ class VectorRecallCalculator:
             }]
         return query
 
+    def read_queries(self) -> Iterator[np.ndarray]:
+        with open(self.settings.test_data_file[1:]) as fh:
+            for line in fh:
+                yield parse_text_vector(line)
+
+    def read_ground_truth(self) -> Iterator[list[str]]:
+        with open(self.settings.ground_truth_file_name) as fh:
+            for line in fh:
+                yield line.split()
+
+    def calculate_ground_truth(self, base_vectors: np.ndarray,
+                               queries: list[np.ndarray]) -> list[list[str]]:
+        neighbours = exact_neighbours(base_vectors, np.stack(queries), self.k,
+                                      self.settings.vector_similarity_type or 'l2_norm')
+        key_format = self.settings.ground_truth_key_format
+        return [[key_format.format(row) for row in rows] for rows in neighbours.tolist()]
+
     def run(self) -> tuple[float, float]:
         logger.info("Querying the vectors and calculating recall and accuracy")
-        test_data_file = self.settings.test_data_file[1:]
         fts_raw_query_map = self.settings.fts_raw_query_map
         field_name = self.settings.test_query_field
-        k_nearest_neighbour = int(self.settings.k_nearest_neighbour)
         indexName = list(self.settings.fts_index_map.keys())[0]
-        test_file = open(test_data_file, 'r')
-        if self.settings.ground_truth_file_name:
-            ground_truth = [x.split() for x in
-                            open(self.settings.ground_truth_file_name, 'r').readlines()]
+
+        base_vectors: Optional[np.ndarray] = None
+        if self.settings.ground_truth_base_file:
+            logger.info("Calculating ground truth from {}"
+                        .format(self.settings.ground_truth_base_file))
+            base_vectors = read_vectors(self.settings.ground_truth_base_file)
+        elif self.settings.ground_truth_file_name:
+            ground_truth = self.read_ground_truth()
         else:
             logger.interrupt("GroundTruth file not found. Necessary for recall")
+
         recall = []
         accuracy = []
-        for vector, truth in zip(test_file.readlines(), ground_truth):
-            vectorList = [float(x) for x in vector.split()[2:]]
-            query = self.create_query(vectorList,
-                                      fts_raw_query_map, field_name, k_nearest_neighbour)
-            r, a = self.query_and_calculate_recall_and_accuracy(query, indexName, truth)
-            recall.append(r)
-            accuracy.append(a)
+        queries = self.read_queries()
+        with ThreadPoolExecutor(max_workers=self.settings.recall_workers) as executor:
+            for batch in iter(lambda: list(islice(queries, self.BATCH_SIZE)), []):
+                futures = [
+                    executor.submit(self.search,
+                                    self.create_query(vector.tolist(), fts_raw_query_map,
+                                                      field_name, self.k),
+                                    indexName)
+                    for vector in batch
+                ]
+                if base_vectors is not None:
+                    truths = self.calculate_ground_truth(base_vectors, batch)
+                else:
+                    truths = islice(ground_truth, len(batch))
+                for future, truth in zip(futures, truths):
+                    r, a = self.calculate_recall_and_accuracy(future.result(), truth)
+                    recall.append(r)
+                    accuracy.append(a)
+                logger.info(f"Evaluated {len(recall)} queries")
+
         avg_recall = np.mean(recall)
         avg_accuracy = np.average(accuracy)
         logger.info(f"Recall distribution:\n {recall}")
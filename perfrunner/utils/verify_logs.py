@@ -1,8 +1,9 @@
 import glob
+import re
 import zipfile
 from collections import defaultdict
-from multiprocessing import set_start_method
-from typing import List
+from multiprocessing import Pool, cpu_count, set_start_method
+from typing import Dict, List, Union
 
 from logger import logger
 from perfrunner.helpers.misc import pretty_dict
@@ -16,56 +17,108 @@ GOLANG_LOG_FILES = ("eventing.log",
                     "projector.log",
                     "query.log")
 
-
-def check_for_golang_panic(file_name: str) -> List[str]:
-    zf = zipfile.ZipFile(file_name)
-    panic_files = []
-    for name in zf.namelist():
-        if any(log_file in name for log_file in GOLANG_LOG_FILES):
-            data = zf.read(name)
-            if "panic" in str(data):
-                panic_files.append(name)
-    return panic_files
-
-
-def check_for_crash_files(file_name: str) -> List[str]:
-    zf = zipfile.ZipFile(file_name)
-    crash_files = []
-    for name in zf.namelist():
-        if name.endswith('.dmp'):
-            crash_files.append(name)
-    return crash_files
-
-
-def check_for_storage_corrupted(file_name: str) -> List[str]:
-    zf = zipfile.ZipFile(file_name)
-    storage_corrupted = False
-    for name in zf.namelist():
-        if "indexer.log" in name:
-            data = zf.read(name)
-            if "Storage corrupted and unrecoverable" in str(data):
-                storage_corrupted = True
-    return storage_corrupted
-
-
-def validate_logs(file_name: str):
-    panic_files = check_for_golang_panic(file_name)
-    crash_files = check_for_crash_files(file_name)
-    storage_corrupted = check_for_storage_corrupted(file_name)
-    return panic_files, crash_files, storage_corrupted
+# Failure type -> (pattern, log files to search)
+PATTERNS = {
+    'panics': (b"panic", GOLANG_LOG_FILES),
+    'storage_corrupted': (b"Storage corrupted and unrecoverable", ("indexer.log", )),
+}
+
+CHUNK_SIZE = 1024 ** 2
+
+MAX_LINE_LENGTH = 64 * 1024  # Longer lines are searched in pieces
+
+CONTEXT_LENGTH = 256
+
+
+def line_context(data: bytes, start: int, end: int) -> str:
+    """Return the line around a match, truncated to CONTEXT_LENGTH bytes."""
+    line_start = max(data.rfind(b'\n', 0, start) + 1, start - CONTEXT_LENGTH // 2)
+    line_end = data.find(b'\n', end)
+    if line_end < 0:
+        line_end = len(data)
+    line = data[line_start:min(line_end, line_start + CONTEXT_LENGTH)]
+    return line.decode(errors='replace').strip()
+
+
+def scan_member(zf: zipfile.ZipFile, name: str, patterns: Dict[str, bytes]) -> Dict[str, str]:
+    """Find the first line matching each pattern in a single pass over an archive member.
+
+    The member is decompressed in chunks and all patterns are matched at once
+    with a single alternation. Chunks are cut at the last line break, so
+    matches never cross chunk boundaries and line numbers can be tracked.
+    Lines longer than MAX_LINE_LENGTH are searched in overlapping pieces.
+    """
+    regex = re.compile(b'|'.join(re.escape(pattern) for pattern in patterns.values()))
+    failure_types = {pattern: failure_type for failure_type, pattern in patterns.items()}
+    overlap = max(len(pattern) for pattern in patterns.values()) - 1
+
+    found = {}
+    line_number = 1
+    tail = b''
+    with zf.open(name) as fh:
+        while len(found) < len(patterns):
+            chunk = fh.read(CHUNK_SIZE)
+            data = tail + chunk
+            if not chunk:  # The last line may lack a line break
+                end = keep = len(data)
+            else:
+                end = keep = data.rfind(b'\n') + 1
+                if not end:
+                    if len(data) <= MAX_LINE_LENGTH:
+                        tail = data
+                        continue
+                    # A match may start in the last bytes of the piece
+                    end, keep = len(data), max(len(data) - overlap, 0)
+
+            for match in regex.finditer(data, 0, end):
+                failure_type = failure_types[match.group()]
+                if failure_type not in found:
+                    found[failure_type] = 'line {}: {}'.format(
+                        line_number + data.count(b'\n', 0, match.start()),
+                        line_context(data, match.start(), match.end()),
+                    )
+
+            line_number += data.count(b'\n', 0, end)
+            tail = data[keep:]
+            if not chunk:
+                break
+
+    return found
+
+
+def validate_logs(file_name: str) -> Dict[str, Union[List[str], Dict[str, str]]]:
+    """Scan every member of a cbcollect archive once and return failures by type.
+
+    Crashes are reported as a list of dump files, other failures map archive
+    members to the first matching line.
+    """
+    failures = defaultdict(dict)
+    with zipfile.ZipFile(file_name) as zf:
+        for name in zf.namelist():
+            if name.endswith('.dmp'):
+                failures.setdefault('crashes', []).append(name)
+                continue
+
+            patterns = {
+                failure_type: pattern
+                for failure_type, (pattern, log_files) in PATTERNS.items()
+                if any(log_file in name for log_file in log_files)
+            }
+            if patterns:
+                for failure_type, context in scan_member(zf, name, patterns).items():
+                    failures[failure_type][name] = context
+    return dict(failures)
 
 
 def main():
     failures = defaultdict(dict)
 
-    for file_name in glob.iglob('./*.zip'):
-        panic_files, crash_files, storage_corrupted = validate_logs(file_name)
-        if panic_files:
-            failures['panics'][file_name] = panic_files
-        if crash_files:
-            failures['crashes'][file_name] = crash_files
-        if storage_corrupted:
-            failures['storage_corrupted'][file_name] = True
+    file_names: List[str] = glob.glob('./*.zip')
+    if file_names:
+        with Pool(processes=min(len(file_names), cpu_count())) as pool:
+            for file_name, found in zip(file_names, pool.imap(validate_logs, file_names)):
+                for failure_type, members in found.items():
+                    failures[failure_type][file_name] = members
 
     if failures:
         logger.interrupt(
@@ -1,5 +1,6 @@
 from datetime import timedelta
 
+from acouchbase.cluster import Cluster as AsyncCluster
 from couchbase import subdocument
 from couchbase.auth import PasswordAuthenticator
 from couchbase.cluster import Cluster
@@ -7,10 +8,29 @@ from couchbase.durability import DurabilityLevel, ServerDurability
 from couchbase.management.collections import CollectionSpec
 from couchbase.management.users import User
 from couchbase.options import QueryOptions
+from couchbase.transcoder import RawJSONTranscoder
 from couchbase.views import ViewQuery
 from txcouchbase.cluster import TxCluster
 
-from spring.cbgen_helpers import backoff, get_connection, quiet, time_all, timeit
+from spring.cbgen_helpers import (
+    async_quiet,
+    async_time_all,
+    async_timeit,
+    backoff,
+    get_connection,
+    quiet,
+    time_all,
+    timeit,
+)
+
+RAW_JSON_TRANSCODER = RawJSONTranscoder()
+
+
+def transcoder_options(doc) -> dict:
+    """Store pre-serialised documents (e.g., from DocumentCorpus) as they are."""
+    if isinstance(doc, bytes):
+        return {'transcoder': RAW_JSON_TRANSCODER}
+    return {}
 
 
 class CBAsyncGen4:
@@ -72,6 +92,7 @@ class CBAsyncGen4:
         return self.collection.upsert(
             key, doc,
             expiry=timedelta(seconds=ttl),
+            **transcoder_options(doc),
             # CBPS-1027 discusses the reason for this, still need to figure out the cause
             # durability=ClientDurability(
             #     replicate_to=ReplicateTo(replicate_to),
@@ -83,7 +104,8 @@ class CBAsyncGen4:
         return self.collection.upsert(
             key, doc,
             expiry=timedelta(seconds=ttl),
-            durability=ServerDurability(DurabilityLevel(durability))
+            durability=ServerDurability(DurabilityLevel(durability)),
+            **transcoder_options(doc),
         )
 
     def do_read(self, key: str):
@@ -93,6 +115,98 @@ class CBAsyncGen4:
         return self.collection.remove(key)
 
 
+class CBAsyncioGen4:
+
+    """Asyncio client built on the acouchbase API.
+
+    All operations are coroutines that return the same latencies as CBGen4,
+    the target collection is passed explicitly so that many operations can be
+    in flight concurrently.
+    """
+
+    TIMEOUT = 120  # seconds
+    N1QL_TIMEOUT = 600
+
+    def __init__(self, **kwargs):
+        self.connection_string, cert_path = get_connection(**kwargs)
+        self.authenticator = PasswordAuthenticator(
+            kwargs["username"], kwargs["password"], cert_path=cert_path
+        )
+        self.bucket_name = kwargs['bucket']
+        self.n1ql_timeout = kwargs.get("n1ql_timeout") or self.N1QL_TIMEOUT
+        self.collections = dict()
+
+    async def connect_collections(self, scope_collection_list):
+        # The cluster is bound to the running event loop
+        self.cluster = await AsyncCluster.connect(
+            self.connection_string,
+            authenticator=self.authenticator,
+            kv_timeout=timedelta(seconds=self.TIMEOUT),
+            query_timeout=timedelta(seconds=self.n1ql_timeout),
+        )
+        self.bucket = self.cluster.bucket(self.bucket_name)
+        await self.bucket.on_connect()
+        for scope_collection in scope_collection_list:
+            scope, collection = scope_collection.split(":")
+            if scope == "_default" and collection == "_default":
+                self.collections[scope_collection] = \
+                    self.bucket.default_collection()
+            else:
+                self.collections[scope_collection] = \
+                    self.bucket.scope(scope).collection(collection)
+
+    async def close(self):
+        await self.cluster.close()
+
+    def create(self, target: str, *args, **kwargs):
+        return self.do_upsert(self.collections[target], *args, **kwargs)
+
+    def create_durable(self, target: str, *args, **kwargs):
+        return self.do_upsert_durable(self.collections[target], *args, **kwargs)
+
+    def read(self, target: str, *args, **kwargs):
+        return self.do_read(self.collections[target], *args, **kwargs)
+
+    def update(self, target: str, *args, **kwargs):
+        return self.do_upsert(self.collections[target], *args, **kwargs)
+
+    def update_durable(self, target: str, *args, **kwargs):
+        return self.do_upsert_durable(self.collections[target], *args, **kwargs)
+
+    def delete(self, target: str, *args, **kwargs):
+        return self.do_delete(self.collections[target], *args, **kwargs)
+
+    @async_time_all
+    async def do_upsert(self, collection, key: str, doc: dict, persist_to: int = 0,
+                        replicate_to: int = 0, ttl: int = 0):
+        await collection.upsert(key, doc, expiry=timedelta(seconds=ttl),
+                                **transcoder_options(doc))
+
+    @async_time_all
+    async def do_upsert_durable(self, collection, key: str, doc: dict,
+                                durability: int = None, ttl: int = 0):
+        await collection.upsert(
+            key, doc,
+            expiry=timedelta(seconds=ttl),
+            durability=ServerDurability(DurabilityLevel(durability)),
+            **transcoder_options(doc),
+        )
+
+    @async_time_all
+    async def do_read(self, collection, key: str):
+        await collection.get(key)
+
+    @async_quiet
+    async def do_delete(self, collection, key: str):
+        await collection.remove(key)
+
+    @async_quiet
+    @async_timeit
+    async def n1ql_query(self, n1ql_query: str, options: QueryOptions):
+        async for _ in self.cluster.query(n1ql_query, options):
+            pass
+
+
 class CBGen4(CBAsyncGen4):
 
     TIMEOUT = 600  # seconds
@@ -1,18 +1,25 @@
+import fcntl
 import hashlib
 import json
 import math
+import mmap
+import os
 import random
+import tempfile
 import time
 import uuid
 from collections import deque
+from collections.abc import Mapping
 from datetime import date, datetime, timedelta
-from typing import Iterator, List, Tuple
+from functools import lru_cache
+from typing import Any, Iterator, List, Tuple
 
 import numpy as np
 import spooky
 from faker import Faker
 
 from fastdocgen import build_achievements
+from perfrunner.helpers.vectors import read_vectors
 from perfrunner.settings import PhaseSettings as WorkloadSettings
 from perfrunner.workloads.bigfun import query_gen
 from spring.dictionary import (
@@ -32,6 +39,15 @@ from spring.dictionary import (
     ZIP_CODES,
 )
 
+try:
+    from fastdocgen import (
+        build_document,
+        build_nested_document,
+        build_reverse_lookup_document,
+    )
+except ImportError:  # Extension built from an older source
+    build_document = build_nested_document = build_reverse_lookup_document = None
+
 PRIME = 4889388631
 
 MAX_PRIME = 25191867719
@@ -49,6 +65,11 @@ def hex_digest_64(key: str) -> str:
     return '%032x' % spooky.hash64(key)
 
 
+def dumps(doc) -> bytes:
+    """Serialise a document the same way the SDK JSON transcoder does."""
+    return json.dumps(doc, ensure_ascii=False).encode('utf-8')
+
+
 def decimal_fmtr(key: int, prefix: str) -> str:
     key = '%012d' % key
     if prefix:
@@ -317,6 +338,53 @@ class KeyForCASUpdate:
         return Key(number=number, prefix=self.prefix, fmtr=self.fmtr)
 
 
+class LazyDocument(Mapping):
+
+    """Document with fields built on demand.
+
+    The generator defines a builder for every field in its FIELDS dictionary.
+    Builders take the generator and the lazy document, which provides the key
+    and the alphabet. Values are memoised, so every field is built at most once
+    and matches the same field of the full document unless it is random.
+    """
+
+    def __init__(self, docs: 'String', key: Key):
+        self.docs = docs
+        self.key = key
+        self._alphabet = None
+        self.values = {}
+
+    @property
+    def alphabet(self) -> str:
+        if self._alphabet is None:
+            self._alphabet = self.docs.build_alphabet(self.key.string)
+        return self._alphabet
+
+    def __getitem__(self, field: str) -> Any:
+        if field not in self.values:
+            self.values[field] = self.docs.FIELDS[field](self.docs, self)
+        return self.values[field]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.docs.FIELDS)
+
+    def __len__(self) -> int:
+        return len(self.docs.FIELDS)
+
+
+@lru_cache(maxsize=None)
+def has_lazy_fields(cls: type) -> bool:
+    """Check that the field builders describe the documents of the class.
+
+    Subclasses that override next() without redefining FIELDS generate
+    different documents.
+    """
+    def owner(attr: str) -> type:
+        return next((c for c in cls.__mro__ if attr in vars(c)), None)
+
+    return owner('FIELDS') is not None and owner('FIELDS') is owner('next')
+
+
 class String:
 
     def __init__(self, avg_size: int):
@@ -342,6 +410,16 @@ class String:
 
         return self.build_string(alphabet, self.avg_size)
 
+    def next_raw(self, key: Key) -> bytes:
+        """Return the next document as pre-serialised JSON bytes."""
+        return dumps(self.next(key))
+
+    def fields(self, key: Key) -> Mapping:
+        """Return the next document with fields built on demand if supported."""
+        if has_lazy_fields(type(self)):
+            return LazyDocument(self, key)
+        return self.next(key)
+
 
 class IncompressibleString(String):
 
@@ -436,6 +514,18 @@ class Document(String):
             return 0
         return self._get_variation_coeff() * (self.avg_size - self.OVERHEAD)
 
+    FIELDS = {
+        'name': lambda self, doc: self.build_name(doc.alphabet),
+        'email': lambda self, doc: self.build_email(doc.alphabet),
+        'alt_email': lambda self, doc: self.build_alt_email(doc.alphabet),
+        'city': lambda self, doc: self.build_city(doc.alphabet),
+        'realm': lambda self, doc: self.build_realm(doc.alphabet),
+        'coins': lambda self, doc: self.build_coins(doc.alphabet),
+        'category': lambda self, doc: self.build_category(doc.alphabet),
+        'achievements': lambda self, doc: self.build_achievements(doc.alphabet),
+        'body': lambda self, doc: self.build_string(doc.alphabet, self._size()),
+    }
+
     def next(self, key: Key) -> dict:
         alphabet = self.build_alphabet(key.string)
         size = self._size()
@@ -452,6 +542,15 @@ class Document(String):
             'body': self.build_string(alphabet, size),
         }
 
+    def next_raw(self, key: Key) -> bytes:
+        if type(self) is not Document or build_document is None:
+            return super().next_raw(key)
+
+        alphabet = self.build_alphabet(key.string)
+        size = self._size()
+
+        return build_document(alphabet, int(size), self.build_alt_email(alphabet))
+
 
 class SGImportLatencyDocument(Document):
 
@@ -720,6 +819,25 @@ class NestedDocument(Document):
         else:  # Outliers - beta distribution, 2KB-2MB range
             return 2048 / np.random.beta(a=2.2, b=1.0)
 
+    FIELDS = {
+        'name': lambda self, doc: {'f': {'f': {'f': self.build_name(doc.alphabet)}}},
+        'email': lambda self, doc: {'f': {'f': self.build_email(doc.alphabet)}},
+        'alt_email': lambda self, doc: {'f': {'f': self.build_alt_email(doc.alphabet)}},
+        'street': lambda self, doc: {'f': {'f': self.build_street(doc.alphabet)}},
+        'city': lambda self, doc: {'f': {'f': self.build_city(doc.alphabet)}},
+        'county': lambda self, doc: {'f': {'f': self.build_county(doc.alphabet)}},
+        'state': lambda self, doc: {'f': self.build_state(doc.alphabet)},
+        'full_state': lambda self, doc: {'f': self.build_full_state(doc.alphabet)},
+        'country': lambda self, doc: {'f': self.build_country(doc.alphabet)},
+        'realm': lambda self, doc: {'f': self.build_realm(doc.alphabet)},
+        'coins': lambda self, doc: {'f': self.build_coins(doc.alphabet)},
+        'category': lambda self, doc: self.build_category(doc.alphabet),
+        'achievements': lambda self, doc: self.build_achievements(doc.alphabet),
+        'gmtime': lambda self, doc: self.build_gmtime(doc.alphabet),
+        'year': lambda self, doc: self.build_year(doc.alphabet),
+        'body': lambda self, doc: self.build_string(doc.alphabet, self._size()),
+    }
+
     def next(self, key: Key):
         alphabet = self.build_alphabet(key.string)
         size = self._size()
@@ -743,6 +861,18 @@ class NestedDocument(Document):
             'body': self.build_string(alphabet, size),
         }
 
+    def next_raw(self, key: Key) -> bytes:
+        if type(self) is not NestedDocument or build_nested_document is None:
+            return super().next_raw(key)
+
+        alphabet = self.build_alphabet(key.string)
+        size = self._size()
+
+        return build_nested_document(alphabet, int(size),
+                                     self.build_alt_email(alphabet),
+                                     self.build_state(alphabet),
+                                     self.build_full_state(alphabet))
+
 
 class LargeDocument(Document):
 
@@ -817,6 +947,27 @@ class ReverseLookupDocument(NestedDocument):
     def build_topics(self, seq_id: int) -> List[str]:
         return []
 
+    FIELDS = {
+        'name': lambda self, doc: self.build_name(doc.alphabet),
+        'email': lambda self, doc: self.build_email(doc.alphabet),
+        'alt_email': lambda self, doc: self.build_alt_email(doc.alphabet),
+        'street': lambda self, doc: self.build_street(doc.alphabet),
+        'city': lambda self, doc: self.build_city(doc.alphabet),
+        'county': lambda self, doc: self.build_county(doc.alphabet),
+        'state': lambda self, doc: self.build_state(doc.alphabet),
+        'full_state': lambda self, doc: self.build_full_state(doc.alphabet),
+        'country': lambda self, doc: self.build_country(doc.alphabet),
+        'realm': lambda self, doc: self.build_realm(doc.alphabet),
+        'coins': lambda self, doc: self.build_coins(doc.alphabet),
+        'category': lambda self, doc: self.build_category(doc.alphabet),
+        'achievements': lambda self, doc: self.build_achievements(doc.alphabet),
+        'gmtime': lambda self, doc: self.build_gmtime(doc.alphabet),
+        'year': lambda self, doc: self.build_year(doc.alphabet),
+        'body': lambda self, doc: self.build_string(doc.alphabet, self._size()),
+        'capped_small': lambda self, doc: self.build_capped(doc.alphabet, doc.key.number, 100),
+        'topics': lambda self, doc: self.build_topics(doc.key.number),
+    }
+
     def next(self, key: Key) -> dict:
         alphabet = self.build_alphabet(key.string)
         size = self._size()
@@ -842,6 +993,20 @@ class ReverseLookupDocument(NestedDocument):
             'topics': self.build_topics(key.number),
         }
 
+    def next_raw(self, key: Key) -> bytes:
+        if type(self) is not ReverseLookupDocument or build_reverse_lookup_document is None:
+            return super().next_raw(key)
+
+        alphabet = self.build_alphabet(key.string)
+        size = self._size()
+
+        return build_reverse_lookup_document(alphabet, int(size),
+                                             self.build_email(alphabet),
+                                             self.build_alt_email(alphabet),
+                                             self.build_state(alphabet),
+                                             self.build_full_state(alphabet),
+                                             self.build_capped(alphabet, key.number, 100))
+
 
 class ReverseLookupKeySizeDocument(ReverseLookupDocument):
 
@@ -882,6 +1047,12 @@ class ReverseRangeLookupDocument(ReverseLookupDocument):
         # both exclusive.
         self.distance = range_distance + 1
 
+    FIELDS = dict(
+        ReverseLookupDocument.FIELDS,
+        capped_small_range=lambda self, doc: self.build_capped(
+            doc.alphabet, doc.key.number + (self.distance * 100), 100),
+    )
+
     def build_capped(self, alphabet: str, seq_id: int, num_unique: int) -> str:
         if self.is_random:
             offset = random.randint(1, 9)
@@ -923,6 +1094,22 @@ class HashJoinDocument(ReverseRangeLookupDocument):
 
     OVERHEAD = 415
 
+    FIELDS = {
+        field: ReverseLookupDocument.FIELDS[field]
+        for field in ('name', 'email', 'street', 'city', 'county', 'state', 'full_state',
+                      'country', 'realm', 'coins', 'category', 'year', 'body')
+    }
+    FIELDS.update({
+        'capped_100': lambda self, doc: self.build_capped(doc.alphabet, doc.key.number,
+                                                          num_unique=100),
+        'capped_100_range': lambda self, doc: self.build_capped(
+            doc.alphabet, doc.key.number + self.distance * 100, num_unique=100),
+        'capped_1K': lambda self, doc: self.build_capped(doc.alphabet, doc.key.number,
+                                                         num_unique=1000),
+        'capped_10K': lambda self, doc: self.build_capped(doc.alphabet, doc.key.number,
+                                                          num_unique=10000),
+    })
+
     def next(self, key: Key) -> dict:
         alphabet = self.build_alphabet(key.string)
         size = self._size()
@@ -2552,18 +2739,196 @@ class FixedTextAndVectorDocument:
         doc["scalar"] = scalar
         return doc
 
+class VectorStore:
+
+    """Serve vectors of a dataset from a memory-mapped binary cache.
+
+    The source is either a binary dataset (fvecs, bvecs, ivecs or npy) or a
+    text file with two leading fields and the components on every line. It is
+    converted once per client into two files: a float32 .npy matrix and the
+    JSON arrays of all vectors, laid out the same way as DocumentCorpus. All
+    workers map both files read-only and therefore share a single copy in the
+    page cache.
+    """
+
+    CACHE_DIR = os.path.join(tempfile.gettempdir(), 'spring_vectors')
+
+    BINARY_FORMATS = ('.fvecs', '.bvecs', '.ivecs', '.npy')
+
+    def __init__(self, source: str):
+        stat = os.stat(source)
+        digest = hashlib.md5(
+            repr((os.path.abspath(source), stat.st_size, stat.st_mtime)).encode()
+        ).hexdigest()
+        path = os.path.join(self.CACHE_DIR, digest)
+        if not os.path.exists(path + '.json'):
+            self.build(source, path)
+
+        self.vectors = np.load(path + '.npy', mmap_mode='r')
+        with open(path + '.json', 'rb') as fh:
+            self.buffer = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        self.base = 8 * (len(self.vectors) + 1)
+        self.offsets = memoryview(self.buffer)[:self.base].cast('Q')
+
+    @classmethod
+    def read_source(cls, source: str) -> Tuple[int, int, Iterator[List[float]]]:
+        if os.path.splitext(source)[1] in cls.BINARY_FORMATS:
+            vectors = read_vectors(source)
+            rows = (row.astype(np.float32).tolist() for row in vectors)
+            return len(vectors), vectors.shape[1], rows
+
+        with open(source) as fh:
+            num_vectors = sum(1 for _ in fh)
+            fh.seek(0)
+            dim = len(fh.readline().split()) - 2
+
+        def rows():
+            with open(source) as fh:
+                for line in fh:
+                    yield [float(x) for x in line.split()[2:]]
+
+        return num_vectors, dim, rows()
+
+    @classmethod
+    def build(cls, source: str, path: str):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path + '.lock', 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            if os.path.exists(path + '.json'):  # Built by another worker
+                return
+
+            num_vectors, dim, rows = cls.read_source(source)
+            vectors = np.lib.format.open_memmap(path + '.npy.tmp', mode='w+',
+                                                dtype='<f4', shape=(num_vectors, dim))
+            offsets = np.zeros(num_vectors + 1, dtype='<u8')
+            with open(path + '.json.tmp', 'wb') as fh:
+                fh.write(offsets.tobytes())
+                for i, row in enumerate(rows):
+                    vectors[i] = row
+                    data = dumps(row)
+                    fh.write(data)
+                    offsets[i + 1] = offsets[i] + len(data)
+                fh.seek(0)
+                fh.write(offsets.tobytes())
+            vectors.flush()
+            del vectors
+
+            os.rename(path + '.npy.tmp', path + '.npy')
+            os.rename(path + '.json.tmp', path + '.json')
+
+    def __len__(self) -> int:
+        return len(self.vectors)
+
+    def json(self, i: int) -> bytes:
+        """Return the vector as a serialised JSON array."""
+        return self.buffer[self.base + self.offsets[i]:self.base + self.offsets[i + 1]]
+
+    def get(self, i: int) -> List[float]:
+        return json.loads(self.json(i))
+
+
 class VectorEmbeddingDocument:
-    def __init__(self, vector_query_map) -> None:
-        embeddings = []
-        for vector in vector_query_map:
-            query = [float(x) for x in vector.split()[2:]]
-            embeddings.append(query)
-        self.embeddings = embeddings
+
+    """Random vectors of a shared VectorStore with a random categorical field."""
+
+    def __init__(self, vectors: VectorStore) -> None:
+        self.vectors = vectors
         self.choices = ["q","2","g","b","m","j","e","d","a","l"]
 
+    def _next(self) -> Tuple[int, str]:
+        i = random.randint(0, len(self.vectors) - 1)
+        choice = self.choices[random.randint(0, len(self.choices) - 1)]
+        return i, choice
+
     def next(self, key):
+        i, choice = self._next()
         doc = {
-            "emb": self.embeddings[random.randint(0, len(self.embeddings) - 1)],
-            "choice" : self.choices[random.randint(0, len(self.choices) - 1)]
+            "emb": self.vectors.get(i),
+            "choice" : choice
         }
         return doc
+
+    def next_raw(self, key) -> bytes:
+        """Return the same document as next(), serialised straight from the buffer."""
+        i, choice = self._next()
+        return b''.join((b'{"emb": ', self.vectors.json(i),
+                         b', "choice": ', dumps(choice), b'}'))
+
+
+class DocumentCorpus:
+
+    """Serve pre-generated documents from a memory-mapped file.
+
+    The corpus consists of documents generated for keys 0..num_docs-1, serialised
+    the same way the SDK does it. The document of a key is picked by
+    key.number % num_docs and returned as JSON bytes, so it must be stored with
+    a raw JSON transcoder.
+
+    The first worker on a client builds the corpus, all other workers map the
+    same file read-only and therefore share a single copy in the page cache.
+
+    File layout: num_docs + 1 little-endian uint64 offsets followed by the
+    concatenated documents.
+    """
+
+    # Relative to the worker directory, removed when the workers are terminated
+    DIR = 'spring_corpus'
+
+    def __init__(self, docs, num_docs: int, path: str, prefix: str, fmtr: str):
+        self.num_docs = num_docs
+        if not os.path.exists(path):
+            self.build(docs, num_docs, path, prefix, fmtr)
+        with open(path, 'rb') as fh:
+            self.buffer = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        self.base = 8 * (num_docs + 1)
+        self.offsets = memoryview(self.buffer)[:self.base].cast('Q')
+
+    @staticmethod
+    def build(docs, num_docs: int, path: str, prefix: str, fmtr: str):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path + '.lock', 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            if os.path.exists(path):  # Built by another worker
+                return
+
+            offsets = np.zeros(num_docs + 1, dtype='<u8')
+            with open(path + '.tmp', 'wb') as fh:
+                fh.write(offsets.tobytes())
+                for i in range(num_docs):
+                    key = Key(number=i, prefix=prefix, fmtr=fmtr)
+                    if hasattr(docs, 'next_raw'):
+                        data = docs.next_raw(key)
+                    else:
+                        data = dumps(docs.next(key))
+                    fh.write(data)
+                    offsets[i + 1] = offsets[i] + len(data)
+                fh.seek(0)
+                fh.write(offsets.tobytes())
+            os.rename(path + '.tmp', path)
+
+    def next(self, key: Key) -> bytes:
+        i = key.number % self.num_docs
+        return self.buffer[self.base + self.offsets[i]:self.base + self.offsets[i + 1]]
+
+
+class SerializedDocument:
+
+    """Generate documents as JSON bytes using the fastdocgen builders.
+
+    Pre-serialised documents must be stored with a raw JSON transcoder.
+    """
+
+    def __init__(self, docs: Document):
+        self.docs = docs
+
+    @staticmethod
+    def supported(docs) -> bool:
+        builders = {
+            Document: build_document,
+            NestedDocument: build_nested_document,
+            ReverseLookupDocument: build_reverse_lookup_document,
+        }
+        return builders.get(type(docs)) is not None or type(docs) is VectorEmbeddingDocument
+
+    def next(self, key: Key) -> bytes:
+        return self.docs.next_raw(key)
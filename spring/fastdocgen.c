@@ -1,4 +1,6 @@
+#define PY_SSIZE_T_CLEAN
 #include <Python.h>
+#include <time.h>
 
 struct module_state {
     PyObject *error;
@@ -6,6 +8,141 @@ struct module_state {
 
 #define GETSTATE(m) ((struct module_state*)PyModule_GetState(m))
 
+#define ALPHABET_LEN 64
+#define NUM_ACHIEVEMENTS 16
+#define ACHIEVEMENTS_OFFSET 42
+
+/* Growable output buffer for pre-serialised JSON documents. */
+typedef struct {
+    char *data;
+    Py_ssize_t size;
+    Py_ssize_t capacity;
+} writer_t;
+
+static int
+writer_reserve(writer_t *w, Py_ssize_t n)
+{
+    if (w->size + n <= w->capacity)
+        return 0;
+    Py_ssize_t capacity = 2 * (w->size + n);
+    char *data = PyMem_Realloc(w->data, capacity);
+    if (data == NULL) {
+        PyErr_NoMemory();
+        return -1;
+    }
+    w->data = data;
+    w->capacity = capacity;
+    return 0;
+}
+
+static int
+write_raw(writer_t *w, const char *s, Py_ssize_t n)
+{
+    if (writer_reserve(w, n) < 0)
+        return -1;
+    memcpy(w->data + w->size, s, n);
+    w->size += n;
+    return 0;
+}
+
+#define WRITE_LITERAL(w, s) write_raw(w, s, sizeof(s) - 1)
+
+/* Write a JSON string the same way json.dumps(ensure_ascii=False) does. */
+static int
+write_string(writer_t *w, const char *s, Py_ssize_t n)
+{
+    /* The worst case is a \u00XX escape for every byte */
+    if (writer_reserve(w, 6 * n + 2) < 0)
+        return -1;
+    char *out = w->data + w->size;
+    *out++ = '"';
+    for (Py_ssize_t i = 0; i < n; i++) {
+        unsigned char c = s[i];
+        switch (c) {
+            case '"': *out++ = '\\'; *out++ = '"'; break;
+            case '\\': *out++ = '\\'; *out++ = '\\'; break;
+            case '\n': *out++ = '\\'; *out++ = 'n'; break;
+            case '\r': *out++ = '\\'; *out++ = 'r'; break;
+            case '\t': *out++ = '\\'; *out++ = 't'; break;
+            case '\b': *out++ = '\\'; *out++ = 'b'; break;
+            case '\f': *out++ = '\\'; *out++ = 'f'; break;
+            default:
+                if (c < 0x20)
+                    out += sprintf(out, "\\u%04x", c);
+                else
+                    *out++ = c;
+        }
+    }
+    *out++ = '"';
+    w->size = out - w->data;
+    return 0;
+}
+
+static int
+write_pystring(writer_t *w, PyObject *s)
+{
+    Py_ssize_t n;
+    const char *data = PyUnicode_AsUTF8AndSize(s, &n);
+    if (data == NULL)
+        return -1;
+    return write_string(w, data, n);
+}
+
+static int
+write_long(writer_t *w, long value)
+{
+    char buf[32];
+    return write_raw(w, buf, snprintf(buf, sizeof(buf), "%ld", value));
+}
+
+/* Floats use the shortest repr, like float.__repr__ */
+static int
+write_double(writer_t *w, double value)
+{
+    char *buf = PyOS_double_to_string(value, 'r', 0, Py_DTSF_ADD_DOT_0, NULL);
+    if (buf == NULL)
+        return -1;
+    int ret = write_raw(w, buf, strlen(buf));
+    PyMem_Free(buf);
+    return ret;
+}
+
+static int
+hex_value(char c)
+{
+    if (c >= '0' && c <= '9')
+        return c - '0';
+    if (c >= 'a' && c <= 'f')
+        return c - 'a' + 10;
+    if (c >= 'A' && c <= 'F')
+        return c - 'A' + 10;
+    return 0;
+}
+
+static long
+parse_hex(const char *s, int n)
+{
+    long value = 0;
+    for (int i = 0; i < n; i++)
+        value = 16 * value + hex_value(s[i]);
+    return value;
+}
+
+static int
+compute_achievements(const char *alphabet, int *achievements)
+{
+    int achievement = 256;
+    int num_valid = 0;
+
+    for (int i = 0; i < NUM_ACHIEVEMENTS; i++) {
+        int hex = hex_value(alphabet[i + ACHIEVEMENTS_OFFSET]);
+        achievement = (achievement + hex * i) % 512;
+        if (achievement < 256)
+            achievements[num_valid++] = achievement;
+    }
+    return num_valid;
+}
+
 static PyObject *
 build_achievements(PyObject *self, PyObject *args)
 {
@@ -13,41 +150,296 @@ build_achievements(PyObject *self, PyObject *args)
     if (!PyArg_ParseTuple(args, "s", &alphabet))
         return NULL;
 
-    const int offset = 42;
-    const int max_len = 16;
+    int achievements[NUM_ACHIEVEMENTS];
+    int num_valid = compute_achievements(alphabet, achievements);
 
-    int i;
-    int achievement = 256;
-    int achievements[max_len];
-    int num_valid = 0;
+    PyObject *py_array = PyList_New(num_valid);
+    if (py_array == NULL)
+        return NULL;
+    for (int i = 0; i < num_valid; i++)
+        PyList_SET_ITEM(py_array, i, PyLong_FromLong(achievements[i]));
+    return py_array;
+}
 
-    for (i = 0; i < max_len; i++) {
-        int hex = strtol((char[]){alphabet[i+offset], 0}, NULL, 16);
-        achievement = (achievement + hex * i) % 512;
-        if (achievement < 256) {
-            num_valid++;
-            achievements[i] = achievement;
-        } else {
-            achievements[i] = -1;
-        }
+#define TRY(expr) if ((expr) < 0) goto error
+
+static int
+write_slice(writer_t *w, const char *alphabet, int start, int end)
+{
+    return write_string(w, alphabet + start, end - start);
+}
+
+static int
+write_name(writer_t *w, const char *alphabet)
+{
+    char name[13];
+    memcpy(name, alphabet, 6);
+    name[6] = ' ';
+    memcpy(name + 7, alphabet + 6, 6);
+    return write_string(w, name, sizeof(name));
+}
+
+static int
+write_email(writer_t *w, const char *alphabet)
+{
+    char email[17];
+    memcpy(email, alphabet + 12, 6);
+    email[6] = '@';
+    memcpy(email + 7, alphabet + 18, 6);
+    memcpy(email + 13, ".com", 4);
+    return write_string(w, email, sizeof(email));
+}
+
+static int
+write_coins(writer_t *w, const char *alphabet)
+{
+    double coins = parse_hex(alphabet + 36, 4) / 100.0;
+    return write_double(w, coins < 0.1 ? 0.1 : coins);
+}
+
+static int
+write_category(writer_t *w, const char *alphabet)
+{
+    return write_long(w, hex_value(alphabet[41]) % 3);
+}
+
+static int
+write_achievements(writer_t *w, const char *alphabet)
+{
+    int achievements[NUM_ACHIEVEMENTS];
+    int num_valid = compute_achievements(alphabet, achievements);
+
+    if (num_valid == 0)
+        return WRITE_LITERAL(w, "[0]");
+
+    if (WRITE_LITERAL(w, "[") < 0)
+        return -1;
+    for (int i = 0; i < num_valid; i++) {
+        if (i > 0 && WRITE_LITERAL(w, ", ") < 0)
+            return -1;
+        if (write_long(w, achievements[i]) < 0)
+            return -1;
     }
+    return WRITE_LITERAL(w, "]");
+}
 
-    PyObject *py_array = PyList_New(num_valid);
-    int iter = 0;
-    for (i = 0; i < max_len; i++) {
-        if (achievements[i] >= 0) {
-            PyObject *num = PyLong_FromLong(achievements[i]);
-            PyList_SET_ITEM(py_array, iter, num);
-            iter++;
-        }
+/* Same as tuple(time.gmtime(seconds)) */
+static int
+write_gmtime(writer_t *w, const char *alphabet)
+{
+    time_t seconds = 396 * 24 * 3600 * (hex_value(alphabet[63]) % 12);
+    struct tm tm;
+    char buf[128];
+
+    gmtime_r(&seconds, &tm);
+    int n = snprintf(buf, sizeof(buf), "[%d, %d, %d, %d, %d, %d, %d, %d, 0]",
+                     tm.tm_year + 1900, tm.tm_mon + 1, tm.tm_mday,
+                     tm.tm_hour, tm.tm_min, tm.tm_sec,
+                     (tm.tm_wday + 6) % 7, tm.tm_yday + 1);
+    return write_raw(w, buf, n);
+}
+
+static int
+write_year(writer_t *w, const char *alphabet)
+{
+    return write_long(w, 1985 + hex_value(alphabet[62]));
+}
+
+/* Same as String.build_string: the alphabet repeated up to the given length */
+static int
+write_body(writer_t *w, const char *alphabet, Py_ssize_t length)
+{
+    if (length < 0)
+        length = 0;
+    if (writer_reserve(w, length + 2) < 0)
+        return -1;
+    char *out = w->data + w->size;
+    *out++ = '"';
+    for (Py_ssize_t i = 0; i < length; i += ALPHABET_LEN) {
+        Py_ssize_t n = length - i < ALPHABET_LEN ? length - i : ALPHABET_LEN;
+        memcpy(out, alphabet, n);
+        out += n;
     }
-    return py_array;
+    *out++ = '"';
+    w->size = out - w->data;
+    return 0;
+}
+
+static PyObject *
+writer_finish(writer_t *w)
+{
+    PyObject *doc = PyBytes_FromStringAndSize(w->data, w->size);
+    PyMem_Free(w->data);
+    return doc;
+}
+
+static int
+check_alphabet(Py_ssize_t length)
+{
+    if (length != ALPHABET_LEN) {
+        PyErr_Format(PyExc_ValueError, "alphabet must be %d characters long",
+                     ALPHABET_LEN);
+        return -1;
+    }
+    return 0;
+}
+
+/* Document.next serialised with json.dumps(doc, ensure_ascii=False) */
+static PyObject *
+build_document(PyObject *self, PyObject *args)
+{
+    const char *alphabet;
+    Py_ssize_t alphabet_len, length;
+    PyObject *alt_email;
+    if (!PyArg_ParseTuple(args, "s#nU", &alphabet, &alphabet_len, &length, &alt_email))
+        return NULL;
+    if (check_alphabet(alphabet_len) < 0)
+        return NULL;
+
+    writer_t w = {NULL, 0, 0};
+    TRY(WRITE_LITERAL(&w, "{\"name\": "));
+    TRY(write_name(&w, alphabet));
+    TRY(WRITE_LITERAL(&w, ", \"email\": "));
+    TRY(write_email(&w, alphabet));
+    TRY(WRITE_LITERAL(&w, ", \"alt_email\": "));
+    TRY(write_pystring(&w, alt_email));
+    TRY(WRITE_LITERAL(&w, ", \"city\": "));
+    TRY(write_slice(&w, alphabet, 24, 30));
+    TRY(WRITE_LITERAL(&w, ", \"realm\": "));
+    TRY(write_slice(&w, alphabet, 30, 36));
+    TRY(WRITE_LITERAL(&w, ", \"coins\": "));
+    TRY(write_coins(&w, alphabet));
+    TRY(WRITE_LITERAL(&w, ", \"category\": "));
+    TRY(write_category(&w, alphabet));
+    TRY(WRITE_LITERAL(&w, ", \"achievements\": "));
+    TRY(write_achievements(&w, alphabet));
+    TRY(WRITE_LITERAL(&w, ", \"body\": "));
+    TRY(write_body(&w, alphabet, length));
+    TRY(WRITE_LITERAL(&w, "}"));
+    return writer_finish(&w);
+
+error:
+    PyMem_Free(w.data);
+    return NULL;
+}
+
+/* NestedDocument.next serialised with json.dumps(doc, ensure_ascii=False) */
+static PyObject *
+build_nested_document(PyObject *self, PyObject *args)
+{
+    const char *alphabet;
+    Py_ssize_t alphabet_len, length;
+    PyObject *alt_email, *state, *full_state;
+    if (!PyArg_ParseTuple(args, "s#nUUU", &alphabet, &alphabet_len, &length,
+                          &alt_email, &state, &full_state))
+        return NULL;
+    if (check_alphabet(alphabet_len) < 0)
+        return NULL;
+
+    writer_t w = {NULL, 0, 0};
+    TRY(WRITE_LITERAL(&w, "{\"name\": {\"f\": {\"f\": {\"f\": "));
+    TRY(write_name(&w, alphabet));
+    TRY(WRITE_LITERAL(&w, "}}}, \"email\": {\"f\": {\"f\": "));
+    TRY(write_email(&w, alphabet));
+    TRY(WRITE_LITERAL(&w, "}}, \"alt_email\": {\"f\": {\"f\": "));
+    TRY(write_pystring(&w, alt_email));
+    TRY(WRITE_LITERAL(&w, "}}, \"street\": {\"f\": {\"f\": "));
+    TRY(write_slice(&w, alphabet, 54, 62));
+    TRY(WRITE_LITERAL(&w, "}}, \"city\": {\"f\": {\"f\": "));
+    TRY(write_slice(&w, alphabet, 24, 30));
+    TRY(WRITE_LITERAL(&w, "}}, \"county\": {\"f\": {\"f\": "));
+    TRY(write_slice(&w, alphabet, 48, 54));
+    TRY(WRITE_LITERAL(&w, "}}, \"state\": {\"f\": "));
+    TRY(write_pystring(&w, state));
+    TRY(WRITE_LITERAL(&w, "}, \"full_state\": {\"f\": "));
+    TRY(write_pystring(&w, full_state));
+    TRY(WRITE_LITERAL(&w, "}, \"country\": {\"f\": "));
+    TRY(write_slice(&w, alphabet, 42, 48));
+    TRY(WRITE_LITERAL(&w, "}, \"realm\": {\"f\": "));
+    TRY(write_slice(&w, alphabet, 30, 36));
+    TRY(WRITE_LITERAL(&w, "}, \"coins\": {\"f\": "));
+    TRY(write_coins(&w, alphabet));
+    TRY(WRITE_LITERAL(&w, "}, \"category\": "));
+    TRY(write_category(&w, alphabet));
+    TRY(WRITE_LITERAL(&w, ", \"achievements\": "));
+    TRY(write_achievements(&w, alphabet));
+    TRY(WRITE_LITERAL(&w, ", \"gmtime\": "));
+    TRY(write_gmtime(&w, alphabet));
+    TRY(WRITE_LITERAL(&w, ", \"year\": "));
+    TRY(write_year(&w, alphabet));
+    TRY(WRITE_LITERAL(&w, ", \"body\": "));
+    TRY(write_body(&w, alphabet, length));
+    TRY(WRITE_LITERAL(&w, "}"));
+    return writer_finish(&w);
+
+error:
+    PyMem_Free(w.data);
+    return NULL;
+}
+
+/* ReverseLookupDocument.next serialised with json.dumps(doc, ensure_ascii=False) */
+static PyObject *
+build_reverse_lookup_document(PyObject *self, PyObject *args)
+{
+    const char *alphabet;
+    Py_ssize_t alphabet_len, length;
+    PyObject *email, *alt_email, *state, *full_state, *capped;
+    if (!PyArg_ParseTuple(args, "s#nUUUUU", &alphabet, &alphabet_len, &length,
+                          &email, &alt_email, &state, &full_state, &capped))
+        return NULL;
+    if (check_alphabet(alphabet_len) < 0)
+        return NULL;
+
+    writer_t w = {NULL, 0, 0};
+    TRY(WRITE_LITERAL(&w, "{\"name\": "));
+    TRY(write_name(&w, alphabet));
+    TRY(WRITE_LITERAL(&w, ", \"email\": "));
+    TRY(write_pystring(&w, email));
+    TRY(WRITE_LITERAL(&w, ", \"alt_email\": "));
+    TRY(write_pystring(&w, alt_email));
+    TRY(WRITE_LITERAL(&w, ", \"street\": "));
+    TRY(write_slice(&w, alphabet, 54, 62));
+    TRY(WRITE_LITERAL(&w, ", \"city\": "));
+    TRY(write_slice(&w, alphabet, 24, 30));
+    TRY(WRITE_LITERAL(&w, ", \"county\": "));
+    TRY(write_slice(&w, alphabet, 48, 54));
+    TRY(WRITE_LITERAL(&w, ", \"state\": "));
+    TRY(write_pystring(&w, state));
+    TRY(WRITE_LITERAL(&w, ", \"full_state\": "));
+    TRY(write_pystring(&w, full_state));
+    TRY(WRITE_LITERAL(&w, ", \"country\": "));
+    TRY(write_slice(&w, alphabet, 42, 48));
+    TRY(WRITE_LITERAL(&w, ", \"realm\": "));
+    TRY(write_slice(&w, alphabet, 30, 36));
+    TRY(WRITE_LITERAL(&w, ", \"coins\": "));
+    TRY(write_coins(&w, alphabet));
+    TRY(WRITE_LITERAL(&w, ", \"category\": "));
+    TRY(write_category(&w, alphabet));
+    TRY(WRITE_LITERAL(&w, ", \"achievements\": "));
+    TRY(write_achievements(&w, alphabet));
+    TRY(WRITE_LITERAL(&w, ", \"gmtime\": "));
+    TRY(write_gmtime(&w, alphabet));
+    TRY(WRITE_LITERAL(&w, ", \"year\": "));
+    TRY(write_year(&w, alphabet));
+    TRY(WRITE_LITERAL(&w, ", \"body\": "));
+    TRY(write_body(&w, alphabet, length));
+    TRY(WRITE_LITERAL(&w, ", \"capped_small\": "));
+    TRY(write_pystring(&w, capped));
+    TRY(WRITE_LITERAL(&w, ", \"topics\": []}"));
+    return writer_finish(&w);
+
+error:
+    PyMem_Free(w.data);
+    return NULL;
 }
 
 
 static PyMethodDef
 fastdocgen_methods[] = {
     {"build_achievements",  build_achievements, METH_VARARGS, NULL},
+    {"build_document",  build_document, METH_VARARGS, NULL},
+    {"build_nested_document",  build_nested_document, METH_VARARGS, NULL},
+    {"build_reverse_lookup_document",  build_reverse_lookup_document, METH_VARARGS, NULL},
     {NULL, NULL, 0, NULL}
 };
 
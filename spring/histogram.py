@@ -0,0 +1,120 @@
+import json
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, Optional, Tuple, Union
+
+HISTOGRAM_EXT = '.hist'
+
+
+class Histogram:
+
+    """Log-linear bucketed latency histogram in the spirit of HdrHistogram.
+
+    Latencies are recorded in seconds with microsecond resolution. Every power
+    of two range is split into 2 ** SUB_BUCKET_BITS linear sub-buckets, so the
+    relative error is bounded by 2 ** -SUB_BUCKET_BITS and recording is O(1).
+    Histograms are merged losslessly by adding up bucket counts.
+
+    See also https://github.com/HdrHistogram/HdrHistogram
+    """
+
+    SUB_BUCKET_BITS = 8
+
+    def __init__(self, counts: Optional[Dict[int, int]] = None):
+        self.counts = counts or {}
+        self.total = sum(self.counts.values())
+
+    @classmethod
+    def bucket_index(cls, value: int) -> int:
+        shift = max(value.bit_length() - cls.SUB_BUCKET_BITS - 1, 0)
+        return (shift << cls.SUB_BUCKET_BITS) + (value >> shift)
+
+    @classmethod
+    def bucket_value(cls, index: int) -> float:
+        """Return the middle of the bucket range in microseconds."""
+        shift = max((index >> cls.SUB_BUCKET_BITS) - 1, 0)
+        lower = (index - (shift << cls.SUB_BUCKET_BITS)) << shift
+        return lower + ((1 << shift) - 1) / 2
+
+    def record(self, latency: float):
+        index = self.bucket_index(int(latency * 10 ** 6))
+        self.counts[index] = self.counts.get(index, 0) + 1
+        self.total += 1
+
+    def merge(self, other: 'Histogram'):
+        for index, count in other.counts.items():
+            self.counts[index] = self.counts.get(index, 0) + count
+        self.total += other.total
+
+    def percentiles(self, percentiles: Iterable[float]) -> list[float]:
+        """Return the latency percentiles in milliseconds."""
+        if not self.total:
+            return []
+        buckets = sorted(self.counts.items())
+        values = []
+        for percentile in percentiles:
+            rank = max(percentile / 100 * self.total, 1)
+            cumulative = 0
+            for index, count in buckets:
+                cumulative += count
+                if cumulative >= rank:
+                    break
+            values.append(self.bucket_value(index) / 10 ** 3)
+        return values
+
+    def to_json(self) -> Dict[str, int]:
+        return {str(index): count for index, count in self.counts.items()}
+
+    @classmethod
+    def from_json(cls, data: Dict[str, int]) -> 'Histogram':
+        return cls({int(index): count for index, count in data.items()})
+
+
+class HistogramRecorder:
+
+    """Record every measurement into per-metric and per-target histograms."""
+
+    def __init__(self):
+        self.histograms = defaultdict(Histogram)
+
+    def update(self, operation: str, latency_single: float,
+               latency_total: Optional[float] = None, target: Optional[str] = None):
+        self.histograms['latency_' + operation, target].record(latency_single)
+        if latency_total:
+            self.histograms['latency_total_' + operation, target].record(latency_total)
+
+    def dump(self, filename: Union[str, Path]):
+        data = defaultdict(dict)
+        for (metric, target), histogram in self.histograms.items():
+            data[metric][target or ''] = histogram.to_json()
+        with open(filename, 'w') as fh:
+            json.dump(data, fh)
+
+
+def read_histograms(filename: Union[str, Path]) -> Iterator[Tuple[str, str, Histogram]]:
+    """Yield (metric, target, histogram) tuples from a worker histogram dump."""
+    with open(filename) as fh:
+        data = json.load(fh)
+    for metric, targets in data.items():
+        for target, counts in targets.items():
+            yield metric, target, Histogram.from_json(counts)
+
+
+def merged_histograms_path(cluster: str, db: str) -> Path:
+    """Return the location of the merged histograms of a time series database."""
+    return Path(cluster) / '{}{}'.format(db, HISTOGRAM_EXT)
+
+
+def write_merged_histograms(filename: Path, histograms: Dict[str, Histogram]):
+    filename.parent.mkdir(parents=True, exist_ok=True)
+    with open(filename, 'w') as fh:
+        json.dump({metric: h.to_json() for metric, h in histograms.items()}, fh)
+
+
+def read_merged_histogram(filename: Path, metric: str) -> Optional[Histogram]:
+    if not filename.exists():
+        return
+    with open(filename) as fh:
+        data = json.load(fh)
+    if metric in data:
+        return Histogram.from_json(data[metric])
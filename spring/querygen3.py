@@ -1,7 +1,9 @@
+import _string
 import ast
 import re
 from itertools import cycle
-from typing import List, Tuple
+from string import Formatter
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
 import pkg_resources
 from numpy import random
@@ -236,17 +238,206 @@ class ViewQueryGenByType3:
         return self.DDOC_NAME, view_name, ViewQuery(**params)
 
 
+class ArgsTransformer(ast.NodeTransformer):
+
+    """Replace field placeholders with lookups in the document."""
+
+    PLACEHOLDER = re.compile(r'(_field\d+_)')
+
+    def __init__(self, fields: Dict[str, Tuple[str, str, Optional[str]]]):
+        self.fields = fields
+
+    @staticmethod
+    def lookup(field_name: str) -> ast.expr:
+        first, rest = _string.formatter_field_name_split(field_name)
+        node = ast.Subscript(value=ast.Name(id='doc', ctx=ast.Load()),
+                             slice=ast.Constant(value=first), ctx=ast.Load())
+        for is_attr, key in rest:
+            if is_attr:
+                node = ast.Attribute(value=node, attr=key, ctx=ast.Load())
+            else:
+                node = ast.Subscript(value=node, slice=ast.Constant(value=key),
+                                     ctx=ast.Load())
+        return node
+
+    def formatted_value(self, placeholder: str) -> ast.FormattedValue:
+        field_name, format_spec, conversion = self.fields[placeholder]
+        return ast.FormattedValue(
+            value=self.lookup(field_name),
+            conversion=ord(conversion) if conversion else -1,
+            format_spec=ast.JoinedStr(values=[ast.Constant(value=format_spec)])
+            if format_spec else None,
+        )
+
+    def visit_Name(self, node: ast.Name) -> ast.expr:
+        if node.id not in self.fields:
+            return node
+        field_name, format_spec, conversion = self.fields[node.id]
+        if not format_spec and not conversion:
+            return self.lookup(field_name)
+        # The formatted value used to be evaluated as a literal
+        return ast.Call(func=ast.Name(id='literal_eval', ctx=ast.Load()),
+                        args=[ast.JoinedStr(values=[self.formatted_value(node.id)])],
+                        keywords=[])
+
+    def visit_Constant(self, node: ast.Constant) -> ast.expr:
+        if not isinstance(node.value, str) or not self.PLACEHOLDER.search(node.value):
+            return node
+        values = []
+        for part in self.PLACEHOLDER.split(node.value):
+            if part in self.fields:
+                values.append(self.formatted_value(part))
+            elif part:
+                values.append(ast.Constant(value=part))
+        return ast.JoinedStr(values=values)
+
+
+def compile_args(template: str) -> Callable[[dict], Any]:
+    """Compile the template of positional parameters into a function of a document.
+
+    The result is the same as of eval(template.format(**doc)): fields outside of
+    string literals become document values, string literals with fields become
+    f-strings. Therefore, the template is parsed only once.
+    """
+    fields = {}
+    source = ''
+    for literal, field_name, format_spec, conversion in Formatter().parse(template):
+        source += literal
+        if field_name is not None:
+            placeholder = '_field{}_'.format(len(fields))
+            fields[placeholder] = field_name, format_spec, conversion
+            source += placeholder
+
+    expression = ArgsTransformer(fields).visit(ast.parse(source, mode='eval'))
+    function = ast.Expression(body=ast.Lambda(
+        args=ast.arguments(posonlyargs=[], args=[ast.arg(arg='doc')], kwonlyargs=[],
+                           kw_defaults=[], defaults=[]),
+        body=expression.body,
+    ))
+    ast.fix_missing_locations(function)
+    return eval(compile(function, '<args>', 'eval'), {'literal_eval': ast.literal_eval})
+
+
+class N1QLQueryTemplate:
+
+    """N1QL query compiled once from the workload settings.
+
+    Positional parameters are bound by a function selected (and compiled) up
+    front, statements with substituted targets are cached per combination of
+    replacement targets.
+    """
+
+    def __init__(self, statement: str, args: str, scan_consistency: Optional[str] = None,
+                 ad_hoc: Optional[bool] = None, total_batches: Optional[str] = None,
+                 qualified_batches: Optional[str] = None, ts_config: Optional[str] = None):
+        self.statement = statement
+        self.params = {
+            'adhoc': bool(ad_hoc),
+            'scan_consistency': self.scan_consistency(scan_consistency),
+        }
+        self.statements = {}
+
+        if 'key' in args:
+            self.bind_args = self.key_args
+        elif 'start_qualified_batches' in args:
+            self.total_batches = int(total_batches)
+            self.qualified_batches = int(qualified_batches)
+            self.bind_args = self.batch_args
+        elif 'timeseries' in args:
+            self.ts_config = ast.literal_eval(ts_config)
+            self.bind_args = self.timeseries_args
+        else:
+            doc_args = compile_args(args)
+            self.bind_args = lambda key, doc: doc_args(doc)
+
+    @staticmethod
+    def scan_consistency(val):
+        if val == 'request_plus':
+            return QueryScanConsistency.REQUEST_PLUS
+        elif val == 'not_bound':
+            return QueryScanConsistency.NOT_BOUNDED
+        else:
+            return QueryScanConsistency.NOT_BOUNDED
+
+    @staticmethod
+    def key_args(key: str, doc: dict) -> list:
+        return [key]
+
+    def batch_args(self, key: str, doc: dict) -> list:
+        start = random.randint(0, self.total_batches - self.qualified_batches)
+        end = start + self.qualified_batches - 1
+        return [start, end]
+
+    def timeseries_args(self, key: str, doc: dict) -> list:
+        ts_config = self.ts_config
+        device_start_range = ts_config['total_devices'] - 1 - ts_config['device_range']
+        device_start_id = random.randint(0, device_start_range)
+        device1 = "Device-" + str(device_start_id)
+        device2 = "Device-" + str(device_start_id + ts_config['device_range'])
+        if ts_config['ts_range'] >= 24:
+            # if ts_range is more than 24 hours, ts_start will start at 00:00
+            ts_start_range = int((ts_config['total_ts_range'] - ts_config['ts_range'])/24) - 1
+            ts_start = ts_config['ts_start'] + random.randint(0, ts_start_range) * 86400000
+        else:
+            ts_start_range = ts_config['total_ts_range'] - 1 - ts_config['ts_range']
+            ts_start = ts_config['ts_start'] + random.randint(0, ts_start_range) * 3600000
+        ts_end = ts_start + int(ts_config['ts_range']) * 3600000 - 1000
+        ts_ranges = [ts_start, ts_end]
+        return [ts_ranges, device1, device2, ts_start, ts_end]
+
+    def bind_targets(self, replace_targets: Optional[dict]) -> Tuple[str, Optional[str]]:
+        if not replace_targets:
+            return self.statement, None
+        targets = tuple((bucket, tuple(t)) for bucket, t in replace_targets.items())
+        if targets not in self.statements:
+            self.statements[targets] = self.substitute_targets(replace_targets)
+        return self.statements[targets]
+
+    def substitute_targets(self, replace_targets: dict) -> Tuple[str, Optional[str]]:
+        statement = self.statement
+        query_context = None
+        if "TARGET_BUCKET" in statement:
+            for bucket in replace_targets.keys():
+                scope, collection, target = replace_targets[bucket][0].split(":")
+                if target == 'True':
+                    query_context = "default:`{}`.`{}`".format(bucket, scope)
+                    replace_target = "{}.`{}`".format(query_context, collection)
+                    statement = statement.replace("`TARGET_BUCKET`", replace_target)
+                    replace_target = "`{}`.`{}`".format(bucket, scope)
+                    statement = statement.replace("`TARGET_SCOPE`", replace_target)
+        elif "RAW_QUERY" in statement:
+            for bucket in replace_targets.keys():
+                scope, collection, target = replace_targets[bucket][0].split(":")
+                if bucket in statement and scope in statement:
+                    query_context = "default:`{}`.`{}`".format(bucket, scope)
+                    break
+            statement = statement.replace("RAW_QUERY ", "")
+        else:
+            for bucket in replace_targets.keys():
+                bucket_substring = "`{}`".format(bucket)
+                for i in range(statement.count(bucket_substring)):
+                    where = [m.start() for m in re.finditer(bucket_substring, statement)][i]
+                    before = statement[:where]
+                    after = statement[where:]
+                    scope, collection, target = replace_targets[bucket][i].split(":")
+                    query_context = "default:`{}`.`{}`".format(bucket, scope)
+                    replace_target = "{}.`{}`".format(query_context, collection)
+                    after = after.replace(bucket_substring, replace_target)
+                    statement = before + after
+        return statement, query_context
+
+
 class N1QLQueryGen3:
 
     def __init__(self, queries: List[dict], query_weight: List[int]):
         n1ql_queries = []
         for (query, weight) in zip(queries, query_weight):
-            for i in range(weight):
-                n1ql_queries.append((query['statement'], query['args'],
-                                     query.get('scan_consistency'), query.get('ad_hoc'),
-                                     query.get('total_batches'),
-                                     query.get('qualified_batches'),
-                                     query.get('ts_config')))
+            template = N1QLQueryTemplate(query['statement'], query['args'],
+                                         query.get('scan_consistency'), query.get('ad_hoc'),
+                                         query.get('total_batches'),
+                                         query.get('qualified_batches'),
+                                         query.get('ts_config'))
+            n1ql_queries += [template] * weight
         if 'total_batches' in queries[0].keys():
             random.shuffle(n1ql_queries)
         self.queries = cycle(n1ql_queries)
@@ -254,79 +445,12 @@ class N1QLQueryGen3:
     def generate_query(self):
         return
 
-    def scan_consistency(self, val):
-        if val == 'request_plus':
-            return QueryScanConsistency.REQUEST_PLUS
-        elif val == 'not_bound':
-            return QueryScanConsistency.NOT_BOUNDED
-        else:
-            return QueryScanConsistency.NOT_BOUNDED
-
     def next(self, key: str, doc: dict, replace_targets: dict = None,
              use_query_context: bool = False) -> Tuple[str, QueryOptions]:
-        statement, args, scan_consistency, ad_hoc, total_batches, qualified_batches,\
-            ts_config = next(self.queries)
-        query_context = None
-        if replace_targets:
-            if "TARGET_BUCKET" in statement:
-                for bucket in replace_targets.keys():
-                    scope, collection, target = replace_targets[bucket][0].split(":")
-                    if target == 'True':
-                        query_context = "default:`{}`.`{}`".format(bucket, scope)
-                        replace_target = "{}.`{}`".format(query_context, collection)
-                        statement = statement.replace("`TARGET_BUCKET`", replace_target)
-                        replace_target = "`{}`.`{}`".format(bucket, scope)
-                        statement = statement.replace("`TARGET_SCOPE`", replace_target)
-            elif "RAW_QUERY" in statement:
-                for bucket in replace_targets.keys():
-                    scope, collection, target = replace_targets[bucket][0].split(":")
-                    if bucket in statement and scope in statement:
-                        query_context = "default:`{}`.`{}`".format(bucket, scope)
-                        break
-                statement = statement.replace("RAW_QUERY ", "")
-            else:
-                for bucket in replace_targets.keys():
-                    bucket_substring = "`{}`".format(bucket)
-                    for i in range(statement.count(bucket_substring)):
-                        where = [m.start() for m in re.finditer(bucket_substring, statement)][i]
-                        before = statement[:where]
-                        after = statement[where:]
-                        scope, collection, target = replace_targets[bucket][i].split(":")
-                        query_context = "default:`{}`.`{}`".format(bucket, scope)
-                        replace_target = "{}.`{}`".format(query_context, collection)
-                        after = after.replace(bucket_substring, replace_target)
-                        statement = before + after
-        if 'key' in args:
-            args = [key]
-        elif 'start_qualified_batches' in args:
-            start = random.randint(0, int(total_batches) - int(qualified_batches))
-            end = start + int(qualified_batches) - 1
-            args = [start, end]
-        elif 'timeseries' in args:
-            ts_config = ast.literal_eval(ts_config)
-            device_start_range = ts_config['total_devices'] - 1 - ts_config['device_range']
-            device_start_id = random.randint(0, device_start_range)
-            device1 = "Device-" + str(device_start_id)
-            device2 = "Device-" + str(device_start_id + ts_config['device_range'])
-            if ts_config['ts_range'] >= 24:
-                # if ts_range is more than 24 hours, ts_start will start at 00:00
-                ts_start_range = int((ts_config['total_ts_range'] - ts_config['ts_range'])/24) - 1
-                ts_start = ts_config['ts_start'] + random.randint(0, ts_start_range) * 86400000
-            else:
-                ts_start_range = ts_config['total_ts_range'] - 1 - ts_config['ts_range']
-                ts_start = ts_config['ts_start'] + random.randint(0, ts_start_range) * 3600000
-            ts_end = ts_start + int(ts_config['ts_range']) * 3600000 - 1000
-            ts_ranges = [ts_start, ts_end]
-            args = [ts_ranges, device1, device2, ts_start, ts_end]
-        else:
-            args = args.format(**doc)
-            args = eval(args)
+        query = next(self.queries)
+        statement, query_context = query.bind_targets(replace_targets)
 
-        params = {
-            'adhoc': bool(ad_hoc),
-            'scan_consistency': self.scan_consistency(scan_consistency),
-            'positional_parameters': args
-        }
+        params = dict(query.params, positional_parameters=query.bind_args(key, doc))
 
         if use_query_context:
             params['query_context'] = query_context
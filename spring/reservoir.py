@@ -1,29 +1,57 @@
-import csv
+import json
 import random
+import struct
 import time
+from pathlib import Path
 from typing import Optional, Union
 
+import numpy as np
+
 from logger import logger
+from spring.histogram import HISTOGRAM_EXT, HistogramRecorder
 
 
 class Reservoir:
 
     """Implement Algorithm R.
 
+    Measurements are kept in a preallocated structured array, operation names
+    and targets are interned into small integer codes.
+
+    Every measurement is also recorded into histograms, which provide accurate
+    tail percentiles regardless of the reservoir capacity.
+
     See also https://www.cs.umd.edu/~samir/498/vitter.pdf
     """
 
     MAX_CAPACITY = 10 ** 5
 
+    # Operations which count items rather than measure latency in seconds
+    COUNTERS = ('backlog', )
+
+    MAGIC = b'RSVR'
+
+    DTYPE = np.dtype([
+        ('operation', '<u1'),
+        ('target', '<u4'),
+        ('timestamp', '<i8'),
+        ('latency_single', '<f8'),
+        ('latency_total', '<f8'),  # NaN if not measured
+    ])
+
     def __init__(self, num_workers: int = 1):
         self.capacity = self.MAX_CAPACITY // num_workers
-        self.values = []
+        self.values = np.zeros(self.capacity, dtype=self.DTYPE)
+        self.size = 0
         self.count = 0  # Total items to sample
+        self.operations = {}
+        self.targets = {'': 0}
+        self.histograms = HistogramRecorder()
 
     def update(self, operation: str, value: Union[float, tuple[float, float]],
                target: Optional[str] = None):
         """Conditionally add new measurements to the reservoir."""
-        if not value:  # Ignore bad results
+        if not value and operation not in self.COUNTERS:  # Ignore bad results
             return
 
         self.count += 1
@@ -34,19 +62,56 @@ class Reservoir:
         else:
             latency_single, latency_total = value
 
-        measurement = (operation, timestamp, latency_single, latency_total, target)
+        if operation not in self.COUNTERS:
+            self.histograms.update(operation, latency_single, latency_total, target)
 
-        if len(self.values) < self.capacity:
-            self.values.append(measurement)
+        if self.size < self.capacity:
+            index = self.size
+            self.size += 1
         else:
-            r = int(self.count * random.random())
-            if r < self.capacity:
-                self.values[r] = measurement
+            index = int(self.count * random.random())
+            if index >= self.capacity:
+                return
+
+        operation = self.operations.setdefault(operation, len(self.operations))
+        target = self.targets.setdefault(target or '', len(self.targets))
+        if latency_total is None:
+            latency_total = np.nan
 
-    def dump(self, filename: str):
-        """Write all measurements to a local CSV file."""
+        self.values[index] = (operation, target, timestamp, latency_single, latency_total)
+
+    def dump(self, filename: Union[str, Path]):
+        """Write all measurements to a local binary file and histograms next to it.
+
+        The file consists of a magic number, the length of a JSON header with
+        the operation and target code tables, the header itself and the raw
+        records, which allows readers to memory-map the records.
+        """
         logger.info('Writing measurements to {}'.format(filename))
-        with open(filename, 'w') as fh:
-            writer = csv.writer(fh)
-            for measurement in self.values:
-                writer.writerow(measurement)
+        header = json.dumps({
+            'operations': list(self.operations),
+            'targets': list(self.targets),
+        }).encode()
+        with open(filename, 'wb') as fh:
+            fh.write(self.MAGIC)
+            fh.write(struct.pack('<I', len(header)))
+            fh.write(header)
+            fh.write(self.values[:self.size].tobytes())
+        self.histograms.dump('{}{}'.format(filename, HISTOGRAM_EXT))
+
+    @classmethod
+    def load(cls, filename: Union[str, Path]) -> tuple[list[str], list[str], np.ndarray]:
+        """Read operation names, targets and memory-mapped records from a dump."""
+        with open(filename, 'rb') as fh:
+            if fh.read(len(cls.MAGIC)) != cls.MAGIC:
+                raise ValueError('Not a reservoir dump: {}'.format(filename))
+            header_size, = struct.unpack('<I', fh.read(4))
+            header = json.loads(fh.read(header_size))
+
+        offset = len(cls.MAGIC) + 4 + header_size
+        if Path(filename).stat().st_size == offset:
+            records = np.empty(0, dtype=cls.DTYPE)
+        else:
+            records = np.memmap(filename, dtype=cls.DTYPE, mode='r', offset=offset)
+
+        return header['operations'], header['targets'], records
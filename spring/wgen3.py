@@ -1,13 +1,18 @@
+import asyncio
 import copy
+import ctypes
+import hashlib
 import os
 import signal
 import time
 from collections import deque
-from multiprocessing import Event, Lock, Manager, Process, Value
+from multiprocessing import Event, Lock, Process, Value
+from multiprocessing.sharedctypes import RawArray
 from pathlib import Path
 from threading import Timer
-from typing import Callable, List, Tuple, Union
+from typing import Callable, Dict, Iterator, List, Tuple, Union
 
+import numpy as np
 import pkg_resources
 import twisted
 from decorator import decorator
@@ -30,6 +35,7 @@ from spring.docgen import (
     ArrayIndexingUniqueDocument,
     BigFunDocument,
     Document,
+    DocumentCorpus,
     EventingCounterDocument,
     EventingSmallCounterDocument,
     EventingSmallDocument,
@@ -49,6 +55,7 @@ from spring.docgen import (
     ImportExportDocumentNested,
     IncompressibleString,
     JoinedDocument,
+    Key,
     KeyForCASUpdate,
     KeyForRemoval,
     KeyPlasmaDocument,
@@ -73,6 +80,7 @@ from spring.docgen import (
     ReverseRangeLookupDocument,
     SequentialKey,
     SequentialPlasmaDocument,
+    SerializedDocument,
     SingleFieldLargeDoc,
     SmallPlasmaDocument,
     SmallPlasmaGroupedDocument,
@@ -86,6 +94,7 @@ from spring.docgen import (
     VaryingAllItemSizePlasmaDocument,
     VaryingItemSizePlasmaDocument,
     VectorEmbeddingDocument,
+    VectorStore,
     WorkingSetKey,
     YuboDoc,
     ZipfKey,
@@ -108,6 +117,7 @@ elif sdk_major_version == 4:
     from twisted.internet import reactor
 
     from spring.cbgen4 import CBAsyncGen4 as CBAsyncGen
+    from spring.cbgen4 import CBAsyncioGen4 as CBAsyncioGen
     from spring.cbgen4 import CBGen4 as CBGen
     from spring.cbgen4 import SubDocGen4 as SubDocGen
 
@@ -141,6 +151,66 @@ Sequence = List[Tuple[str, Callable, Tuple]]
 Client = Union[CBAsyncGen, CBGen, SubDocGen]
 
 
+class KeyRanges:
+
+    """Track [curr_items, deleted_items] of every load target in shared memory.
+
+    Workers reserve key ranges with fetch-and-add operations on a shared array.
+    Every target has its own lock, so reservations neither serialise across
+    targets nor require a round trip to a manager process.
+    """
+
+    def __init__(self, items: Dict[str, int]):
+        self.slots = {target: i for i, target in enumerate(items)}
+        self.counters = RawArray(ctypes.c_int64, 2 * len(items))
+        self.locks = [Lock() for _ in items]
+        for target, curr_items in items.items():
+            self.counters[2 * self.slots[target]] = curr_items
+
+    def __getitem__(self, target: str) -> List[int]:
+        i = self.slots[target]
+        with self.locks[i]:
+            return [self.counters[2 * i], self.counters[2 * i + 1]]
+
+    def reserve(self, target: str, creates: int = 0, deletes: int = 0) -> Tuple[int, int]:
+        """Advance the counters and return their values prior to the reservation."""
+        i = self.slots[target]
+        with self.locks[i]:
+            curr_items, deleted_items = self.counters[2 * i], self.counters[2 * i + 1]
+            self.counters[2 * i] = curr_items + creates
+            self.counters[2 * i + 1] = deleted_items + deletes
+        return curr_items, deleted_items
+
+
+class TokenBucket:
+
+    """Rate limit coroutines to a given number of operations per second.
+
+    The bucket holds up to `rate * BURST_INTERVAL` tokens, which absorbs the
+    coarse granularity of event loop sleeps at high rates.
+    """
+
+    BURST_INTERVAL = 0.01  # seconds
+
+    def __init__(self, rate: float):
+        self.rate = rate
+        self.capacity = max(rate * self.BURST_INTERVAL, 1)
+        self.tokens = 1
+        self.timestamp = time.monotonic()
+
+    async def acquire(self):
+        if self.rate == float('inf'):
+            return
+        while True:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.timestamp) * self.rate)
+            self.timestamp = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
 class Worker:
 
     CORRECTION_FACTOR = 0.975  # empiric!
@@ -422,7 +492,7 @@ class Worker:
                                                          ws.size_variation_min,
                                                          ws.size_variation_max)
         elif self.ws.doc_gen == 'vector_embedding':
-            self.docs = VectorEmbeddingDocument(self.ws.vector_query_map)
+            self.docs = VectorEmbeddingDocument(VectorStore(self.ws.vector_query_path))
 
     def init_db(self):
         workload_client = CBGen
@@ -474,27 +544,26 @@ class KVWorker(Worker):
 
     NAME = 'kv-worker'
 
+    PLAN_BATCHES = 100  # Number of batches planned at once
+
+    RAW_DOCS = True  # Whether documents can be pre-serialised
+
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.reservoir = Reservoir(num_workers=self.ws.workers * len(self.ws.bucket_list))
+        self.plan = deque()
+        self.max_backlog = 0
         self.gen_duration = 0.0
         self.batch_duration = 0.0
         self.delta = 0.0
         self.op_delay = 0.0
 
-    @property
-    def random_ops(self) -> List[str]:
-        random.shuffle(self.ops_list)
-        return self.ops_list
-
     @property
     def random_targets(self) -> List[str]:
         targets = list(random.choice(self.access_targets, self.num_random_targets))
         return self.q * targets + targets[:self.r]
 
-    def random_target(self) -> str:
-        return random.choice(self.access_targets)
-
     def create_args(self, cb: Client,
                     curr_items: int,
                     target: str) -> Sequence:
@@ -551,41 +620,105 @@ class KVWorker(Worker):
 
         return [('get', cb.read, read_args), ('set', cb.update, update_args)]
 
+    def init_docs(self):
+        super().init_docs()
+        if self.ws.doc_corpus_size and self.RAW_DOCS and sdk_major_version >= 4:
+            # Any workload setting may affect the documents
+            settings = (type(self.docs).__module__, type(self.docs).__qualname__,
+                        self.ts.prefix, sorted(vars(self.ws).items()))
+            digest = hashlib.md5(repr(settings).encode()).hexdigest()
+            path = os.path.join(DocumentCorpus.DIR, '{}-{}.bin'.format(self.ws.doc_gen, digest))
+            self.docs = DocumentCorpus(self.docs, self.ws.doc_corpus_size, path,
+                                       self.ts.prefix, self.ws.key_fmtr)
+        elif self.RAW_DOCS and sdk_major_version >= 4 and SerializedDocument.supported(self.docs):
+            self.docs = SerializedDocument(self.docs)
+
+    def plan_batches(self):
+        """Generate (target, ops, creates, deletes) plans for many batches.
+
+        Every batch gets an independently shuffled list of operations and a
+        random target. creates and deletes count the preceding creates and
+        deletes of every operation within the batch. Key ranges are not part
+        of the plan, they are reserved one batch at a time when the batch is
+        executed, so other workers never read keys which are written much later.
+        """
+        order = random.random_sample((self.PLAN_BATCHES, self.batch_size)).argsort(axis=1)
+        ops = np.array(self.ops_list)[order]
+        targets = random.choice(self.access_targets, self.PLAN_BATCHES).tolist()
+
+        creates = np.cumsum(ops == 'c', axis=1) - (ops == 'c')
+        deletes = np.cumsum(ops == 'd', axis=1) - (ops == 'd')
+
+        self.plan.extend(zip(targets, ops.tolist(), creates.tolist(), deletes.tolist()))
+
     def gen_cmd_sequence(self, cb: Client = None) -> Sequence:
         if not cb:
             cb = self.cb
-        target = self.random_target()
+        if not self.plan:
+            self.plan_batches()
+        target, ops, creates, deletes = self.plan.popleft()
+
         curr_items = self.load_map[target]
-        # curr_items = self.ws.items // self.num_load_targets
         deleted_items = 0
         if self.ws.creates or self.ws.deletes:
-            max_batch_deletes_buffer = self.ws.deletes * self.ws.workers
-            delete_buffer_diff = self.ws.deletes - max_batch_deletes_buffer
-            with self.gen_lock:
-                target_info = self.shared_dict[target]
-                curr_items = target_info[0]
-                deleted_items = target_info[1] + max_batch_deletes_buffer
-                self.shared_dict[target] = \
-                    [curr_items + self.ws.creates, deleted_items + delete_buffer_diff]
+            curr_items, deleted_items = self.shared_dict.reserve(
+                target, creates=self.ws.creates, deletes=self.ws.deletes)
+            deleted_items += self.ws.deletes * self.ws.workers
+
         cmds = []
-        for op in self.random_ops:
+        for op, created, deleted in zip(ops, creates, deletes):
+            curr, deleted = curr_items + created, deleted_items + deleted
             if op == 'c':
-                cmds += self.create_args(cb, curr_items, target)
-                curr_items += 1
+                cmds += self.create_args(cb, curr, target)
             elif op == 'r':
-                cmds += self.read_args(cb, curr_items, deleted_items, target)
+                cmds += self.read_args(cb, curr, deleted, target)
             elif op == 'u':
-                cmds += self.update_args(cb, curr_items, deleted_items, target)
+                cmds += self.update_args(cb, curr, deleted, target)
             elif op == 'd':
-                cmds += self.delete_args(cb, deleted_items, target)
-                deleted_items += 1
+                cmds += self.delete_args(cb, deleted, target)
             elif op == 'm':
-                cmds += self.modify_args(cb, curr_items, deleted_items, target)
+                cmds += self.modify_args(cb, curr, deleted, target)
         return cmds
 
+    def do_open_loop_batch(self):
+        """Issue operations on a fixed schedule regardless of response times.
+
+        Every operation has an intended start time and its latency is measured
+        from that time, so server stalls cannot shift the schedule and hide
+        themselves (coordinated omission). The schedule lag of the first
+        operation in every batch is recorded as the "lag" measurement, together
+        with the "backlog", i.e. the lag multiplied by the per-worker throughput.
+        """
+        cmd_seq = self.gen_cmd_sequence()
+        for op_count, (cmd, func, args) in enumerate(cmd_seq):
+            intended_start = self.next_op_time
+            self.next_op_time += self.op_interval
+            if (delay := intended_start - time.time()) > 0:
+                time.sleep(delay)
+            lag = time.time() - intended_start
+            if not op_count:
+                backlog = max(int(lag / self.op_interval), 0)
+                self.reservoir.update(operation='lag', value=lag)
+                self.reservoir.update(operation='backlog', value=float(backlog))
+                self.max_backlog = max(self.max_backlog, backlog)
+
+            latency = func(*args)
+            if latency is not None:
+                if isinstance(latency, float):
+                    latency += lag
+                else:
+                    latency = tuple(value + lag for value in latency)
+                target = args[0] if self.ws.per_collection_latency else None
+                self.reservoir.update(operation=cmd, value=latency, target=target)
+            if not op_count % 5:
+                if self.time_to_stop():
+                    return
+
     def do_batch(self, *args, **kwargs):
         op_count = 0
-        if self.target_time is None:
+        if self.target_time is not None and self.ws.open_loop:
+            self.do_open_loop_batch()
+        elif self.target_time is None:
             cmd_seq = self.gen_cmd_sequence()
             for cmd, func, args in cmd_seq:
                 latency = func(*args)
@@ -627,6 +760,7 @@ class KVWorker(Worker):
         self.gen_lock = locks[0]
         self.batch_lock = locks[1]
         self.shared_dict = shared_dict
+        self.curr_ops = curr_ops
         self.current_hot_load_start = current_hot_load_start
         self.timer_elapse = timer_elapse
         self.cb.connect_collections(self.access_targets)
@@ -651,6 +785,8 @@ class KVWorker(Worker):
             if self.target_time:
                 start_delay = random.random_sample() * self.target_time
                 time.sleep(start_delay * self.CORRECTION_FACTOR)
+                self.op_interval = self.ws.workers / self.ws.throughput
+                self.next_op_time = time.time()
             while self.run_condition(curr_ops):
                 with self.batch_lock:
                     curr_ops.value += self.batch_size
@@ -661,6 +797,9 @@ class KVWorker(Worker):
         else:
             logger.info('Finished: {}-{}-{}'.format(self.NAME, self.sid, self.ts.bucket))
         finally:
+            if self.ws.open_loop and self.target_time:
+                logger.info('Max backlog: {} ops ({}-{}-{})'.format(
+                    self.max_backlog, self.NAME, self.sid, self.ts.bucket))
             self.dump_stats()
 
 
@@ -668,6 +807,8 @@ class SubDocWorker(KVWorker):
 
     NAME = 'sub-doc-kv-worker'
 
+    RAW_DOCS = False
+
     def init_db(self):
         params = {'bucket': self.ts.bucket,
                   'host': self.ts.node,
@@ -847,6 +988,92 @@ class AsyncKVWorker(KVWorker):
         reactor.run()
 
 
+class AsyncioKVWorker(KVWorker):
+
+    """Keep many operations in flight per process using the acouchbase API.
+
+    Up to `async_concurrency` operations run concurrently in one event loop,
+    the requested throughput is enforced by a token bucket.
+    """
+
+    NAME = 'asyncio-kv-worker'
+
+    def init_db(self):
+        # The SDK connection is bound to the event loop created in run()
+        params = {
+            'bucket': self.ts.bucket,
+            'host': self.ts.node,
+            'username': self.ts.username,
+            'password': self.ts.password,
+            'ssl_mode': self.ws.ssl_mode,
+            'connstr_params': self.ws.connstr_params
+        }
+        if self.ts.cloud:
+            params["host"] = self.ts.cloud.get("cluster_svc", params["host"])
+
+        self.cb = CBAsyncioGen(**params)
+
+    async def do_op(self, cmd: str, func: Callable, args: Tuple):
+        latency = await func(*args)
+        if latency is not None:
+            target = args[0] if self.ws.per_collection_latency else None
+            self.reservoir.update(operation=cmd, value=latency, target=target)
+
+    async def run_ops(self):
+        await self.cb.connect_collections(self.access_targets)
+
+        window = asyncio.Semaphore(self.ws.async_concurrency)
+        pending = set()
+
+        def done(task: asyncio.Task):
+            pending.discard(task)
+            window.release()
+
+        while self.run_condition(self.curr_ops):
+            with self.batch_lock:
+                self.curr_ops.value += self.batch_size
+            for cmd, func, args in self.gen_cmd_sequence():
+                await self.rate_limiter.acquire()
+                await window.acquire()
+                task = asyncio.create_task(self.do_op(cmd, func, args))
+                task.add_done_callback(done)
+                pending.add(task)
+            self.report_progress(self.curr_ops.value)
+
+        await asyncio.gather(*pending)
+        await self.cb.close()
+
+    def run(self, sid, locks, curr_ops, shared_dict,
+            current_hot_load_start=None, timer_elapse=None):
+        logger.info('Running AsyncioKVWorker')
+        self.sid = sid
+        self.locks = locks
+        self.gen_lock = locks[0]
+        self.batch_lock = locks[1]
+        self.shared_dict = shared_dict
+        self.curr_ops = curr_ops
+        self.current_hot_load_start = current_hot_load_start
+        self.timer_elapse = timer_elapse
+        self.ops_list = \
+            ['c'] * self.ws.creates + \
+            ['r'] * self.ws.reads + \
+            ['u'] * self.ws.updates + \
+            ['d'] * self.ws.deletes + \
+            ['m'] * (self.ws.reads_and_updates // 2)
+        self.batch_size = len(self.ops_list)
+        self.rate_limiter = TokenBucket(rate=self.ws.throughput / self.ws.workers)
+
+        self.seed()
+        try:
+            asyncio.run(self.run_ops())
+        except KeyboardInterrupt:
+            logger.info('Interrupted: {}-{}-{}'.format(self.NAME, self.sid, self.ts.bucket))
+        else:
+            logger.info('Finished: {}-{}-{}'.format(self.NAME, self.sid, self.ts.bucket))
+        finally:
+            self.dump_stats()
+
+
 class HotReadsWorker(Worker):
 
     def run(self, sid, *args):
@@ -1219,23 +1446,21 @@ class N1QLWorker(Worker):
         self.op_delay = 0.0
         self.first = True
         self.use_query_context = False
+        # Query arguments only need a few fields of the document
+        self.doc_fields = getattr(self.docs, 'fields', self.docs.next)
 
     def do_batch_create(self, *args, **kwargs):
         if self.target_time:
             t0 = time.time()
             self.op_delay = self.op_delay + (self.delta / self.ws.n1ql_batch_size)
         target = self.next_target()
-        with self.lock:
-            target_info = self.shared_dict[target]
-            target_curr_items = target_info[0]
-            target_deleted_items = target_info[1]
-            updated_curr_items = target_curr_items + self.ws.n1ql_batch_size
-            self.shared_dict[target] = [updated_curr_items, target_deleted_items]
+        target_curr_items, _ = self.shared_dict.reserve(target,
+                                                        creates=self.ws.n1ql_batch_size)
 
         for i in range(self.ws.n1ql_batch_size):
             target_curr_items += 1
             key = self.new_keys.next(curr_items=target_curr_items)
-            doc = self.docs.next(key)
+            doc = self.doc_fields(key)
             query, options = self.new_queries.next(key.string, doc, self.replacement_targets,
                                                    self.use_query_context)
             latency = self.cb.n1ql_query(query, options)
@@ -1266,7 +1491,7 @@ class N1QLWorker(Worker):
             random_slice = random.choice(self.update_slices)
             key = self.keys_for_cas_update.next(sid=random_slice,
                                                 curr_items=target_curr_items)
-            doc = self.docs.next(key)
+            doc = self.doc_fields(key)
             query, options = self.new_queries.next(key.string, doc, self.replacement_targets,
                                                    self.use_query_context)
             latency = self.cb.n1ql_query(query, options)
@@ -1298,7 +1523,7 @@ class N1QLWorker(Worker):
         for i in range(self.ws.n1ql_batch_size):
             key = self.existing_keys.next(curr_items=target_curr_items,
                                           curr_deletes=0)
-            doc = self.docs.next(key)
+            doc = self.doc_fields(key)
             query, options = self.new_queries.next(key.string, doc, self.replacement_targets,
                                                    self.use_query_context)
             latency = self.cb.n1ql_query(query, options)
@@ -1438,9 +1663,8 @@ class N1QLWorker(Worker):
         self.replacement_targets[self.ts.bucket] = target_replacements
         return target
 
-    def run(self, sid, locks, curr_ops, shared_dict,
-            current_hot_load_start=None, timer_elapse=None):
-        logger.info('Running N1QLWorker')
+    def init_run(self, sid, locks, shared_dict, current_hot_load_start=None,
+                 timer_elapse=None):
         self.sid = sid
         self.locks = locks
         self.lock = locks[0]
@@ -1476,6 +1700,11 @@ class N1QLWorker(Worker):
         else:
             self.target_time = None
 
+    def run(self, sid, locks, curr_ops, shared_dict,
+            current_hot_load_start=None, timer_elapse=None):
+        logger.info('Running N1QLWorker')
+        self.init_run(sid, locks, shared_dict, current_hot_load_start, timer_elapse)
+
         try:
             if self.target_time:
                 start_delay = random.random_sample() * self.target_time
@@ -1490,6 +1719,99 @@ class N1QLWorker(Worker):
             self.dump_stats()
 
 
+class AsyncioN1QLWorker(N1QLWorker):
+
+    """Keep up to `n1ql_concurrency` queries in flight per process.
+
+    Queries share the connections of a single acouchbase cluster object,
+    the requested throughput is enforced by a token bucket.
+    """
+
+    NAME = 'query-worker'  # Stat files are collected by QueryLatency
+
+    def init_db(self):
+        # The SDK connection is bound to the event loop created in run()
+        params = {
+            'bucket': self.ts.bucket,
+            'host': self.ts.node,
+            'username': self.ts.username,
+            'password': self.ts.password,
+            'ssl_mode': self.ws.ssl_mode,
+            'n1ql_timeout': self.ws.n1ql_timeout,
+            'connstr_params': self.ws.connstr_params
+        }
+        if self.ts.cloud:
+            params["host"] = self.ts.cloud.get("cluster_svc", params["host"])
+
+        self.cb = CBAsyncioGen(**params)
+
+    def batch_keys(self) -> Iterator[Key]:
+        """Generate the keys of a batch the same way as the synchronous worker."""
+        if self.ws.n1ql_op == 'create':
+            target = self.next_target()
+            curr_items, _ = self.shared_dict.reserve(target, creates=self.ws.n1ql_batch_size)
+            for i in range(self.ws.n1ql_batch_size):
+                yield self.new_keys.next(curr_items=curr_items + i + 1)
+        elif self.ws.n1ql_op == 'update':
+            curr_items = self.ws.items // self.num_load_targets
+            for _ in range(self.ws.n1ql_batch_size):
+                yield self.keys_for_cas_update.next(sid=random.choice(self.update_slices),
+                                                    curr_items=curr_items)
+        else:
+            self.next_target()
+            curr_items = self.ws.items // self.num_load_targets
+            if self.ws.doc_gen == 'ext_reverse_lookup':
+                curr_items //= 4
+            for _ in range(self.ws.n1ql_batch_size):
+                yield self.existing_keys.next(curr_items=curr_items, curr_deletes=0)
+
+    async def do_query(self, query: str, options):
+        latency = await self.cb.n1ql_query(query, options)
+        if self.first:
+            self.first = False
+        elif latency is not None:
+            self.reservoir.update(operation='query', value=latency)
+
+    async def run_queries(self):
+        await self.cb.connect_collections([])
+
+        window = asyncio.Semaphore(self.ws.n1ql_concurrency)
+        pending = set()
+
+        def done(task: asyncio.Task):
+            pending.discard(task)
+            window.release()
+
+        while not self.time_to_stop():
+            for key in self.batch_keys():
+                doc = self.doc_fields(key)
+                query, options = self.new_queries.next(key.string, doc, self.replacement_targets,
+                                                       self.use_query_context)
+                await self.rate_limiter.acquire()
+                await window.acquire()
+                task = asyncio.create_task(self.do_query(query, options))
+                task.add_done_callback(done)
+                pending.add(task)
+
+        await asyncio.gather(*pending)
+        await self.cb.close()
+
+    def run(self, sid, locks, curr_ops, shared_dict,
+            current_hot_load_start=None, timer_elapse=None):
+        logger.info('Running AsyncioN1QLWorker')
+        self.init_run(sid, locks, shared_dict, current_hot_load_start, timer_elapse)
+        self.rate_limiter = TokenBucket(rate=self.ws.n1ql_throughput / self.ws.n1ql_workers)
+
+        try:
+            asyncio.run(self.run_queries())
+        except KeyboardInterrupt:
+            logger.info('Interrupted: {}-{}-{}'.format(self.NAME, self.sid, self.ts.bucket))
+        else:
+            logger.info('Finished: {}-{}-{}'.format(self.NAME, self.sid, self.ts.bucket))
+        finally:
+            self.dump_stats()
+
+
 class ViewWorker(Worker):
 
     NAME = 'query-worker'
@@ -1567,7 +1889,9 @@ class WorkerFactory:
 
     def __new__(cls, settings):
         num_workers = settings.workers
-        if getattr(settings, 'async', None):
+        if getattr(settings, 'asyncio', None) and sdk_major_version >= 4:
+            worker = AsyncioKVWorker
+        elif getattr(settings, 'async', None):
             worker = AsyncKVWorker
         elif getattr(settings, 'seq_upserts') and \
                 getattr(settings, 'xattr_field', None):
@@ -1604,6 +1928,8 @@ class AuxillaryWorkerFactory:
 class N1QLWorkerFactory:
 
     def __new__(cls, workload_settings):
+        if workload_settings.n1ql_concurrency > 1 and sdk_major_version >= 4:
+            return AsyncioN1QLWorker, workload_settings.n1ql_workers
         return N1QLWorker, workload_settings.n1ql_workers
 
 
@@ -1658,8 +1984,7 @@ class WorkloadGen:
     def start_all_workers(self):
         """Start all the workers groups."""
         logger.info('Starting all collections workers')
-        self.manager = Manager()
-        self.shared_dict = self.manager.dict()
+        items = {}
         if self.ws.collections is not None:
             num_load = 0
             num_ratio = 0
@@ -1681,16 +2006,15 @@ class WorkloadGen:
                     target = scope+":"+collection
                     if options['load'] == 1:
                         if ratio := options.get('ratio'):
-                            final_items = curr_items * ratio
-                            self.shared_dict[target] = [final_items, 0]
+                            items[target] = curr_items * ratio
                         else:
-                            self.shared_dict[target] = [curr_items, 0]
+                            items[target] = curr_items
                     else:
-                        self.shared_dict[target] = [0, 0]
+                        items[target] = 0
         else:
             # version prior to 7.0.0
-            target = "_default:_default"
-            self.shared_dict[target] = [self.ws.items, 0]
+            items["_default:_default"] = self.ws.items
+        self.shared_dict = KeyRanges(items)
 
         timer_elapse = Value('I', 0)
         current_hot_load_start = Value('L', 0)
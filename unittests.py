@@ -1,19 +1,34 @@
+import asyncio
 import glob
 import json
 import os
+import random
+import tempfile
+import zipfile
 from collections import defaultdict, namedtuple
 from multiprocessing import Value
 from pathlib import Path
+from types import SimpleNamespace
 from unittest import TestCase
 
+import numpy as np
 import pkg_resources
 import snappy
 
+from cbagent.metadata_client import LocalMetadataClient
+from cbagent.scheduler import Scheduler, next_tick
+from cbagent.stores import LocalStore
+from perfrunner.helpers.metrics import YCSBStats
 from perfrunner.helpers.misc import pretty_dict
+from perfrunner.helpers.vectors import exact_neighbours, read_vectors, recall_at_k
 from perfrunner.settings import ClusterSpec, TestConfig
+from perfrunner.utils.verify_logs import validate_logs
 from perfrunner.workloads.bigfun.query_gen import new_queries
 from perfrunner.workloads.tcmalloc import KeyValueIterator, LargeIterator
 from spring import docgen
+from spring.histogram import Histogram
+from spring.reservoir import Reservoir
+from spring.wgen3 import AsyncioN1QLWorker
 
 sdk_major_version = int(pkg_resources.get_distribution("couchbase").version[0])
 if sdk_major_version == 2:
@@ -605,6 +620,84 @@ class SpringTest(TestCase):
         doc = generator.next(key=docgen.Key(number=0, prefix='', fmtr=''))
         self.assertEqual(len(doc), size)
 
+    def test_serialized_documents(self):
+        generators = (
+            docgen.Document(avg_size=1024),
+            docgen.Document(avg_size=128),
+            docgen.NestedDocument(avg_size=2048),
+            docgen.ReverseLookupDocument(avg_size=1024, prefix='n1ql'),
+            docgen.ReverseLookupDocument(avg_size=1024, prefix='test'),
+        )
+        for generator in generators:
+            self.assertTrue(docgen.SerializedDocument.supported(generator))
+            for seed in range(100):
+                key = docgen.Key(number=seed, prefix='test', fmtr='hex')
+                random.seed(seed)
+                np.random.seed(seed)
+                expected = docgen.dumps(generator.next(key))
+                random.seed(seed)
+                np.random.seed(seed)
+                self.assertEqual(docgen.SerializedDocument(generator).next(key), expected)
+
+    def test_vector_documents(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            source = os.path.join(tmp, 'queries.txt')
+            with open(source, 'w') as fh:
+                for i in range(10):
+                    fh.write('{} 0 {} 0.125 -1e-05\n'.format(i, i))
+
+            docgen.VectorStore.CACHE_DIR, cache_dir = tmp, docgen.VectorStore.CACHE_DIR
+            try:
+                vectors = docgen.VectorStore(source)
+                self.assertEqual(docgen.VectorStore(source).vectors.shape, (10, 3))
+            finally:
+                docgen.VectorStore.CACHE_DIR = cache_dir
+
+            self.assertEqual(vectors.get(3), [3.0, 0.125, -1e-05])
+            generator = docgen.VectorEmbeddingDocument(vectors)
+            self.assertTrue(docgen.SerializedDocument.supported(generator))
+            for seed in range(10):
+                key = docgen.Key(number=seed, prefix='test', fmtr='hex')
+                random.seed(seed)
+                expected = docgen.dumps(generator.next(key))
+                random.seed(seed)
+                self.assertEqual(generator.next_raw(key), expected)
+
+    def test_lazy_document_fields(self):
+        generators = (
+            docgen.Document(avg_size=1024),
+            docgen.NestedDocument(avg_size=1024),
+            docgen.ReverseLookupDocument(avg_size=1024, prefix='n1ql'),
+            docgen.ReverseRangeLookupDocument(avg_size=1024, prefix='n1ql', range_distance=10),
+            docgen.HashJoinDocument(avg_size=1024, prefix='n1ql', range_distance=10),
+        )
+        random_fields = {'alt_email', 'body'}
+        for generator in generators:
+            for i in range(100):
+                key = docgen.Key(number=i, prefix='n1ql', fmtr='hex')
+                doc = generator.next(key)
+                fields = generator.fields(key)
+                self.assertIsInstance(fields, docgen.LazyDocument)
+                self.assertEqual(set(fields), set(doc))
+                for field in set(doc) - random_fields:
+                    self.assertEqual(fields[field], doc[field])
+
+        generator = docgen.GroupedDocument(avg_size=1024, groups=10)  # Overrides next()
+        self.assertIsInstance(generator.fields(docgen.Key(0, 'n1ql', 'hex')), dict)
+
+    def test_latency_histogram(self):
+        histograms = [Histogram(), Histogram()]
+        for i in range(1, 10 ** 4 + 1):
+            histograms[i % 2].record(i / 10 ** 6)  # 1us .. 10ms
+
+        histogram = Histogram.from_json(histograms[0].to_json())
+        histogram.merge(histograms[1])
+        self.assertEqual(histogram.total, 10 ** 4)
+
+        for percentile, expected in zip((50, 99, 99.9), (5, 9.9, 9.99)):
+            latency, = histogram.percentiles([percentile])
+            self.assertAlmostEqual(latency, expected, delta=expected / 2 ** 8)
+
 
 class QueryTest(TestCase):
 
@@ -656,6 +749,218 @@ class QueryTest(TestCase):
                 self.assertEqual(query.consistency, 'request_plus')
                 self.assertEqual(query._body['args'], [doc['email']])
 
+    def test_n1ql_query_gen_targets(self):
+        if sdk_major_version < 3:
+            return
+        queries = [{
+            'statement': 'SELECT * FROM `bucket-1` WHERE coins > $1 AND name = $2 '
+                         'AND year = $3;',
+            'args': '[{coins[f]}, "{name[f][f][f]}", {year}]',
+        }]
+        qg = N1QLQueryGen(queries=queries, query_weight=[1])
+
+        doc = {'coins': {'f': 1.5}, 'name': {'f': {'f': {'f': 'a b'}}}, 'year': 1990}
+        for collection in 'collection-1', 'collection-2', 'collection-1':
+            replace_targets = {'bucket-1': ['scope-1:{}:True'.format(collection)]}
+            stmt, queryopts = qg.next(key='n1ql-0123456789', doc=doc,
+                                      replace_targets=replace_targets,
+                                      use_query_context=True)
+            self.assertEqual(stmt, 'SELECT * FROM default:`bucket-1`.`scope-1`.`{}` '
+                                   'WHERE coins > $1 AND name = $2 AND year = $3;'
+                                   .format(collection))
+            self.assertEqual(queryopts['query_context'], 'default:`bucket-1`.`scope-1`')
+            self.assertEqual(queryopts['positional_parameters'],
+                             eval(queries[0]['args'].format(**doc)))
+
+
+class YCSBTest(TestCase):
+
+    LOG = '''[OVERALL], Throughput(ops/sec), 1000.5
+[TOTAL_GCs], Count, 7
+[READ], Operations, 4000
+[READ], MaxLatency(us), {max_latency}
+[READ], 0, 5000
+[READ], 1000, {latency}
+[READ], 2000, {latency}
+[READ-FAILED], Operations, 3
+[CLEANUP], 1000, 5
+'''
+
+    def test_merged_logs(self):
+        stats = YCSBStats()
+        with tempfile.TemporaryDirectory() as tmp:
+            for i, latency in enumerate((100, 200, 300, 400)):
+                filename = os.path.join(tmp, 'ycsb_run_{}.log'.format(i))
+                with open(filename, 'w') as fh:
+                    fh.write(self.LOG.format(latency=latency, max_latency=latency * 10))
+                stats.parse(filename)
+
+        self.assertEqual(stats.throughput, 4000)
+        self.assertEqual(stats.gcs, 28)
+        self.assertEqual(stats.failures, {'READ': 12, 'UPDATE': 0})
+        self.assertEqual(stats.max_latencies, {'READ': 4})
+        self.assertEqual(stats.latencies(75), {'75th Percentile READ': 0.3,
+                                               'Average READ': 0.25})
+
+
+class MonitorTest(TestCase):
+
+    def test_adaptive_poller(self):
+        from perfrunner.helpers.monitor import AdaptivePoller, LogThrottle
+
+        poller = AdaptivePoller(interval=1)
+        poller.next_interval(remaining=10 ** 6)
+        poller.last_poll = (poller.last_poll[0] - 1, poller.last_poll[1])
+        self.assertEqual(poller.next_interval(remaining=10 ** 6 - 1), 1)  # Far from completion
+
+        throttle = LogThrottle(interval=60)
+        self.assertEqual([throttle.due(), throttle.due()], [True, False])
+
+
+class CbAgentTest(TestCase):
+
+    def test_local_store(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            store = LocalStore(tmp)
+            for i in range(10):
+                store.append({'cpu_utilization_rate': i, 'mem_free': 2 * i,
+                              'fts/num_bytes': 'n/a'},
+                             cluster='c1', collector='ns_server', timestamp=i)
+            store.close()
+            db = store.build_dbname(cluster='c1', collector='ns_server')
+
+            self.assertEqual(store.get_values(db, 'cpu_utilization_rate'), list(range(10)))
+            self.assertEqual(store.get_summary(db, 'cpu_utilization_rate')['avg'], 4.5)
+            self.assertTrue(store.exists(db, 'cpu_utilization_rate'))
+            self.assertFalse(store.exists(db, 'fts/num_bytes'))
+            self.assertEqual(store.files, {})
+
+            mc = LocalMetadataClient(SimpleNamespace(cluster='c1', cbmonitor_host='cbmonitor',
+                                                     stats_store_dir=tmp))
+            mc.add_server('127.0.0.1')
+            self.assertEqual(mc.journal('c1').read_text().count('add_server'), 1)
+
+            store.append({'cpu_utilization_rate': 0}, cluster='c1', collector='ns_server_system')
+            store.close()
+            self.assertEqual(store.find_dbs(db), [db])
+            self.assertEqual(len(store.list_dbs()), 2)
+            points = list(store.read_points([db]))
+            self.assertEqual(len(points), 10)
+            self.assertEqual(points[-1], (db, {'cpu_utilization_rate': 9, 'mem_free': 18}, 9))
+
+    def test_asyncio_query_latency(self):
+        os.environ.setdefault('WORKER_TYPE', 'local')  # Required by perfrunner.helpers.worker
+        from cbagent.collectors.latency import QueryLatency
+
+        worker = AsyncioN1QLWorker.__new__(AsyncioN1QLWorker)
+        worker.ts = SimpleNamespace(node='127.0.0.1', bucket='bucket-1')
+        worker.ws = SimpleNamespace(workload_name=None)
+        worker.workload_id, worker.sid = 'w1', 0
+        worker.reservoir = Reservoir()
+        worker.reservoir.update(operation='query', value=0.005)
+
+        collector = QueryLatency.__new__(QueryLatency)
+        collector.stat_dir = 'spring_latency/master_127.0.0.1'
+        collector.target_groups = {'bucket-1': {}}
+        collector.cluster = 'c1'
+
+        cwd = os.getcwd()
+        with tempfile.TemporaryDirectory() as tmp:
+            os.chdir(tmp)
+            try:
+                worker.dump_stats()
+                collector.store = LocalStore(tmp)
+                points = [
+                    point for fn in collector.stat_files('bucket-1')
+                    for point in collector.read_results(fn, 'bucket-1')
+                ]
+            finally:
+                os.chdir(cwd)
+
+        self.assertEqual(len(points), 1)
+        self.assertEqual(points[0][1], {'latency_query': 5.0})
+
+    def test_backlog_counter(self):
+        os.environ.setdefault('WORKER_TYPE', 'local')  # Required by perfrunner.helpers.worker
+        from cbagent.collectors.latency import KVLatency
+
+        reservoir = Reservoir()
+        reservoir.update(operation='lag', value=0.002)
+        reservoir.update(operation='backlog', value=0.0)
+        reservoir.update(operation='backlog', value=4.0)
+
+        collector = KVLatency.__new__(KVLatency)
+        collector.target_groups = {'bucket-1': {'': ''}}
+        collector.cluster = 'c1'
+        with tempfile.TemporaryDirectory() as tmp:
+            filename = os.path.join(tmp, 'kv-worker-bucket-1')
+            reservoir.dump(filename)
+            collector.store = LocalStore(tmp)
+            points = [data for _, data, _ in collector.read_results(filename, 'bucket-1')]
+
+        self.assertEqual(points, [{'latency_lag': 2.0}, {'backlog': 0.0}, {'backlog': 4.0}])
+        self.assertNotIn(('latency_backlog', None), reservoir.histograms.histograms)
+
+    def test_scheduler_isolates_failures(self):
+        class BrokenCollector:
+            async def collect_async(self):
+                raise ConnectionError
+
+        asyncio.run(Scheduler.collect(BrokenCollector()))  # Doesn't raise
+
+    def test_aligned_ticks(self):
+        tick, missed_ticks = next_tick(interval=5)
+        self.assertEqual((tick % 5, missed_ticks), (0, 0))
+
+        next_one, missed_ticks = next_tick(interval=5, last_tick=tick - 15)
+        self.assertEqual((next_one, missed_ticks), (tick, 2))
+
+        next_one, missed_ticks = next_tick(interval=5, last_tick=tick)
+        self.assertEqual((next_one, missed_ticks), (tick + 5, 0))
+
+
+class VectorTest(TestCase):
+
+    def test_exact_neighbours(self):
+        rng = np.random.default_rng(0)
+        base = rng.random((1000, 8), dtype=np.float32)
+        queries = rng.random((20, 8), dtype=np.float32)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'base.fvecs')
+            records = np.hstack([np.full((1000, 1), 8, dtype='<i4').view('<f4'), base])
+            records.tofile(path)
+            base = read_vectors(path)
+            self.assertEqual(base.shape, (1000, 8))
+
+            distances = ((queries[:, None, :] - base[None, :, :]) ** 2).sum(axis=2)
+            expected = np.argsort(distances, axis=1)[:, :10]
+            neighbours = exact_neighbours(base, queries, k=10, block_size=64)
+            self.assertTrue((neighbours == expected).all())
+
+        self.assertEqual(recall_at_k(['1', '2', '3'], ['3', '1', '4'], k=3), 2 / 3)
+
+
+class VerifyLogsTest(TestCase):
+
+    def test_validate_logs(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            file_name = os.path.join(tmp, 'node.zip')
+            with zipfile.ZipFile(file_name, 'w', zipfile.ZIP_DEFLATED) as zf:
+                zf.writestr('cbcollect/indexer.log',
+                            'started\n' * 10 ** 6 + 'Storage corrupted and unrecoverable\n')
+                zf.writestr('cbcollect/query.log', 'x' * 10 ** 6 + 'panic: runtime error')
+                zf.writestr('cbcollect/memcached.log', 'panic')
+                zf.writestr('cbcollect/crash/core.dmp', '')
+
+            self.assertEqual(validate_logs(file_name), {
+                'storage_corrupted': {
+                    'cbcollect/indexer.log': 'line 1000001: Storage corrupted and unrecoverable',
+                },
+                'panics': {'cbcollect/query.log': 'line 1: ' + 'x' * 128 + 'panic: runtime error'},
+                'crashes': ['cbcollect/crash/core.dmp'],
+            })
+
 
 class BigFunTest(TestCase):
 